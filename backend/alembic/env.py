@@ -10,7 +10,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Import your models here
 from app.database import Base
-from app.models import User, Download
+from app.models import User, Download, DownloadJob, SyncSource, SyncArchiveEntry, IdempotencyKey, WebhookDeadLetter
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
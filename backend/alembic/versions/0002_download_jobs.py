@@ -0,0 +1,45 @@
+"""Download job queue shared by the API and workers
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 09:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'download_jobs',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('url', sa.Text(), nullable=False),
+        sa.Column('platform', sa.String(length=50), nullable=False),
+        sa.Column('quality', sa.String(length=20), nullable=True),
+        sa.Column('audio_only', sa.Boolean(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('status_data', sa.Text(), nullable=True),
+        sa.Column('worker_id', sa.String(length=100), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_download_jobs_created_at'), 'download_jobs', ['created_at'], unique=False)
+    op.create_index(op.f('ix_download_jobs_status'), 'download_jobs', ['status'], unique=False)
+    op.create_index(op.f('ix_download_jobs_worker_id'), 'download_jobs', ['worker_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_download_jobs_worker_id'), table_name='download_jobs')
+    op.drop_index(op.f('ix_download_jobs_status'), table_name='download_jobs')
+    op.drop_index(op.f('ix_download_jobs_created_at'), table_name='download_jobs')
+    op.drop_table('download_jobs')
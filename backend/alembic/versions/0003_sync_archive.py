@@ -0,0 +1,56 @@
+"""Profile/playlist sync sources and their item archive
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 09:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'sync_sources',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('source_key', sa.String(length=500), nullable=False),
+        sa.Column('url', sa.Text(), nullable=False),
+        sa.Column('platform', sa.String(length=50), nullable=False),
+        sa.Column('newest_item_id', sa.String(length=100), nullable=True),
+        sa.Column('reached_end', sa.Boolean(), nullable=True),
+        sa.Column('item_count', sa.Integer(), nullable=True),
+        sa.Column('last_synced_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_sync_sources_id'), 'sync_sources', ['id'], unique=False)
+    op.create_index(op.f('ix_sync_sources_source_key'), 'sync_sources', ['source_key'], unique=True)
+    op.create_table(
+        'sync_archive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('source_id', sa.Integer(), nullable=False),
+        sa.Column('item_id', sa.String(length=100), nullable=False),
+        sa.Column('download_id', sa.String(length=36), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['source_id'], ['sync_sources.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('source_id', 'item_id', name='uq_sync_archive_item')
+    )
+    op.create_index(op.f('ix_sync_archive_id'), 'sync_archive', ['id'], unique=False)
+    op.create_index(op.f('ix_sync_archive_source_id'), 'sync_archive', ['source_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_sync_archive_source_id'), table_name='sync_archive')
+    op.drop_index(op.f('ix_sync_archive_id'), table_name='sync_archive')
+    op.drop_table('sync_archive')
+    op.drop_index(op.f('ix_sync_sources_source_key'), table_name='sync_sources')
+    op.drop_index(op.f('ix_sync_sources_id'), table_name='sync_sources')
+    op.drop_table('sync_sources')
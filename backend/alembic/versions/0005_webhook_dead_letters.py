@@ -0,0 +1,44 @@
+"""Completion webhook deliveries that ran out of attempts
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 14:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'webhook_dead_letters',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('event_id', sa.String(length=36), nullable=False),
+        sa.Column('event_type', sa.String(length=50), nullable=False),
+        sa.Column('download_id', sa.String(length=36), nullable=True),
+        sa.Column('callback_url', sa.Text(), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_webhook_dead_letters_id'), 'webhook_dead_letters', ['id'], unique=False)
+    op.create_index(op.f('ix_webhook_dead_letters_event_id'), 'webhook_dead_letters', ['event_id'], unique=False)
+    op.create_index(op.f('ix_webhook_dead_letters_download_id'), 'webhook_dead_letters', ['download_id'], unique=False)
+    op.create_index(op.f('ix_webhook_dead_letters_created_at'), 'webhook_dead_letters', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_webhook_dead_letters_created_at'), table_name='webhook_dead_letters')
+    op.drop_index(op.f('ix_webhook_dead_letters_download_id'), table_name='webhook_dead_letters')
+    op.drop_index(op.f('ix_webhook_dead_letters_event_id'), table_name='webhook_dead_letters')
+    op.drop_index(op.f('ix_webhook_dead_letters_id'), table_name='webhook_dead_letters')
+    op.drop_table('webhook_dead_letters')
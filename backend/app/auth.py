@@ -23,6 +23,8 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # JWT token security
 security = HTTPBearer()
+# Same scheme for endpoints that also serve anonymous callers
+optional_security = HTTPBearer(auto_error=False)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
@@ -90,3 +92,18 @@ def get_current_active_user(current_user: User = Depends(get_current_user)) -> U
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
+
+def get_optional_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    db: Session = Depends(get_db)
+) -> Optional[User]:
+    """Get the authenticated user if a valid token was sent, otherwise None."""
+    if credentials is None:
+        return None
+    token_data = verify_token(credentials.credentials)
+    if token_data is None:
+        return None
+    user = db.query(User).filter(User.username == token_data.username).first()
+    if user is None or not user.is_active:
+        return None
+    return user
@@ -1,6 +1,6 @@
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
-from .database import Base, DATABASE_URL
+from pathlib import Path
+from sqlalchemy import inspect
+from .database import Base, SessionLocal, engine
 from .models import User, Download
 import logging
 
@@ -8,18 +8,53 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+BACKEND_DIR = Path(__file__).parent.parent
+
+def alembic_scripts():
+    """The migration scripts under backend/alembic"""
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+    
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "alembic"))
+    return ScriptDirectory.from_config(config)
+
+def schema_is_current() -> bool:
+    """Check whether the database is already at the latest Alembic revision"""
+    from alembic.runtime.migration import MigrationContext
+    
+    heads = set(alembic_scripts().get_heads())
+    if not heads:
+        # No migrations written yet, so create_all is the only source of truth
+        return False
+    
+    with engine.connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+    return current == heads
+
+def stamp_head():
+    """Record the database as being at the latest Alembic revision"""
+    from alembic.runtime.migration import MigrationContext
+    
+    with engine.begin() as connection:
+        MigrationContext.configure(connection).stamp(alembic_scripts(), "heads")
+
 def init_db():
     """Initialize the database by creating all tables"""
     try:
-        # Create engine
-        engine = create_engine(DATABASE_URL)
-        
-        # Create all tables
-        Base.metadata.create_all(bind=engine)
-        logger.info("Database tables created successfully")
+        # Migrated databases already have their schema; they may still lack the seed data
+        at_head = schema_is_current()
+        fresh = False
+        if at_head:
+            logger.info("Database schema is at the latest migration, skipping create_all")
+        else:
+            # An empty database gets exactly the schema of the latest migration from create_all
+            fresh = not inspect(engine).get_table_names()
+            
+            # Create all tables on the shared engine
+            Base.metadata.create_all(bind=engine)
+            logger.info("Database tables created successfully")
         
-        # Create session
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
         db = SessionLocal()
         
         # Check if we need to seed initial data
@@ -29,6 +64,11 @@ def init_db():
             logger.info("Initial data seeded successfully")
         
         db.close()
+        
+        if fresh:
+            # Later boots skip create_all; older databases need `alembic stamp head` once
+            stamp_head()
+            logger.info("Database stamped at the latest migration")
         return True
         
     except Exception as e:
@@ -61,7 +101,6 @@ def seed_initial_data(db):
 def reset_db():
     """Reset the database by dropping all tables and recreating them"""
     try:
-        engine = create_engine(DATABASE_URL)
         Base.metadata.drop_all(bind=engine)
         logger.info("Database tables dropped successfully")
         
@@ -70,7 +109,6 @@ def reset_db():
         logger.info("Database tables recreated successfully")
         
         # Seed initial data
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
         db = SessionLocal()
         seed_initial_data(db)
         db.close()
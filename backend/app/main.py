@@ -1,8 +1,12 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from app import metrics
 from app.routers import main as main_router
 from app.database_init import init_db
+import asyncio
 import os
+import time
 
 app = FastAPI(
     title="Social Media Downloader API",
@@ -19,6 +23,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Record latency and in-flight count for every API request"""
+    started = time.perf_counter()
+    status_code = 500
+    metrics.HTTP_REQUESTS_IN_FLIGHT.inc()
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        metrics.HTTP_REQUESTS_IN_FLIGHT.dec()
+        # Label by route template, not raw path, to keep cardinality bounded
+        route = request.scope.get("route")
+        metrics.HTTP_REQUEST_SECONDS.labels(
+            request.method,
+            route.path if route else "unmatched",
+            str(status_code)
+        ).observe(time.perf_counter() - started)
+
 # Include routers
 app.include_router(main_router.router, prefix="/api/v1")
 
@@ -26,6 +50,40 @@ app.include_router(main_router.router, prefix="/api/v1")
 async def startup_event():
     """Initialize database on startup"""
     init_db()
+    
+    # Load yt-dlp's extractors off the event loop so the first job doesn't pay for it
+    if os.getenv("PRELOAD_YT_DLP", "true").lower() == "true":
+        asyncio.get_running_loop().run_in_executor(None, main_router.download_service.warm_up)
+    
+    # Resume jobs a previous run of this process left half-finished
+    download_service = main_router.download_service
+    app.state.resumed_tasks = set()
+    if not download_service.job_queue and os.getenv("RESUME_INTERRUPTED", "true").lower() == "true":
+        for checkpoint in download_service.find_interrupted_downloads():
+            metrics.DOWNLOADS_QUEUED.labels(checkpoint["platform"]).inc()
+            task = asyncio.create_task(download_service.download_content(
+                checkpoint["id"],
+                checkpoint["url"],
+                checkpoint["platform"],
+                checkpoint.get("quality", "best"),
+                checkpoint.get("audio_only", False),
+                checkpoint.get("tier"),
+                checkpoint.get("callback_url"),
+                checkpoint.get("save_info", False)
+            ))
+            app.state.resumed_tasks.add(task)
+            task.add_done_callback(app.state.resumed_tasks.discard)
+    
+    app.state.loop_lag_task = asyncio.create_task(metrics.monitor_event_loop_lag())
+    
+    # Measure egress proxies and bring recovered ones back into rotation
+    if download_service.proxies.enabled and download_service.proxies.check_url:
+        app.state.proxy_check_task = asyncio.create_task(download_service.proxies.run_health_checks())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close pooled HTTP clients"""
+    await main_router.download_service.aclose()
 
 @app.get("/")
 async def root():
@@ -35,6 +93,10 @@ async def root():
         "status": "running"
     }
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
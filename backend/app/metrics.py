@@ -0,0 +1,295 @@
+import asyncio
+import time
+from typing import Dict
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Buckets sized for social media clips: sub-second probes up to hour-long IGTV downloads
+PHASE_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+THROUGHPUT_BUCKETS = (64e3, 256e3, 1e6, 4e6, 16e6, 64e6, 256e6)
+
+# HTTP layer
+HTTP_REQUEST_SECONDS = Histogram(
+    "smd_http_request_duration_seconds",
+    "API request latency by route",
+    ["method", "route", "status"],
+    buckets=HTTP_BUCKETS
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "smd_http_requests_in_flight",
+    "API requests currently being handled"
+)
+IDEMPOTENT_REPLAYS_TOTAL = Counter(
+    "smd_idempotent_replays_total",
+    "POST /download retries answered with the original job instead of a new one"
+)
+
+# Download pipeline
+DOWNLOADS_QUEUED = Gauge(
+    "smd_downloads_queued",
+    "Accepted download jobs that have not started yet",
+    ["platform"]
+)
+DOWNLOADS_IN_FLIGHT = Gauge(
+    "smd_downloads_in_flight",
+    "Download jobs currently running",
+    ["platform"]
+)
+DOWNLOADS_TOTAL = Counter(
+    "smd_downloads_total",
+    "Finished download jobs by outcome",
+    ["platform", "status"]
+)
+DOWNLOAD_RETRIES_TOTAL = Counter(
+    "smd_download_retries_total",
+    "Download attempts that failed and were retried",
+    ["platform"]
+)
+DOWNLOAD_SECONDS = Histogram(
+    "smd_download_duration_seconds",
+    "End-to-end job duration including retries",
+    ["platform", "status"],
+    buckets=PHASE_BUCKETS
+)
+DOWNLOAD_PHASE_SECONDS = Histogram(
+    "smd_download_phase_duration_seconds",
+    "Time spent per pipeline phase (extract, download, postprocess)",
+    ["platform", "phase"],
+    buckets=PHASE_BUCKETS
+)
+NATIVE_EXTRACTOR_FALLBACKS_TOTAL = Counter(
+    "smd_native_extractor_fallbacks_total",
+    "Native extractions that failed and were left to yt-dlp, by reason",
+    ["platform", "reason"]
+)
+DOWNLOAD_BYTES_TOTAL = Counter(
+    "smd_download_bytes_total",
+    "Bytes received from platforms",
+    ["platform"]
+)
+DOWNLOAD_THROUGHPUT = Histogram(
+    "smd_download_throughput_bytes_per_second",
+    "Average transfer rate per downloaded file",
+    ["platform"],
+    buckets=THROUGHPUT_BUCKETS
+)
+
+# Streaming audio extraction (ffmpeg fed from the network, no intermediate file)
+AUDIO_PIPELINES_ACTIVE = Gauge(
+    "smd_audio_pipelines_active",
+    "ffmpeg audio pipelines currently running, by copy/transcode mode",
+    ["mode"]
+)
+AUDIO_PIPELINE_SECONDS = Histogram(
+    "smd_audio_pipeline_duration_seconds",
+    "Fetch plus remux/transcode time of streamed audio jobs",
+    ["mode"],
+    buckets=PHASE_BUCKETS
+)
+AUDIO_PIPELINE_FALLBACKS_TOTAL = Counter(
+    "smd_audio_pipeline_fallbacks_total",
+    "Streamed audio jobs that failed and were redone with yt-dlp's download + extract",
+    ["platform"]
+)
+
+# Postprocessing (ffmpeg merges/conversions behind their own CPU slots)
+POSTPROCESS_QUEUED = Gauge(
+    "smd_postprocess_queued",
+    "Postprocess steps waiting for a CPU slot",
+    ["kind"]
+)
+POSTPROCESS_RUNNING = Gauge(
+    "smd_postprocess_running",
+    "Postprocess steps currently holding a CPU slot",
+    ["kind"]
+)
+POSTPROCESS_WAIT_SECONDS = Histogram(
+    "smd_postprocess_wait_seconds",
+    "Time postprocess steps spent queued for a CPU slot",
+    ["kind"],
+    buckets=PHASE_BUCKETS
+)
+POSTPROCESS_SECONDS = Histogram(
+    "smd_postprocess_duration_seconds",
+    "Run time of postprocess steps by outcome",
+    ["kind", "result"],
+    buckets=PHASE_BUCKETS
+)
+
+# Admission control against disk space and bytes in flight
+ADMISSION_DECISIONS_TOTAL = Counter(
+    "smd_admission_decisions_total",
+    "Admission decisions for jobs by outcome",
+    ["decision"]
+)
+ADMISSION_RESERVED_BYTES = Gauge(
+    "smd_admission_reserved_bytes",
+    "Estimated bytes running jobs still have to write"
+)
+ADMISSION_RESERVATIONS = Gauge(
+    "smd_admission_reservations",
+    "Jobs holding a disk space reservation"
+)
+DISK_FREE_BYTES = Gauge(
+    "smd_disk_free_bytes",
+    "Free space on the downloads volume at the last admission check"
+)
+
+# Bandwidth shaping across running jobs
+BANDWIDTH_LIMIT_BYTES = Gauge(
+    "smd_bandwidth_limit_bytes",
+    "Download bandwidth budget of this process in bytes/s (0 = unlimited)"
+)
+BANDWIDTH_ACTIVE_JOBS = Gauge(
+    "smd_bandwidth_active_jobs",
+    "Jobs currently transferring and sharing the bandwidth budget"
+)
+BANDWIDTH_ALLOCATED_BYTES = Gauge(
+    "smd_bandwidth_allocated_bytes",
+    "Bandwidth currently allocated to transferring jobs in bytes/s",
+    ["tier"]
+)
+BANDWIDTH_THROTTLED_SECONDS_TOTAL = Counter(
+    "smd_bandwidth_throttled_seconds_total",
+    "Time transfers were held back to stay within their share"
+)
+
+# Egress proxy pool
+PROXY_ASSIGNMENTS_TOTAL = Counter(
+    "smd_proxy_assignments_total",
+    "Jobs and extractions routed through an egress proxy",
+    ["platform", "proxy"]
+)
+PROXY_OUTCOMES_TOTAL = Counter(
+    "smd_proxy_outcomes_total",
+    "Results of requests and health checks through an egress proxy",
+    ["platform", "proxy", "outcome"]
+)
+PROXY_EVICTIONS_TOTAL = Counter(
+    "smd_proxy_evictions_total",
+    "Egress proxies taken out of rotation after repeated failures",
+    ["platform", "proxy"]
+)
+PROXY_HEALTHY = Gauge(
+    "smd_proxy_healthy",
+    "Egress proxies currently in rotation",
+    ["platform"]
+)
+PROXY_LATENCY_SECONDS = Gauge(
+    "smd_proxy_latency_seconds",
+    "Smoothed health check latency through an egress proxy",
+    ["proxy"]
+)
+
+# Completion webhooks
+WEBHOOK_DELIVERIES_TOTAL = Counter(
+    "smd_webhook_deliveries_total",
+    "Webhook delivery attempts by result (delivered, retried, dead_lettered)",
+    ["result"]
+)
+WEBHOOK_DELIVERY_SECONDS = Histogram(
+    "smd_webhook_delivery_duration_seconds",
+    "Round trip of successful webhook deliveries",
+    buckets=HTTP_BUCKETS
+)
+WEBHOOK_QUEUE_DEPTH = Gauge(
+    "smd_webhook_queue_depth",
+    "Webhook events waiting to be sent or retried"
+)
+
+# Download workers (python -m app.worker)
+JOB_QUEUE_DEPTH = Gauge(
+    "smd_job_queue_depth",
+    "Jobs waiting in the shared database queue"
+)
+WORKER_HEARTBEATS_TOTAL = Counter(
+    "smd_worker_heartbeats_total",
+    "Heartbeats sent by this worker"
+)
+JOBS_REQUEUED_TOTAL = Counter(
+    "smd_jobs_requeued_total",
+    "Jobs handed back to the queue",
+    ["reason"]
+)
+
+# Write-behind buffer of job status rows (workers)
+STATUS_BUFFER_PENDING = Gauge(
+    "smd_status_buffer_pending",
+    "Jobs with a status snapshot waiting to be written"
+)
+STATUS_UPDATES_TOTAL = Counter(
+    "smd_status_updates_total",
+    "Status snapshots handed to the write-behind buffer by outcome",
+    ["result"]
+)
+STATUS_BUFFER_FULL_TOTAL = Counter(
+    "smd_status_buffer_full_total",
+    "Times a producer had to wait for a flush because the buffer was full"
+)
+STATUS_FLUSH_SECONDS = Histogram(
+    "smd_status_flush_duration_seconds",
+    "Time to write one batch of status snapshots",
+    buckets=HTTP_BUCKETS
+)
+STATUS_FLUSH_BATCH_SIZE = Histogram(
+    "smd_status_flush_batch_size",
+    "Job rows written per status flush",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+)
+STATUS_FLUSH_ERRORS_TOTAL = Counter(
+    "smd_status_flush_errors_total",
+    "Status flushes that failed and were retried"
+)
+
+# Event loop health
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "smd_event_loop_lag_seconds",
+    "How late the event loop woke up a scheduled callback",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+EVENT_LOOP_LAG_LAST = Gauge(
+    "smd_event_loop_lag_last_seconds",
+    "Most recent event loop lag sample"
+)
+
+class CacheCollector:
+    """
+    Exposes hit/miss counters and sizes of registered TTL caches
+    """
+    def __init__(self):
+        self.caches: Dict[str, object] = {}
+
+    def collect(self):
+        requests = CounterMetricFamily(
+            "smd_cache_requests", "Cache lookups by result", labels=["cache", "result"]
+        )
+        entries = GaugeMetricFamily(
+            "smd_cache_entries", "Entries currently held in the cache", labels=["cache"]
+        )
+        for name, cache in self.caches.items():
+            requests.add_metric([name, "hit"], cache.hits)
+            requests.add_metric([name, "miss"], cache.misses)
+            entries.add_metric([name], len(cache))
+        yield requests
+        yield entries
+
+_cache_collector = CacheCollector()
+REGISTRY.register(_cache_collector)
+
+def register_cache(name: str, cache) -> None:
+    """
+    Track hit rate and size of a cache exposing hits, misses and __len__
+    """
+    _cache_collector.caches[name] = cache
+
+async def monitor_event_loop_lag(interval: float = 0.5):
+    """
+    Sample event loop lag forever; run as a background task
+    """
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - started - interval)
+        EVENT_LOOP_LAG_SECONDS.observe(lag)
+        EVENT_LOOP_LAG_LAST.set(lag)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, UniqueConstraint
+from datetime import datetime
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -38,3 +39,72 @@ class Download(Base):
     
     # Relationships
     user = relationship("User", back_populates="downloads")
+
+class DownloadJob(Base):
+    __tablename__ = "download_jobs"
+
+    id = Column(String(36), primary_key=True)
+    url = Column(Text, nullable=False)
+    platform = Column(String(50), nullable=False)
+    quality = Column(String(20), default="best")
+    audio_only = Column(Boolean, default=False)
+    status = Column(String(20), default="queued", index=True)  # queued, claimed, downloading, retrying, completed, failed, cancelling, cancelled
+    status_data = Column(Text, nullable=True)  # JSON snapshot of the live status dict
+    worker_id = Column(String(100), nullable=True, index=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class SyncSource(Base):
+    __tablename__ = "sync_sources"
+
+    id = Column(Integer, primary_key=True, index=True)
+    source_key = Column(String(500), unique=True, index=True, nullable=False)  # canonical profile/playlist URL
+    url = Column(Text, nullable=False)
+    platform = Column(String(50), nullable=False)
+    newest_item_id = Column(String(100), nullable=True)  # watermark: newest item seen on the last sync
+    reached_end = Column(Boolean, default=False)  # the last sync covered the whole feed, so the next may stop early
+    item_count = Column(Integer, default=0)
+    last_synced_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relationships
+    entries = relationship("SyncArchiveEntry", back_populates="source")
+
+class SyncArchiveEntry(Base):
+    __tablename__ = "sync_archive"
+    __table_args__ = (UniqueConstraint("source_id", "item_id", name="uq_sync_archive_item"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    source_id = Column(Integer, ForeignKey("sync_sources.id"), nullable=False, index=True)
+    item_id = Column(String(100), nullable=False)
+    download_id = Column(String(36), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relationships
+    source = relationship("SyncSource", back_populates="entries")
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (UniqueConstraint("scope", "key", name="uq_idempotency_key"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String(100), nullable=False)  # user:<id> or client:<address>
+    key = Column(String(255), nullable=False)
+    fingerprint = Column(String(64), nullable=False)  # sha256 of the request body
+    response = Column(Text, nullable=True)  # JSON response; NULL while the first request is still running
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class WebhookDeadLetter(Base):
+    __tablename__ = "webhook_dead_letters"
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(String(36), nullable=False, index=True)
+    event_type = Column(String(50), nullable=False)  # download.completed, download.failed, download.cancelled
+    download_id = Column(String(36), nullable=True, index=True)
+    callback_url = Column(Text, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON event body as it was sent
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -1,13 +1,24 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Header, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, ORJSONResponse, RedirectResponse, StreamingResponse
 from pydantic import BaseModel, HttpUrl
-from typing import Optional, List
+from typing import Dict, Optional, List
+import asyncio
 import re
 import uuid
 import os
+import mimetypes
 from pathlib import Path
-from app.utils.helpers import detect_platform
+from urllib.parse import quote
+from app import metrics
+from app.auth import get_optional_user
+from app.models import User
+from app.schemas import DownloadHistoryPage, DownloadStatusSummary
+from app.utils.idempotency import IdempotencyConflict, IdempotencyStore, MAX_KEY_LENGTH, request_fingerprint
+from app.utils.helpers import decode_status_cursor, detect_platform, encode_status_cursor, status_digest, summarize_status
+from app.utils.responses import json_response
 from app.services.download_service import DownloadService
+from app.services.webhooks import CallbackNotAllowed
 
 router = APIRouter()
 
@@ -16,6 +27,33 @@ class DownloadRequest(BaseModel):
     quality: Optional[str] = "best"
     platform: Optional[str] = None
     audio_only: Optional[bool] = False
+    callback_url: Optional[HttpUrl] = None
+    # Keep the complete yt-dlp info dict (gzip-compressed) with the job's files
+    save_info: Optional[bool] = False
+
+class ProbeRequest(BaseModel):
+    url: HttpUrl
+    platform: Optional[str] = None
+
+class SyncRequest(BaseModel):
+    url: HttpUrl
+    quality: Optional[str] = "best"
+    platform: Optional[str] = None
+    audio_only: Optional[bool] = False
+    max_items: Optional[int] = None
+
+class CancelRequest(BaseModel):
+    ids: List[str]
+
+class StatusRequest(BaseModel):
+    ids: List[str]
+    cursor: Optional[str] = None
+
+class BandwidthSettings(BaseModel):
+    limit: Optional[int] = None
+    tier_limits: Optional[Dict[str, int]] = None
+    short_clip_seconds: Optional[float] = None
+    short_clip_weight: Optional[float] = None
 
 class DownloadResponse(BaseModel):
     id: str
@@ -28,11 +66,68 @@ class DownloadResponse(BaseModel):
 # Initialize the actual download service
 download_service = DownloadService()
 
+# Responses of POST /download by Idempotency-Key, so client retries don't start duplicate jobs
+idempotency_store = IdempotencyStore(
+    ttl=float(os.getenv("IDEMPOTENCY_TTL", "86400")),
+    pending_timeout=float(os.getenv("IDEMPOTENCY_PENDING_TIMEOUT", "60"))
+)
+
+def idempotency_scope(http_request: Request, current_user: Optional[User]) -> str:
+    """
+    Namespace of a caller's Idempotency-Keys: the user, or the client address for anonymous callers
+
+    Behind a reverse proxy, run uvicorn with --proxy-headers so the address
+    is the caller's rather than the proxy's.
+    """
+    if current_user is not None:
+        return f"user:{current_user.id}"
+    return f"client:{http_request.client.host if http_request.client else 'unknown'}"
+
 @router.post("/download", response_model=DownloadResponse)
-async def download_content(request: DownloadRequest, background_tasks: BackgroundTasks):
+async def download_content(
+    request: DownloadRequest,
+    background_tasks: BackgroundTasks,
+    response: Response,
+    http_request: Request,
+    current_user: Optional[User] = Depends(get_optional_user),
+    idempotency_key: Optional[str] = Header(None)
+):
     """
     Download content from social media platforms
+    
+    Signed-in users' jobs get the bandwidth cap of their subscription type.
+    With a `callback_url`, a signed event is posted there when the job
+    completes, fails or is cancelled; it needs WEBHOOK_SECRET, and private
+    or local hosts are refused unless WEBHOOK_ALLOWED_HOSTS lists them.
+    A request repeated with the same Idempotency-Key gets the original job back
+    instead of starting another one.
     """
+    if request.callback_url:
+        if not download_service.webhooks.enabled:
+            raise HTTPException(status_code=400, detail="Callbacks are disabled: WEBHOOK_SECRET is not set")
+        try:
+            await download_service.webhooks.check_url(str(request.callback_url))
+        except CallbackNotAllowed as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except OSError:
+            raise HTTPException(status_code=400, detail="Callback host does not resolve")
+    
+    scope = None
+    if idempotency_key is not None:
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+        # Keys are per caller, so two clients picking the same key don't collide
+        scope = idempotency_scope(http_request, current_user)
+        fingerprint = request_fingerprint(request.model_dump())
+        try:
+            original = await idempotency_store.begin(scope, idempotency_key, fingerprint)
+        except IdempotencyConflict:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        if original is not None:
+            metrics.IDEMPOTENT_REPLAYS_TOTAL.inc()
+            response.headers["Idempotent-Replayed"] = "true"
+            return DownloadResponse(**original)
+    
     try:
         # Detect platform if not provided
         if not request.platform:
@@ -43,54 +138,219 @@ async def download_content(request: DownloadRequest, background_tasks: Backgroun
         
         # Generate download ID
         download_id = str(uuid.uuid4())
+        tier = current_user.subscription_type if current_user else None
+        callback_url = str(request.callback_url) if request.callback_url else None
         
-        # Start actual download in background
-        background_tasks.add_task(
-            download_service.download_content,
-            download_id,
-            str(request.url),
-            request.platform,
-            request.quality,
-            request.audio_only
-        )
+        if download_service.job_queue:
+            # Hand the job to a separate download worker process
+            await run_in_threadpool(
+                download_service.job_queue.enqueue,
+                download_id,
+                str(request.url),
+                request.platform,
+                request.quality,
+                request.audio_only,
+                tier,
+                callback_url,
+                request.save_info
+            )
+        else:
+            # Start actual download in background
+            metrics.DOWNLOADS_QUEUED.labels(request.platform).inc()
+            background_tasks.add_task(
+                download_service.download_content,
+                download_id,
+                str(request.url),
+                request.platform,
+                request.quality,
+                request.audio_only,
+                tier,
+                callback_url,
+                request.save_info
+            )
         
-        return DownloadResponse(
+        result = DownloadResponse(
             id=download_id,
             url=str(request.url),
             platform=request.platform,
             status="started"
         )
+        if scope is not None:
+            await run_in_threadpool(idempotency_store.complete, scope, idempotency_key, result.model_dump())
+        return result
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if scope is not None:
+            # No-op once completed; frees the key of a failed or cancelled request for its retry
+            await asyncio.shield(run_in_threadpool(idempotency_store.abandon, scope, idempotency_key))
+
+@router.get("/stream")
+async def stream_content(
+    url: HttpUrl,
+    platform: Optional[str] = None,
+    quality: str = "best",
+    save_info: bool = False,
+    current_user: Optional[User] = Depends(get_optional_user)
+):
+    """
+    Download a video and stream it to the client at the same time
+
+    Only single-file progressive formats can be passed through; anything
+    that needs merging or is fragmented gets a 409 and should go through
+    POST /download instead. The file is also saved as a regular download,
+    whose id is returned in the X-Download-Id header.
+    """
+    platform = platform or detect_platform(str(url))
+    if not platform:
+        raise HTTPException(status_code=400, detail="Unsupported platform")
+    
+    download_id = str(uuid.uuid4())
+    try:
+        passthrough = await download_service.open_passthrough(
+            download_id, str(url), platform, quality, current_user.subscription_type if current_user else None, save_info
+        )
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Failed to start stream: {str(e)}")
+    
+    if passthrough is None:
+        raise HTTPException(status_code=409, detail="No progressive format available for streaming; use POST /download")
+    
+    headers = {
+        "X-Download-Id": download_id,
+        # Titles are often non-ASCII (emoji), which plain header values can't carry
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(passthrough['filename'])}"
+    }
+    if passthrough["content_length"] is not None:
+        headers["Content-Length"] = str(passthrough["content_length"])
+    return StreamingResponse(
+        passthrough["stream"].iter_chunks(),
+        media_type=mimetypes.guess_type(passthrough["filename"])[0] or "application/octet-stream",
+        headers=headers
+    )
+
+@router.post("/probe")
+async def probe_content(request: ProbeRequest):
+    """
+    Extract metadata (title, duration, formats) without downloading
+    """
+    try:
+        platform = request.platform or detect_platform(str(request.url))
+        if not platform:
+            raise HTTPException(status_code=400, detail="Unsupported platform")
         
+        # Native extractors are async; yt-dlp is blocking, keep it off the event loop
+        await download_service.prefetch_info(str(request.url), platform)
+        return await run_in_threadpool(download_service.probe, str(request.url), platform)
+        
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/download/{download_id}")
-async def get_download_status(download_id: str):
+@router.get("/download/{download_id}", response_model=DownloadStatusSummary, response_class=ORJSONResponse)
+async def get_download_status(download_id: str, full: bool = False):
     """
     Get download status and progress
+    
+    Returns a summary by default; `?full=true` returns the whole status
+    record (description, per-item details, storage keys, ...).
     """
     try:
         status = download_service.get_download_status(download_id)
         if not status:
             raise HTTPException(status_code=404, detail="Download not found")
-        return status
+        # A ready response skips jsonable_encoder and response-model validation on this hot path
+        return ORJSONResponse(status if full else summarize_status(status))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/downloads")
-async def get_download_history():
+@router.post("/downloads/status", response_class=ORJSONResponse)
+async def get_download_statuses(request: StatusRequest, http_request: Request):
+    """
+    Compact statuses of many downloads in one call
+    
+    Pass the `cursor` of the previous response to get only the jobs that
+    changed since then; when none did, `downloads` is empty and the cursor
+    comes back unchanged. Unknown ids are reported with status "not_found".
+    """
+    if len(request.ids) > 500:
+        raise HTTPException(status_code=400, detail="At most 500 ids per request")
+    
+    statuses = await download_service.get_download_statuses(request.ids)
+    records = [download_service.compact_status(download_id, statuses.get(download_id)) for download_id in dict.fromkeys(request.ids)]
+    digests = [status_digest(record) for record in records]
+    
+    seen = decode_status_cursor(request.cursor) if request.cursor else set()
+    changed = [record for record, digest in zip(records, digests) if digest not in seen]
+    
+    return json_response(
+        http_request,
+        {"downloads": changed, "cursor": encode_status_cursor(digests)},
+        headers={"Cache-Control": "no-cache"}
+    )
+
+@router.delete("/download/{download_id}", status_code=202)
+async def cancel_download(download_id: str):
+    """
+    Cancel a queued or running download
+    
+    The transfer (or ffmpeg step) stops at its next progress tick, partial
+    files are deleted and the job's slot is freed; poll the status until it
+    says "cancelled".
+    """
+    status = await download_service.cancel_download(download_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Download not found")
+    if status["status"] in ("completed", "failed"):
+        raise HTTPException(status_code=409, detail=f"Download already {status['status']}")
+    return status
+
+@router.post("/downloads/cancel")
+async def cancel_downloads(request: CancelRequest):
+    """
+    Cancel several downloads at once
+    """
+    if len(request.ids) > 500:
+        raise HTTPException(status_code=400, detail="At most 500 ids per request")
+    results = await download_service.cancel_downloads(request.ids)
+    return {
+        "results": {download_id: status or "not_found" for download_id, status in results.items()},
+        "cancelled": sum(1 for status in results.values() if status in ("cancelling", "cancelled"))
+    }
+
+@router.get("/downloads", response_model=DownloadHistoryPage, response_class=ORJSONResponse)
+async def get_download_history(request: Request, limit: Optional[int] = None, offset: int = 0, full: bool = False):
     """
     Get download history
+    
+    Summaries by default (`?full=true` for whole records), optionally one
+    page at a time with `limit`/`offset`. Large pages are brotli- or
+    gzip-compressed when the client accepts it.
     """
     try:
-        return download_service.get_download_history()
+        history = download_service.get_download_history()
+        downloads = history["downloads"][offset:offset + limit if limit else None]
+        if not full:
+            downloads = [summarize_status(status) for status in downloads]
+        return json_response(request, {"downloads": downloads, "total": history["total"]})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Media files /files looks for in a job directory
+VIDEO_EXTENSIONS = ['.mp4', '.webm', '.mkv', '.avi', '.mov']
+AUDIO_EXTENSIONS = ['.mp3', '.m4a', '.opus', '.aac', '.wav']
+
 @router.get("/files/{download_id}")
-async def download_file(download_id: str):
+async def download_file(download_id: str, request: Request):
     """
     Download the actual file after it's been processed
+    
+    Jobs kept in remote storage redirect to a presigned URL (or are proxied
+    with Range support when presigning is disabled).
     """
     try:
         status = download_service.get_download_status(download_id)
@@ -104,22 +364,30 @@ async def download_file(download_id: str):
         if not file_path:
             raise HTTPException(status_code=404, detail="File path not found")
         
+        # Multi-item posts serve their first item here; the rest via /items/{index}
+        if status.get("items"):
+            return await item_file_response(status, 1, request)
+        
+        # Check if it's an audio download
+        is_audio = status.get("audio_only", False)
+        
+        stored = stored_objects(status)
+        if stored:
+            extensions = AUDIO_EXTENSIONS + VIDEO_EXTENSIONS if is_audio else VIDEO_EXTENSIONS
+            for ext in extensions:
+                for name in stored:
+                    if name.endswith(ext):
+                        return await stored_file_response(stored[name], name, request)
+        
         # Find the actual file in the directory
         download_dir = Path(file_path)
         if not download_dir.exists():
             raise HTTPException(status_code=404, detail="Download directory not found")
         
-        # Look for video and audio files
-        video_extensions = ['.mp4', '.webm', '.mkv', '.avi', '.mov']
-        audio_extensions = ['.mp3', '.m4a', '.opus', '.aac', '.wav']
-        
-        # Check if it's an audio download
-        is_audio = status.get("audio_only", False)
-        
         if is_audio:
             # Look for audio files first
             audio_files = []
-            for ext in audio_extensions:
+            for ext in AUDIO_EXTENSIONS:
                 audio_files.extend(download_dir.glob(f"*{ext}"))
             
             if audio_files:
@@ -132,7 +400,7 @@ async def download_file(download_id: str):
         
         # Look for video files
         video_files = []
-        for ext in video_extensions:
+        for ext in VIDEO_EXTENSIONS:
             video_files.extend(download_dir.glob(f"*{ext}"))
         
         if not video_files:
@@ -146,9 +414,279 @@ async def download_file(download_id: str):
             media_type='video/mp4'
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def stored_objects(status: dict) -> dict:
+    """
+    File name -> storage key for jobs uploaded to remote storage
+    """
+    return (status.get("storage") or {}).get("objects") or {}
+
+def parse_range(header: Optional[str], size: int) -> Optional[tuple]:
+    """
+    (start, end) of a single `bytes=` range, clamped to the object size
+    """
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", header or "")
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    if match.group(1):
+        start = int(match.group(1))
+        end = min(int(match.group(2) or size - 1), size - 1)
+    else:
+        start, end = max(0, size - int(match.group(2))), size - 1
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Requested range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+async def stored_file_response(key: str, filename: str, request: Request):
+    """
+    Serve an object from remote storage: redirect to a presigned URL, or proxy it
+    """
+    storage = download_service.storage
+    if download_service.presign_expires:
+        url = storage.presigned_url(key, download_service.presign_expires, filename=filename)
+        if url:
+            # Clients fetch straight from the bucket; the API never touches the bytes
+            return RedirectResponse(url, status_code=307)
+    
+    stat = await storage.stat(key)
+    if stat is None:
+        raise HTTPException(status_code=404, detail="Stored file not found")
+    size = stat["size"]
+    byte_range = parse_range(request.headers.get("range"), size)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}"
+    }
+    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(storage.stream(key), media_type=media_type, headers=headers)
+    
+    start, end = byte_range
+    headers.update({"Content-Length": str(end - start + 1), "Content-Range": f"bytes {start}-{end}/{size}"})
+    return StreamingResponse(storage.stream(key, start, end), status_code=206, media_type=media_type, headers=headers)
+
+async def item_file_response(status: dict, index: int, request: Request):
+    """
+    Response for one item of a multi-item download
+    """
+    items = status.get("items") or []
+    if index < 1 or index > len(items):
+        raise HTTPException(status_code=404, detail="Item not found")
+    
+    item = items[index - 1]
+    if item.get("status") != "completed" or not item.get("filename"):
+        raise HTTPException(status_code=400, detail="Item not completed")
+    
+    item_path = Path(item["filename"])
+    stored = stored_objects(status)
+    if item_path.name in stored:
+        return await stored_file_response(stored[item_path.name], item_path.name, request)
+    if not item_path.exists():
+        raise HTTPException(status_code=404, detail="Item file not found")
+    
+    return FileResponse(
+        path=str(item_path),
+        filename=item_path.name,
+        media_type=mimetypes.guess_type(item_path.name)[0] or "application/octet-stream"
+    )
+
+@router.get("/files/{download_id}/items")
+async def list_download_items(download_id: str):
+    """
+    List the individual items of a multi-item download (carousel, story set, ...)
+    """
+    status = download_service.get_download_status(download_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Download not found")
+    
+    items = status.get("items") or []
+    return {
+        "id": download_id,
+        "items": [
+            {
+                "index": item["index"],
+                "title": item.get("title"),
+                "status": item.get("status"),
+                "progress": item.get("progress"),
+                "filename": Path(item["filename"]).name if item.get("filename") else None,
+                "url": f"/api/v1/files/{download_id}/items/{item['index']}"
+            }
+            for item in items
+        ],
+        "total": len(items)
+    }
+
+@router.get("/files/{download_id}/items/{index}")
+async def download_item_file(download_id: str, index: int, request: Request):
+    """
+    Download a single item of a multi-item download
+    """
+    status = download_service.get_download_status(download_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Download not found")
+    return await item_file_response(status, index, request)
+
+@router.get("/files/{download_id}/thumbnail")
+async def download_thumbnail(download_id: str):
+    """
+    Redirect to a completed download's preview image, generating it if needed
+    """
+    status = download_service.get_download_status(download_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Download not found")
+    
+    key = await download_service.ensure_thumbnail(download_id)
+    if not key:
+        raise HTTPException(status_code=404, detail="No thumbnail available")
+    
+    # The job -> image mapping may still change (e.g. regenerated), so keep this short-lived
+    return RedirectResponse(
+        f"/api/v1/thumbnails/{key}",
+        status_code=307,
+        headers={"Cache-Control": "public, max-age=300"}
+    )
+
+@router.get("/thumbnails/{key}")
+async def get_thumbnail(key: str):
+    """
+    Serve a cached preview image; keys are content hashes, so responses never change
+    """
+    path = download_service.thumbnails.path_for(key)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    return FileResponse(
+        path=str(path),
+        media_type=mimetypes.guess_type(path.name)[0] or "image/jpeg",
+        headers={
+            "Cache-Control": "public, max-age=31536000, immutable",
+            "ETag": f'"{key.split(".")[0]}"'
+        }
+    )
+
+@router.post("/sync")
+async def sync_source(request: SyncRequest, background_tasks: BackgroundTasks):
+    """
+    Download the new items of a profile or playlist
+
+    Items archived by earlier syncs of the same source are skipped.
+    """
+    platform = request.platform or detect_platform(str(request.url))
+    if not platform:
+        raise HTTPException(status_code=400, detail="Unsupported platform")
+    
+    sync_id = str(uuid.uuid4())
+    background_tasks.add_task(
+        download_service.sync_source,
+        sync_id,
+        str(request.url),
+        platform,
+        request.quality,
+        request.audio_only,
+        request.max_items
+    )
+    return {
+        "id": sync_id,
+        "url": str(request.url),
+        "platform": platform,
+        "status": "started"
+    }
+
+@router.get("/sync")
+async def list_sync_sources():
+    """
+    List synced profiles/playlists with their watermark
+    """
+    sources = await run_in_threadpool(download_service.sync_archive.list_sources)
+    return {"sources": sources, "total": len(sources)}
+
+@router.get("/sync/{sync_id}")
+async def get_sync_status(sync_id: str):
+    """
+    Get progress of a profile/playlist sync
+    """
+    status = download_service.get_sync_status(sync_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Sync not found")
+    return status
+
+@router.delete("/sync/{sync_id}")
+async def cancel_sync(sync_id: str):
+    """
+    Stop a profile/playlist sync and cancel the downloads it scheduled
+    """
+    status = await download_service.cancel_sync(sync_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Sync not found")
+    return status
+
+@router.get("/bandwidth")
+async def get_bandwidth():
+    """
+    Current bandwidth budget and the rate of every transferring job in this process
+    """
+    return {
+        **download_service.bandwidth.settings(),
+        "jobs": download_service.bandwidth.allocations()
+    }
+
+@router.put("/bandwidth")
+async def update_bandwidth(request: BandwidthSettings):
+    """
+    Change the bandwidth budget without a restart
+    
+    Limits are in bytes/s, 0 means unlimited; omitted fields keep their
+    value. Download workers sharing the downloads directory pick the change
+    up within a few seconds.
+    """
+    limits = [request.limit, request.short_clip_seconds, *(request.tier_limits or {}).values()]
+    if any(value is not None and value < 0 for value in limits):
+        raise HTTPException(status_code=400, detail="Bandwidth limits can't be negative")
+    if request.short_clip_weight is not None and request.short_clip_weight <= 0:
+        raise HTTPException(status_code=400, detail="short_clip_weight must be positive")
+    return await run_in_threadpool(
+        download_service.bandwidth.update,
+        request.limit,
+        request.tier_limits,
+        request.short_clip_seconds,
+        request.short_clip_weight
+    )
+
+@router.delete("/bandwidth")
+async def reset_bandwidth():
+    """
+    Drop runtime changes and go back to the configured bandwidth budget
+    """
+    return await run_in_threadpool(download_service.bandwidth.reset)
+
+@router.get("/proxies")
+async def get_proxies():
+    """
+    Health of the egress proxy pools in this process
+    """
+    return download_service.proxies.snapshot()
+
+@router.get("/webhooks/dead-letters")
+async def list_dead_letters(limit: int = 100, offset: int = 0):
+    """
+    Webhook events that could not be delivered, newest first
+    """
+    limit = max(1, min(limit, 500))
+    return await run_in_threadpool(download_service.webhooks.dead_letters.list, limit, max(0, offset))
+
+@router.post("/webhooks/dead-letters/{dead_letter_id}/redeliver", status_code=202)
+async def redeliver_dead_letter(dead_letter_id: int):
+    """
+    Send a dead-lettered webhook event again (same event id, fresh attempts)
+    """
+    if not await download_service.webhooks.redeliver(dead_letter_id):
+        raise HTTPException(status_code=404, detail="Dead letter not found")
+    return {"id": dead_letter_id, "status": "queued"}
+
 @router.get("/platforms")
 async def get_supported_platforms():
     """
@@ -188,67 +726,28 @@ async def test_instagram_download(request: DownloadRequest):
         if not request.platform or request.platform != "instagram":
             raise HTTPException(status_code=400, detail="This endpoint is for Instagram only")
         
-        # Generate download ID
-        download_id = str(uuid.uuid4())
-        
-        # Test the download with more verbose logging
-        import yt_dlp
-        
-        ydl_opts = {
-            "format": "best",
-            "verbose": True,
-            "no_warnings": False,
-            "quiet": False,
-            "extract_flat": False,
-            "nocheckcertificate": True,
-            "user_agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            "http_headers": {
-                "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
-                "Accept-Language": "en-US,en;q=0.9",
-                "Accept-Encoding": "gzip, deflate, br",
-                "DNT": "1",
-                "Connection": "keep-alive",
-                "Upgrade-Insecure-Requests": "1",
-                "Sec-Fetch-Dest": "document",
-                "Sec-Fetch-Mode": "navigate",
-                "Sec-Fetch-Site": "none",
-                "Sec-Fetch-User": "?1",
-                "Cache-Control": "max-age=0"
-            },
-            "extractor_args": {
-                "instagram": {
-                    "login": None,
-                    "password": None,
-                    "api": False,
-                    "check_private": False
-                }
-            },
-            "referer": "https://www.instagram.com/",
-            "age_limit": 0
-        }
-        
-        # Test info extraction first
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            try:
-                info = ydl.extract_info(str(request.url), download=False)
-                return {
-                    "status": "success",
-                    "message": "Instagram URL is accessible",
-                    "info": {
-                        "title": info.get("title", "Unknown"),
-                        "uploader": info.get("uploader", "Unknown"),
-                        "duration": info.get("duration"),
-                        "formats": len(info.get("formats", [])),
-                        "thumbnail": info.get("thumbnail")
-                    }
-                }
-            except Exception as e:
-                return {
-                    "status": "error",
-                    "message": f"Failed to extract info: {str(e)}",
-                    "error": str(e)
+        # Test info extraction through the shared (cached) extractor
+        try:
+            await download_service.prefetch_info(str(request.url), "instagram")
+            probe = await run_in_threadpool(download_service.probe, str(request.url), "instagram")
+            info = probe["info"]
+            return {
+                "status": "success",
+                "message": "Instagram URL is accessible",
+                "info": {
+                    "title": info["title"],
+                    "uploader": info["uploader"],
+                    "duration": info["duration"],
+                    "formats": len(info["formats"]),
+                    "thumbnail": info["thumbnail"]
                 }
+            }
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": f"Failed to extract info: {str(e)}",
+                "error": str(e)
+            }
                 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
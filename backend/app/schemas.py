@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 # User schemas
@@ -60,3 +60,32 @@ class DownloadResponse(DownloadBase):
 
     class Config:
         from_attributes = True
+
+# Live download status projections (what /download/{id} and /downloads return)
+class FileInfoSummary(BaseModel):
+    title: Optional[str] = None
+    duration: Optional[float] = None
+    uploader: Optional[str] = None
+    view_count: Optional[int] = None
+    like_count: Optional[int] = None
+    thumbnail: Optional[str] = None
+
+class DownloadStatusSummary(BaseModel):
+    id: str
+    url: Optional[str] = None
+    platform: Optional[str] = None
+    status: str
+    progress: Optional[float] = None
+    message: Optional[str] = None
+    error: Optional[str] = None
+    audio_only: Optional[bool] = None
+    started_at: Optional[str] = None
+    completed_at: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    downgraded_to: Optional[str] = None
+    item_count: Optional[int] = None
+    file_info: Optional[FileInfoSummary] = None
+
+class DownloadHistoryPage(BaseModel):
+    downloads: List[DownloadStatusSummary]
+    total: int
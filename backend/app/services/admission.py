@@ -0,0 +1,188 @@
+import asyncio
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+from app import metrics
+
+# Height caps tried, best first, when a job is downgraded to fit (same formats as the quality map)
+DOWNGRADE_HEIGHTS = (2160, 1440, 1080, 720, 480, 360, 240, 180)
+
+class AdmissionDeferred(Exception):
+    """Raised inside a job's thread when it doesn't fit yet; the job waits and tries again"""
+    def __init__(self, size: int):
+        super().__init__(f"Not enough free disk space for {size} bytes")
+        self.size = size
+
+def estimate_size(info: Dict[str, Any]) -> Optional[int]:
+    """
+    Expected bytes on disk for a processed info dict (or one format), None if unknown
+
+    Uses `filesize`, then `filesize_approx`, then bitrate x duration. Split
+    selections count every format plus the merged output, which exists next
+    to its inputs until the merge is done.
+    """
+    formats = info.get("requested_formats") or [info]
+    total = 0
+    for media_format in formats:
+        size = media_format.get("filesize") or media_format.get("filesize_approx")
+        if not size and media_format.get("tbr") and info.get("duration"):
+            # tbr is in kbit/s
+            size = media_format["tbr"] * 1000 / 8 * info["duration"]
+        if not size:
+            return None
+        total += size
+    if len(formats) > 1:
+        total *= 2
+    return int(total)
+
+class AdmissionController:
+    """
+    Admits downloads against free disk space and a budget of bytes in flight
+
+    Every admitted job reserves its estimated size. A reservation shrinks
+    as the job's bytes land on disk (they then show up in the free-space
+    figure instead), and is released when the job ends. A job is admitted
+    if its size fits in the free space of `downloads_dir` minus what running
+    jobs still have to write and minus `min_free_bytes` of headroom. With
+    `max_inflight_bytes` set, the bytes running jobs still have to fetch
+    are capped as well, so a burst of huge jobs starts a few at a time
+    instead of all competing for bandwidth.
+
+    Jobs that don't fit are deferred (or downgraded to a smaller format by
+    the caller) instead of failing halfway when the disk runs full.
+    """
+    def __init__(
+        self,
+        downloads_dir: Path,
+        min_free_bytes: int = 1024 ** 3,
+        max_inflight_bytes: int = 0,
+        unknown_size: int = 100 * 1024 ** 2,
+        max_wait: float = 600.0,
+        poll_interval: float = 5.0
+    ):
+        self.downloads_dir = downloads_dir
+        self.min_free_bytes = min_free_bytes
+        self.max_inflight_bytes = max_inflight_bytes
+        # Assumed size of jobs whose formats carry no size information
+        self.unknown_size = unknown_size
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        # download_id -> (estimated size, callable returning bytes already written)
+        self._reservations: Dict[str, Tuple[int, Callable[[], int]]] = {}
+        self._lock = threading.Lock()
+        # Loop the deferred jobs wait on, and the event a release sets (loop thread only)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._changed: Optional[asyncio.Event] = None
+
+    def _outstanding(self, exclude: Optional[str] = None) -> int:
+        return sum(
+            max(0, size - written())
+            for download_id, (size, written) in self._reservations.items()
+            if download_id != exclude
+        )
+
+    def free_bytes(self) -> int:
+        """
+        Free space on the downloads volume that isn't promised to a running job
+        """
+        with self._lock:
+            return self._usable_bytes(None)
+
+    def _usable_bytes(self, exclude: Optional[str]) -> int:
+        free = shutil.disk_usage(self.downloads_dir).free
+        metrics.DISK_FREE_BYTES.set(free)
+        return free - self._outstanding(exclude) - self.min_free_bytes
+
+    def _fits(self, download_id: Optional[str], needed: int) -> bool:
+        if needed > self._usable_bytes(download_id):
+            return False
+        if self.max_inflight_bytes:
+            others = self._outstanding(download_id)
+            # A job bigger than the whole budget still runs, just alone
+            if others and others + needed > self.max_inflight_bytes:
+                return False
+        return True
+
+    def fits(self, size: int) -> bool:
+        with self._lock:
+            return self._fits(None, size)
+
+    def try_reserve(self, download_id: str, size: Optional[int], written: Callable[[], int] = lambda: 0) -> bool:
+        """
+        Reserve space for a job if it fits; a job's earlier reservation is replaced
+        """
+        size = size or self.unknown_size
+        with self._lock:
+            if not self._fits(download_id, max(0, size - written())):
+                return False
+            self._reservations[download_id] = (size, written)
+            self._report()
+            return True
+
+    def reserve(self, download_id: str, size: Optional[int], written: Callable[[], int] = lambda: 0):
+        """
+        Reserve space without an admission check (downloads that can't wait, e.g. pass-through)
+        """
+        with self._lock:
+            self._reservations[download_id] = (size or self.unknown_size, written)
+            self._report()
+
+    def release(self, download_id: str):
+        """
+        Drop a finished job's reservation and wake deferred jobs
+
+        Safe from any thread: the wake-up is handed to the loop the
+        deferred jobs wait on.
+        """
+        with self._lock:
+            if self._reservations.pop(download_id, None) is None:
+                return
+            self._report()
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            on_loop = asyncio.get_running_loop() is loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self._wake()
+            return
+        try:
+            loop.call_soon_threadsafe(self._wake)
+        except RuntimeError:
+            # The loop closed meanwhile; nobody is waiting on it any more
+            pass
+
+    def _wake(self):
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = asyncio.Event()
+
+    async def wait_for_space(self, size: int) -> bool:
+        """
+        Wait until `size` bytes fit; False after `max_wait` seconds
+
+        Re-checks whenever a reservation is released, and every
+        `poll_interval` seconds for space freed outside the service.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._changed = asyncio.Event()
+        deadline = time.monotonic() + self.max_wait
+        while not await asyncio.to_thread(self.fits, size):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=min(remaining, self.poll_interval))
+            except asyncio.TimeoutError:
+                pass
+        return True
+
+    def _report(self):
+        metrics.ADMISSION_RESERVED_BYTES.set(self._outstanding())
+        metrics.ADMISSION_RESERVATIONS.set(len(self._reservations))
@@ -0,0 +1,153 @@
+import asyncio
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, AsyncContextManager, Callable, Dict, List, Optional
+import httpx
+from app import metrics
+from app.services.bandwidth import JobThrottle
+
+# Output audio format -> source codecs that can be remuxed as-is, encoder args, ffmpeg muxer
+AUDIO_TARGETS = {
+    "mp3": (("mp3",), ["-c:a", "libmp3lame", "-q:a", "0"], "mp3"),
+    "m4a": (("mp4a", "aac"), ["-c:a", "aac", "-b:a", "192k"], "ipod"),
+    "aac": (("mp4a", "aac"), ["-c:a", "aac", "-b:a", "192k"], "adts"),
+    "opus": (("opus",), ["-c:a", "libopus", "-b:a", "160k"], "opus"),
+}
+
+# Containers ffmpeg can demux from a pipe, front to back. A plain MP4/M4A may
+# keep its moov atom at the end of the file, which needs a seekable input, so
+# m4a is only streamed when yt-dlp marks it as fragmented (DASH).
+PIPE_SAFE_EXTS = {"webm", "weba", "opus", "ogg", "oga", "mp3", "aac"}
+PIPE_SAFE_CONTAINERS = {"webm_dash", "m4a_dash"}
+
+def can_pipe(f: Dict[str, Any]) -> bool:
+    """
+    Whether ffmpeg can read format `f` from stdin without seeking
+    """
+    return f.get("container") in PIPE_SAFE_CONTAINERS or (f.get("ext") or "").lower() in PIPE_SAFE_EXTS
+
+def pick_audio_format(info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Best audio-only format that can be fetched as one plain HTTP stream and piped into ffmpeg
+    """
+    candidates = []
+    for f in info.get("formats") or []:
+        media_url = f.get("url")
+        protocol = f.get("protocol") or (media_url or "").split(":", 1)[0]
+        if not media_url or protocol not in ("http", "https") or f.get("fragments"):
+            continue
+        if f.get("vcodec") == "none" and f.get("acodec") not in (None, "none") and can_pipe(f):
+            candidates.append(f)
+    if not candidates:
+        return None
+    # yt-dlp lists formats worst to best, so bitrate ties keep the later one
+    return max(reversed(candidates), key=lambda f: f.get("abr") or f.get("tbr") or 0)
+
+def can_copy_audio(acodec: Optional[str], target: str) -> bool:
+    """
+    Whether audio in `acodec` can be remuxed into `target` without re-encoding
+    """
+    return (acodec or "").split(".")[0] in AUDIO_TARGETS[target][0]
+
+class AudioPipeline:
+    """
+    Fetch an audio-only stream and pipe it straight through ffmpeg
+
+    Upstream bytes go to ffmpeg's stdin and only the finished audio file is
+    written, so audio jobs never download the video or keep an intermediate
+    file. When the source codec already matches the requested format the
+    stream is remuxed (`-c:a copy`); real transcodes are CPU-bound and run
+    inside a slot of the postprocess budget (`transcode_slot(kind)`).
+    """
+    def __init__(self, transcode_slot: Optional[Callable[[str], AsyncContextManager]] = None):
+        self.ffmpeg = shutil.which(os.getenv("FFMPEG_PATH", "ffmpeg"))
+        self.transcode_slot = transcode_slot
+
+    @property
+    def available(self) -> bool:
+        return self.ffmpeg is not None
+
+    def can_copy(self, source_format: Dict[str, Any], target: str) -> bool:
+        return can_copy_audio(source_format.get("acodec"), target)
+
+    def ffmpeg_args(self, source_format: Dict[str, Any], target: str, output_path: Path) -> List[str]:
+        _, encoder_args, muxer = AUDIO_TARGETS[target]
+        codec_args = ["-c:a", "copy"] if self.can_copy(source_format, target) else encoder_args
+        return [
+            self.ffmpeg, "-hide_banner", "-nostdin", "-loglevel", "error",
+            "-i", "pipe:0",
+            "-vn", *codec_args,
+            "-f", muxer, "-y", str(output_path)
+        ]
+
+    async def run(
+        self,
+        client: httpx.AsyncClient,
+        source_format: Dict[str, Any],
+        headers: Dict[str, str],
+        target: str,
+        output_path: Path,
+        on_progress: Callable[[int, Optional[int]], None],
+        throttle: Optional[JobThrottle] = None
+    ) -> int:
+        """
+        Stream `source_format` through ffmpeg into `output_path`; returns bytes fetched
+
+        With a `throttle` the upstream read is paced to the job's bandwidth share.
+        """
+        mode = "copy" if self.can_copy(source_format, target) else "transcode"
+        if mode == "transcode" and self.transcode_slot is not None:
+            async with self.transcode_slot("stream_transcode"):
+                return await self._run(client, source_format, headers, target, output_path, on_progress, mode, throttle)
+        return await self._run(client, source_format, headers, target, output_path, on_progress, mode, throttle)
+
+    async def _run(self, client, source_format, headers, target, output_path, on_progress, mode, throttle=None) -> int:
+        part_path = output_path.with_name(output_path.name + ".part")
+        started = time.perf_counter()
+        received = 0
+        proc = await asyncio.create_subprocess_exec(
+            *self.ffmpeg_args(source_format, target, part_path),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        # Drain stderr concurrently so a chatty ffmpeg can never block on it
+        stderr_task = asyncio.create_task(proc.stderr.read())
+        metrics.AUDIO_PIPELINES_ACTIVE.labels(mode).inc()
+        try:
+            try:
+                async with client.stream("GET", source_format["url"], headers=headers) as response:
+                    response.raise_for_status()
+                    total = int(response.headers["content-length"]) if "content-length" in response.headers else None
+                    async for chunk in response.aiter_raw():
+                        proc.stdin.write(chunk)
+                        # Backpressure: don't read upstream faster than ffmpeg consumes
+                        await proc.stdin.drain()
+                        received += len(chunk)
+                        on_progress(received, total)
+                        if throttle is not None:
+                            await throttle.aconsume(len(chunk))
+                proc.stdin.close()
+            except (BrokenPipeError, ConnectionResetError):
+                # ffmpeg exited early; its stderr explains why
+                pass
+
+            returncode = await proc.wait()
+            stderr = (await stderr_task).decode(errors="replace").strip()
+            if returncode != 0:
+                raise RuntimeError(f"ffmpeg failed ({returncode}): {stderr[-500:] or 'no output'}")
+        except BaseException:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            stderr_task.cancel()
+            part_path.unlink(missing_ok=True)
+            raise
+        finally:
+            metrics.AUDIO_PIPELINES_ACTIVE.labels(mode).dec()
+
+        os.replace(part_path, output_path)
+        metrics.AUDIO_PIPELINE_SECONDS.labels(mode).observe(time.perf_counter() - started)
+        return received
@@ -0,0 +1,364 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from app import metrics
+from app.services.cancellation import CancelToken
+
+logger = logging.getLogger(__name__)
+
+# Tier of jobs submitted without a (known) user
+DEFAULT_TIER = "default"
+
+# Credit a job may build up while idle, so a paused transfer can't burst far past its share
+BURST_SECONDS = 0.5
+# Longest single sleep of a paced thread, so cancellation and rate changes apply quickly
+SLEEP_SLICE = 0.25
+
+def parse_tier_limits(value: Optional[str]) -> Dict[str, int]:
+    """
+    Parse "free:2000000,premium:0" into {"free": 2000000, "premium": 0}
+    """
+    limits = {}
+    for part in (value or "").split(","):
+        if not part.strip():
+            continue
+        tier, _, limit = part.partition(":")
+        limits[tier.strip()] = int(limit or 0)
+    return limits
+
+class JobThrottle:
+    """
+    Paces one job's transfer to the rate its shaper allocated to it
+
+    It is also a yt-dlp progress hook: every reported chunk is paid for by
+    sleeping the download thread until the job is back within its rate.
+    Streaming paths call `aconsume` instead.
+    """
+    def __init__(self, shaper: "BandwidthShaper", download_id: str, tier: str, cancel_token: Optional[CancelToken] = None):
+        self.shaper = shaper
+        self.download_id = download_id
+        self.tier = tier
+        self.cancel_token = cancel_token
+        self.duration: Optional[float] = None
+        # Bytes/s this job may use, 0 = unlimited
+        self.rate = 0
+        self.last_active = 0.0
+        # Monotonic time by which everything consumed so far is paid for
+        self._paid_until = 0.0
+        # Cumulative bytes last reported per file by yt-dlp
+        self._seen: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, d):
+        filename = d.get("filename")
+        if d["status"] != "downloading":
+            with self._lock:
+                self._seen.pop(filename, None)
+            return
+        downloaded = d.get("downloaded_bytes") or 0
+        with self._lock:
+            last = self._seen.get(filename)
+            self._seen[filename] = downloaded
+        # The first report of a file is the baseline; it includes bytes resumed from disk
+        if last is not None and downloaded > last:
+            self.consume(downloaded - last)
+
+    def set_rate(self, rate: int):
+        with self._lock:
+            now = time.monotonic()
+            if self._paid_until > now:
+                # Reprice the debt still being slept off at the new rate
+                self._paid_until = now + (self._paid_until - now) * self.rate / rate if self.rate and rate else now
+            self.rate = rate
+
+    def _charge(self, nbytes: int) -> Tuple[float, int]:
+        """
+        Account for `nbytes` transferred; returns the monotonic deadline to wait for and the rate it assumes
+        """
+        self.shaper.touch(self)
+        with self._lock:
+            now = time.monotonic()
+            if not self.rate:
+                self._paid_until = now
+                return now, 0
+            self._paid_until = max(self._paid_until, now - BURST_SECONDS) + nbytes / self.rate
+            return self._paid_until, self.rate
+
+    def _remaining(self, deadline: float, rate: int) -> Tuple[float, float, int]:
+        # A rate change while waiting shortens or stretches what's left of the wait
+        now = time.monotonic()
+        if rate != self.rate:
+            deadline = now + (deadline - now) * rate / self.rate if rate and self.rate else now
+            rate = self.rate
+        return deadline - now, deadline, rate
+
+    def consume(self, nbytes: int):
+        """
+        Block the calling (download) thread until `nbytes` fit into the job's rate
+        """
+        deadline, rate = self._charge(nbytes)
+        started = time.monotonic()
+        remaining, deadline, rate = self._remaining(deadline, rate)
+        while remaining > 0:
+            if self.cancel_token is not None:
+                self.cancel_token.raise_if_cancelled()
+            time.sleep(min(remaining, SLEEP_SLICE))
+            remaining, deadline, rate = self._remaining(deadline, rate)
+        if time.monotonic() - started > 0.001:
+            metrics.BANDWIDTH_THROTTLED_SECONDS_TOTAL.inc(time.monotonic() - started)
+
+    async def aconsume(self, nbytes: int):
+        """
+        `consume` for transfers running on the event loop
+        """
+        deadline, rate = self._charge(nbytes)
+        started = time.monotonic()
+        remaining, deadline, rate = self._remaining(deadline, rate)
+        while remaining > 0:
+            await asyncio.sleep(min(remaining, SLEEP_SLICE))
+            remaining, deadline, rate = self._remaining(deadline, rate)
+        if time.monotonic() - started > 0.001:
+            metrics.BANDWIDTH_THROTTLED_SECONDS_TOTAL.inc(time.monotonic() - started)
+
+class BandwidthShaper:
+    """
+    Shares one download bandwidth budget among the jobs that are transferring
+
+    Every job gets a `JobThrottle`. Jobs that moved bytes in the last
+    `idle_after` seconds split `limit` (bytes/s, 0 = unlimited) by weighted
+    max-min fairness: short clips (up to `short_clip_seconds` long) weigh
+    `short_clip_weight` times more so they finish fast, and a job never gets
+    more than its tier's cap from `tier_limits`; what capped jobs leave over
+    goes to the others. The shares are recomputed whenever a job starts or
+    stops transferring and whenever the settings change.
+
+    `update` changes the budget at runtime. Changes are saved to
+    `settings_path`, which every process sharing the downloads directory
+    (API and download workers) re-reads every `refresh_interval` seconds.
+    """
+    def __init__(
+        self,
+        limit: int = 0,
+        tier_limits: Optional[Dict[str, int]] = None,
+        short_clip_seconds: float = 120.0,
+        short_clip_weight: float = 4.0,
+        settings_path: Optional[Path] = None,
+        idle_after: float = 2.0,
+        refresh_interval: float = 5.0
+    ):
+        # Configured values; a saved settings file overrides them
+        self._defaults = {
+            "limit": limit,
+            "tier_limits": dict(tier_limits or {}),
+            "short_clip_seconds": short_clip_seconds,
+            "short_clip_weight": short_clip_weight
+        }
+        self.limit = limit
+        self.tier_limits = dict(tier_limits or {})
+        self.short_clip_seconds = short_clip_seconds
+        self.short_clip_weight = short_clip_weight
+        self.settings_path = settings_path
+        self.idle_after = idle_after
+        self.refresh_interval = refresh_interval
+        self._throttles: Dict[str, JobThrottle] = {}
+        self._active: Dict[str, JobThrottle] = {}
+        self._reported_tiers = set()
+        self._lock = threading.RLock()
+        self._settings_mtime: Optional[float] = None
+        self._next_refresh = 0.0
+        self._next_sweep = 0.0
+        self._apply(self._defaults)
+        self.refresh()
+
+    def throttle(self, download_id: str, tier: Optional[str] = None, cancel_token: Optional[CancelToken] = None) -> JobThrottle:
+        """
+        The throttle of a job, created on first use
+        """
+        with self._lock:
+            throttle = self._throttles.get(download_id)
+            if throttle is None:
+                throttle = self._throttles[download_id] = JobThrottle(self, download_id, tier or DEFAULT_TIER, cancel_token)
+            return throttle
+
+    def close(self, download_id: str):
+        """
+        Forget a finished job and hand its share to the others
+        """
+        with self._lock:
+            self._throttles.pop(download_id, None)
+            if self._active.pop(download_id, None) is not None:
+                self._rebalance()
+
+    def set_duration(self, download_id: str, duration: Optional[float]):
+        """
+        Record a job's media duration once it is known (it decides short clip priority)
+        """
+        with self._lock:
+            throttle = self._throttles.get(download_id)
+            if throttle is None or throttle.duration == duration:
+                return
+            throttle.duration = duration
+            if download_id in self._active:
+                self._rebalance()
+
+    def touch(self, throttle: JobThrottle):
+        """
+        Mark a job as transferring (called for every chunk)
+        """
+        now = time.monotonic()
+        throttle.last_active = now
+        if now >= self._next_refresh:
+            self.refresh()
+        with self._lock:
+            changed = False
+            if throttle.download_id not in self._active and throttle.download_id in self._throttles:
+                self._active[throttle.download_id] = throttle
+                changed = True
+            if now >= self._next_sweep:
+                # Jobs that stopped moving bytes (postprocessing, waiting) give their share back
+                self._next_sweep = now + self.idle_after / 2
+                for download_id, other in list(self._active.items()):
+                    if now - other.last_active > self.idle_after:
+                        del self._active[download_id]
+                        changed = True
+            if changed:
+                self._rebalance()
+
+    def _weight(self, throttle: JobThrottle) -> float:
+        if throttle.duration and throttle.duration <= self.short_clip_seconds:
+            return self.short_clip_weight
+        return 1.0
+
+    def _cap(self, throttle: JobThrottle) -> int:
+        return self.tier_limits.get(throttle.tier, self.tier_limits.get(DEFAULT_TIER, 0))
+
+    def _rebalance(self):
+        jobs = list(self._active.values())
+        rates = {}
+        if not self.limit:
+            rates = {throttle.download_id: self._cap(throttle) for throttle in jobs}
+        else:
+            # Water-filling: jobs whose cap is below their weighted share get the cap,
+            # then the rest of the budget is shared again among the others
+            remaining, pending = float(self.limit), jobs
+            while pending:
+                share = remaining / sum(self._weight(throttle) for throttle in pending)
+                capped = [
+                    throttle for throttle in pending
+                    if self._cap(throttle) and self._cap(throttle) < share * self._weight(throttle)
+                ]
+                if not capped:
+                    for throttle in pending:
+                        rates[throttle.download_id] = max(1, int(share * self._weight(throttle)))
+                    break
+                for throttle in capped:
+                    rates[throttle.download_id] = self._cap(throttle)
+                    remaining -= self._cap(throttle)
+                pending = [throttle for throttle in pending if throttle not in capped]
+
+        allocated: Dict[str, int] = {}
+        for throttle in jobs:
+            throttle.set_rate(rates[throttle.download_id])
+            allocated[throttle.tier] = allocated.get(throttle.tier, 0) + throttle.rate
+        for tier in self._reported_tiers - set(allocated):
+            metrics.BANDWIDTH_ALLOCATED_BYTES.labels(tier).set(0)
+        for tier, rate in allocated.items():
+            metrics.BANDWIDTH_ALLOCATED_BYTES.labels(tier).set(rate)
+        self._reported_tiers = set(allocated)
+        metrics.BANDWIDTH_ACTIVE_JOBS.set(len(jobs))
+
+    def _apply(self, settings: Dict[str, Any]):
+        with self._lock:
+            self.limit = int(settings["limit"])
+            self.tier_limits = {tier: int(limit) for tier, limit in settings["tier_limits"].items()}
+            self.short_clip_seconds = float(settings["short_clip_seconds"])
+            self.short_clip_weight = float(settings["short_clip_weight"])
+            metrics.BANDWIDTH_LIMIT_BYTES.set(self.limit)
+            self._rebalance()
+
+    def refresh(self):
+        """
+        Pick up settings saved by another process
+        """
+        self._next_refresh = time.monotonic() + self.refresh_interval
+        if self.settings_path is None:
+            return
+        try:
+            mtime = self.settings_path.stat().st_mtime
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._settings_mtime:
+            return
+        settings = dict(self._defaults)
+        if mtime is not None:
+            try:
+                settings.update(json.loads(self.settings_path.read_text()))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable bandwidth settings {self.settings_path}: {e}")
+        self._settings_mtime = mtime
+        self._apply(settings)
+
+    def update(
+        self,
+        limit: Optional[int] = None,
+        tier_limits: Optional[Dict[str, int]] = None,
+        short_clip_seconds: Optional[float] = None,
+        short_clip_weight: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Change the budget at runtime; unset values keep their current setting
+        """
+        settings = self.settings()
+        for key, value in (
+            ("limit", limit),
+            ("tier_limits", tier_limits),
+            ("short_clip_seconds", short_clip_seconds),
+            ("short_clip_weight", short_clip_weight)
+        ):
+            if value is not None:
+                settings[key] = value
+        if self.settings_path is not None:
+            tmp_path = self.settings_path.with_name(self.settings_path.name + ".tmp")
+            tmp_path.write_text(json.dumps(settings))
+            os.replace(tmp_path, self.settings_path)
+            self._settings_mtime = self.settings_path.stat().st_mtime
+        self._apply(settings)
+        return self.settings()
+
+    def reset(self) -> Dict[str, Any]:
+        """
+        Drop runtime changes and go back to the configured values
+        """
+        if self.settings_path is not None:
+            self.settings_path.unlink(missing_ok=True)
+        self._settings_mtime = None
+        self._apply(self._defaults)
+        return self.settings()
+
+    def settings(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "tier_limits": dict(self.tier_limits),
+                "short_clip_seconds": self.short_clip_seconds,
+                "short_clip_weight": self.short_clip_weight
+            }
+
+    def allocations(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Current rate of every transferring job
+        """
+        with self._lock:
+            return {
+                download_id: {
+                    "tier": throttle.tier,
+                    "duration": throttle.duration,
+                    "rate": throttle.rate
+                }
+                for download_id, throttle in self._active.items()
+            }
@@ -0,0 +1,173 @@
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+MANIFEST_FILE = ".manifest.json"
+# Held while linking and collecting, by every process that shares the store
+LOCK_FILE = ".lock"
+
+# Job directory entries that are bookkeeping or sidecars, not downloaded media
+SKIPPED_SUFFIXES = (".part", ".tmp", ".ytdl", ".json")
+SKIPPED_NAMES = (MANIFEST_FILE, ".checkpoint.json", "info.json.gz")
+
+class IncrementalHasher:
+    """
+    sha256 of a file that is still being written, fed as it grows
+
+    Downloads that own the write loop (pass-through) feed every chunk to
+    `update` as they write it. yt-dlp writes its files itself and its hooks
+    only report progress, so for those `update_from` reads back the bytes
+    appended since the previous call. That is a second read of every byte,
+    but one served from the page cache right after the write, spread over
+    the download, and it leaves the digest ready when the download ends
+    instead of costing a full cold read of the file afterwards.
+    """
+    def __init__(self):
+        self.sha256 = hashlib.sha256()
+        self.offset = 0
+        self._lock = threading.Lock()
+
+    def update(self, chunk: bytes):
+        with self._lock:
+            self.sha256.update(chunk)
+            self.offset += len(chunk)
+
+    def update_from(self, path: str):
+        with self._lock:
+            try:
+                with open(path, "rb") as f:
+                    f.seek(self.offset)
+                    while True:
+                        chunk = f.read(1024 * 1024)
+                        if not chunk:
+                            break
+                        self.sha256.update(chunk)
+                        self.offset += len(chunk)
+            except FileNotFoundError:
+                # Renamed from .part to its final name between two progress ticks
+                pass
+
+    def digest_for(self, path: Path) -> Optional[str]:
+        """
+        The digest, if every byte of `path` went through this hasher
+        """
+        self.update_from(str(path))
+        try:
+            return self.sha256.hexdigest() if path.stat().st_size == self.offset else None
+        except OSError:
+            return None
+
+class BlobStore:
+    """
+    Content-addressed storage for downloaded media
+
+    Finished files are stored once under `<root>/<sha[:2]>/<sha[2:4]>/<sha>`
+    and job directories hold hardlinks to them, so the same media fetched
+    through different URLs or quality aliases takes disk space once. The
+    hardlink count is the reference count: a blob whose only link is its own
+    is unreferenced and removed by `gc()`. Each job directory also gets a
+    manifest with the checksum and size of its files.
+    """
+    def __init__(self, root: Path):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        # Serializes "does the blob exist / link it" so two jobs can't race on one digest
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self):
+        # The thread lock covers this process; the lock file covers the API and
+        # worker processes sharing the store, so gc never sees a link count
+        # that is about to go up
+        with self._lock, open(self.root / LOCK_FILE, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def blob_path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    def ingest_job(self, job_dir: Path, hashers: Optional[Dict[str, IncrementalHasher]] = None) -> Dict[str, Dict]:
+        """
+        Move a finished job's media into the store and write its manifest
+
+        `hashers` maps file paths to the hashers that saw them being written;
+        other files (e.g. ffmpeg output) are hashed here.
+        """
+        manifest = self.load_manifest(job_dir)
+        for path in sorted(job_dir.iterdir()):
+            if not path.is_file() or path.name in SKIPPED_NAMES or path.name.endswith(SKIPPED_SUFFIXES):
+                continue
+            if path.name in manifest:
+                continue
+            hasher = (hashers or {}).get(str(path))
+            digest = (hasher.digest_for(path) if hasher else None) or self._hash_file(path)
+            manifest[path.name] = {
+                "sha256": digest,
+                "size": path.stat().st_size,
+                "deduplicated": self._link(path, digest)
+            }
+        self._save_manifest(job_dir, manifest)
+        return manifest
+
+    def _link(self, path: Path, digest: str) -> bool:
+        """
+        Make `path` a hardlink of its blob; returns True if the blob already existed
+        """
+        blob = self.blob_path(digest)
+        with self._locked():
+            if blob.exists():
+                # Same content is already stored: swap the job's copy for a link to it
+                tmp = path.with_name(f".{uuid.uuid4().hex}.link")
+                os.link(blob, tmp)
+                os.replace(tmp, path)
+                return True
+
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.link(path, blob)
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                    raise
+                # No hardlinks here; keep the file in the job directory, the manifest still records it
+            return False
+
+    def _hash_file(self, path: Path) -> str:
+        # Fallback for files written by ffmpeg (merges, conversions) that we couldn't hash in flight
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    def load_manifest(self, job_dir: Path) -> Dict[str, Dict]:
+        try:
+            with open(job_dir / MANIFEST_FILE) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self, job_dir: Path, manifest: Dict[str, Dict]):
+        tmp_path = job_dir / f"{MANIFEST_FILE}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, job_dir / MANIFEST_FILE)
+
+    def gc(self) -> int:
+        """
+        Delete blobs no job directory links to any more; returns bytes freed
+        """
+        freed = 0
+        with self._locked():
+            for blob in self.root.glob("*/*/*"):
+                stat = blob.stat()
+                if stat.st_nlink <= 1:
+                    blob.unlink()
+                    freed += stat.st_size
+        return freed
@@ -0,0 +1,70 @@
+import asyncio
+import functools
+import threading
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+# Dropped into a job directory when it is cancelled; running ffmpeg steps poll for it
+CANCEL_MARKER = ".cancelled"
+
+class JobCancelled(Exception):
+    """Raised inside a job's threads once the job has been cancelled"""
+
+class CancelToken:
+    """
+    Cooperative cancellation shared by a job's task, its yt-dlp threads and ffmpeg
+
+    `cancel()` sets a flag that the yt-dlp progress hooks check on every
+    tick, so a transfer stops at its next chunk. It also cancels the job's
+    asyncio task, which interrupts retry sleeps, streaming pipelines and
+    waits for a postprocess slot. Finally it drops a marker file in the job
+    directory that running ffmpeg steps poll for.
+    """
+    def __init__(self, job_dir: Path):
+        self.job_dir = job_dir
+        self.task: Optional[asyncio.Task] = None
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    @property
+    def marker_path(self) -> str:
+        return str(self.job_dir / CANCEL_MARKER)
+
+    def cancel(self):
+        """
+        Request cancellation (call from the event loop thread)
+        """
+        if self._event.is_set():
+            return
+        self._event.set()
+        try:
+            (self.job_dir / CANCEL_MARKER).touch()
+        except OSError:
+            # Job directory not created yet; nothing can be running ffmpeg in it
+            pass
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise JobCancelled("Download cancelled")
+
+    async def run_in_thread(self, fn: Callable, *args, grace: float = 30.0) -> Any:
+        """
+        `asyncio.to_thread` that waits for the thread to stop when the job is cancelled
+
+        A cancelled job's files can only be removed once its thread stopped
+        writing them; it does so at its next progress tick.
+        """
+        future = asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            await asyncio.wait({future}, timeout=grace)
+            if future.done() and not future.cancelled():
+                # Retrieve the JobCancelled so it isn't logged as unhandled
+                future.exception()
+            raise
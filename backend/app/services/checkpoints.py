@@ -0,0 +1,72 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+CHECKPOINT_FILE = ".checkpoint.json"
+
+class CheckpointStore:
+    """
+    Per-job checkpoints kept next to the job's files
+
+    The `.part` files themselves carry the downloaded bytes (yt-dlp resumes
+    them with Range requests); the checkpoint records what is needed to pick
+    the job up again: request parameters, the resolved info dict with its
+    format URLs, attempt count and bytes already on disk.
+    """
+    def __init__(self, info_ttl: float = 1800):
+        # Resolved format URLs are signed and expire; don't trust them forever
+        self.info_ttl = info_ttl
+
+    def load(self, output_path: Path) -> Dict:
+        try:
+            with open(output_path / CHECKPOINT_FILE) as checkpoint:
+                return json.load(checkpoint)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self, output_path: Path, checkpoint: Dict):
+        """
+        Atomically write the checkpoint so a crash never leaves half a file
+        """
+        checkpoint["updated_at"] = time.time()
+        tmp_path = output_path / f"{CHECKPOINT_FILE}.tmp"
+        with open(tmp_path, "w") as tmp:
+            json.dump(checkpoint, tmp)
+        os.replace(tmp_path, output_path / CHECKPOINT_FILE)
+
+    def update(self, output_path: Path, **fields) -> Dict:
+        checkpoint = self.load(output_path)
+        checkpoint.update(fields)
+        self.save(output_path, checkpoint)
+        return checkpoint
+
+    def fresh_info(self, checkpoint: Dict) -> Optional[Dict]:
+        """
+        The checkpointed info dict, if it's recent enough to reuse its format URLs
+        """
+        info = checkpoint.get("info")
+        saved_at = checkpoint.get("info_saved_at", 0)
+        if info and time.time() - saved_at < self.info_ttl:
+            return info
+        return None
+
+    def partial_files(self, output_path: Path) -> Dict[str, int]:
+        """
+        Sizes of partially downloaded files, keyed by their final filename
+        """
+        partial = {}
+        if output_path.exists():
+            for part in output_path.glob("*.part"):
+                partial[str(part)[:-len(".part")]] = part.stat().st_size
+        return partial
+
+    def iter_unfinished(self, downloads_dir: Path) -> Iterator[Dict]:
+        """
+        Checkpoints of jobs that were interrupted before reaching a final state
+        """
+        for checkpoint_path in downloads_dir.glob(f"*/*/{CHECKPOINT_FILE}"):
+            checkpoint = self.load(checkpoint_path.parent)
+            if checkpoint and checkpoint.get("state") not in ("completed", "failed"):
+                yield checkpoint
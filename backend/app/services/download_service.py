@@ -1,42 +1,274 @@
-import yt_dlp
 import os
 import asyncio
+import copy
 import json
 from datetime import datetime
-from typing import Dict, Optional, Any
+from typing import Dict, List, Optional, Any
 import aiofiles
 from pathlib import Path
 import time
+import logging
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from app import metrics
+from app.services.admission import AdmissionController, AdmissionDeferred, DOWNGRADE_HEIGHTS, estimate_size
+from app.services.audio_pipeline import AudioPipeline, can_copy_audio, pick_audio_format
+from app.services.bandwidth import BandwidthShaper, DEFAULT_TIER, JobThrottle, parse_tier_limits
+from app.services.blob_store import BlobStore, IncrementalHasher, SKIPPED_NAMES, SKIPPED_SUFFIXES
+from app.services.cancellation import CancelToken, JobCancelled
+from app.services.checkpoints import CheckpointStore
+from app.services.instagram_service import InstagramService, InstagramExtractionError
+from app.services.job_queue import JobQueue
+from app.services.media_info import MediaInfo, compact_info, save_full_info
+from app.services.passthrough import PassThroughDownload
+from app.services.postprocess import PostprocessPool
+from app.services.proxy_pool import ANY_PLATFORM, ProxyPool, Proxy, parse_proxies
+from app.services.storage import LocalStorage, create_storage
+from app.services.sync_archive import SyncArchive
+from app.services.thumbnails import ThumbnailStore
+from app.services.webhooks import WebhookDispatcher, parse_allowed_hosts
+from app.utils.cache import TTLCache
+from app.utils.helpers import canonicalize_url, format_file_size
+
+logger = logging.getLogger(__name__)
 
 class ProgressHook:
-    def __init__(self, download_id: str, download_status: Dict):
+    def __init__(
+        self,
+        download_id: str,
+        download_status: Dict,
+        platform: str = "unknown",
+        resume_from: Optional[Dict[str, int]] = None,
+        item_index: Optional[int] = None,
+        parent: Optional["ProgressHook"] = None,
+        hash_files: bool = False,
+        cancel_token: Optional[CancelToken] = None
+    ):
         self.download_id = download_id
         self.download_status = download_status
+        self.platform = platform
+        # Bytes already on disk from an earlier attempt don't count as transferred
+        self._bytes_seen = dict(resume_from or {})
+        self._started = {}
+        self.resumed_bytes = sum((resume_from or {}).values())
+        self.bytes_this_attempt = 0
+        # Set for one child of a multi-item post; progress rolls up into the parent job
+        self.item_index = item_index
+        self.parent = parent
+        # Files are checksummed as they grow (for the blob store); items share the parent's hashers
+        self.hashers = parent.hashers if parent is not None else ({} if hash_files else None)
+        self.cancel_token = parent.cancel_token if parent is not None else cancel_token
     
     def __call__(self, d):
+        # Raising from a progress hook is how a running yt-dlp transfer gets interrupted
+        self.check_cancelled()
+        
+        filename = d.get('filename')
+        
         if d['status'] == 'downloading':
+            self._started.setdefault(filename, time.perf_counter())
+            self._count_bytes(filename, d.get('downloaded_bytes') or 0)
+            self._hash(filename, d.get('tmpfilename'))
+            
             # Update progress
             if 'total_bytes' in d and d['total_bytes']:
                 progress = (d['downloaded_bytes'] / d['total_bytes']) * 100
-                self.download_status[self.download_id]["progress"] = progress
-                self.download_status[self.download_id]["message"] = f"Downloading... {progress:.1f}%"
+                self._set_progress(progress, f"Downloading... {progress:.1f}%")
             elif 'total_bytes_estimate' in d and d['total_bytes_estimate']:
                 progress = (d['downloaded_bytes'] / d['total_bytes_estimate']) * 100
-                self.download_status[self.download_id]["progress"] = progress
-                self.download_status[self.download_id]["message"] = f"Downloading... {progress:.1f}%"
+                self._set_progress(progress, f"Downloading... {progress:.1f}%")
         
         elif d['status'] == 'finished':
-            self.download_status[self.download_id]["progress"] = 100.0
-            self.download_status[self.download_id]["message"] = "Download completed, processing..."
+            total_bytes = d.get('total_bytes') or d.get('downloaded_bytes') or 0
+            self._count_bytes(filename, total_bytes)
+            self._hash(filename, filename)
+            
+            # Record per-file transfer time and average rate
+            started = self._started.pop(filename, None)
+            elapsed = d.get('elapsed') or (time.perf_counter() - started if started else None)
+            if elapsed:
+                metrics.DOWNLOAD_PHASE_SECONDS.labels(self.platform, "download").observe(elapsed)
+                if total_bytes:
+                    metrics.DOWNLOAD_THROUGHPUT.labels(self.platform).observe(total_bytes / elapsed)
+            
+            self._set_progress(100.0, "Download completed, processing...")
+    
+    @property
+    def bytes_written(self) -> int:
+        # What this job has on disk so far, for its disk space reservation
+        return self.resumed_bytes + self.bytes_this_attempt
+    
+    def check_cancelled(self):
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled()
+    
+    def _set_progress(self, progress: float, message: str):
+        status = self.download_status[self.download_id]
+        if self.item_index is None:
+            status["progress"] = progress
+            status["message"] = message
+            return
+        
+        # Parent progress is the average over all items of the post
+        items = status["items"]
+        items[self.item_index - 1]["progress"] = progress
+        overall = sum(item.get("progress") or 0.0 for item in items) / len(items)
+        finished = sum(1 for item in items if (item.get("progress") or 0.0) >= 100.0)
+        status["progress"] = overall
+        status["message"] = f"Downloading {len(items)} items ({finished} done)... {overall:.1f}%"
+    
+    def _hash(self, filename: Optional[str], written_path: Optional[str]):
+        if self.hashers is None or not filename:
+            return
+        hasher = self.hashers.get(filename)
+        if hasher is None:
+            hasher = self.hashers[filename] = IncrementalHasher()
+        hasher.update_from(written_path or filename)
+    
+    def _count_bytes(self, filename: Optional[str], downloaded_bytes: int):
+        # yt-dlp reports cumulative bytes, so only count the delta since the last tick
+        delta = downloaded_bytes - self._bytes_seen.get(filename, 0)
+        if delta > 0:
+            metrics.DOWNLOAD_BYTES_TOTAL.labels(self.platform).inc(delta)
+            self._bytes_seen[filename] = downloaded_bytes
+            self.bytes_this_attempt += delta
+            if self.parent is not None:
+                self.parent.bytes_this_attempt += delta
+
+class PostprocessorHook:
+    def __init__(self, platform: str = "unknown"):
+        self.platform = platform
+        self._started = {}
+    
+    def __call__(self, d):
+        # Time each postprocessor (merge, audio extraction, ...) separately
+        name = d.get('postprocessor')
+        if d['status'] == 'started':
+            self._started[name] = time.perf_counter()
+        elif d['status'] == 'finished' and name in self._started:
+            elapsed = time.perf_counter() - self._started.pop(name)
+            metrics.DOWNLOAD_PHASE_SECONDS.labels(self.platform, "postprocess").observe(elapsed)
 
 class DownloadService:
     def __init__(self):
-        # Use absolute path to downloads directory
+        # Use absolute path to downloads directory (overridable via DOWNLOADS_DIR)
         current_dir = Path(__file__).parent.parent.parent.parent
-        self.downloads_dir = current_dir / "downloads"
-        self.downloads_dir.mkdir(exist_ok=True)
+        self.downloads_dir = Path(os.getenv("DOWNLOADS_DIR") or current_dir / "downloads").resolve()
+        self.downloads_dir.mkdir(parents=True, exist_ok=True)
         self.download_status = {}
         
+        # Extraction results keyed by canonical URL, shared by /probe and downloads
+        self.info_cache = TTLCache(
+            ttl=float(os.getenv("PROBE_CACHE_TTL", "900")),
+            max_size=int(os.getenv("PROBE_CACHE_SIZE", "512"))
+        )
+        metrics.register_cache("probe", self.info_cache)
+        # Children of carousels / multi-item posts downloaded at the same time
+        self.item_concurrency = int(os.getenv("ITEM_CONCURRENCY", "4"))
+        
+        # Native extractors tried before falling back to the generic yt-dlp path
+        self.instagram = InstagramService()
+        self.use_native_extractors = os.getenv("NATIVE_EXTRACTORS", "true").lower() == "true"
+        
+        # Checkpoints let retries and restarted processes resume partial downloads
+        self.checkpoints = CheckpointStore(info_ttl=float(os.getenv("CHECKPOINT_INFO_TTL", "1800")))
+        
+        # With DOWNLOAD_EXECUTION=worker jobs go to the shared queue for `python -m app.worker`
+        self.job_queue = JobQueue() if os.getenv("DOWNLOAD_EXECUTION", "inline") == "worker" else None
+        
+        # Pass-through streaming reuses one pooled client for all upstream media fetches
+        self.stream_buffer_chunks = int(os.getenv("STREAM_BUFFER_CHUNKS", "16"))
+        self._stream_client = None
+        
+        # ffmpeg merges/conversions run as subprocesses with their own CPU budget after the download stage
+        self.postprocess = PostprocessPool(max_workers=int(os.getenv("POSTPROCESS_WORKERS", "0")) or None)
+        
+        # Finished media is stored once per sha256 and hardlinked into job directories
+        self.blobs = BlobStore(self.downloads_dir / ".blobs") if os.getenv("DEDUPE_STORAGE", "true").lower() == "true" else None
+        
+        # Finished files can be shipped to an S3-compatible bucket and served from there
+        self.storage = create_storage(self.downloads_dir)
+        self.remote_storage = not isinstance(self.storage, LocalStorage)
+        self.storage_keep_local = os.getenv("STORAGE_KEEP_LOCAL", "true").lower() == "true"
+        # 0 disables presigned redirects; /files then proxies the object instead
+        self.presign_expires = int(os.getenv("S3_PRESIGN_EXPIRES", "3600"))
+        
+        # Small previews in a content-hashed cache, so history pages don't hotlink platform CDNs
+        self.thumbnails = ThumbnailStore(
+            self.downloads_dir / ".thumbnails",
+            self.postprocess,
+            width=int(os.getenv("THUMBNAIL_WIDTH", "320"))
+        )
+        self.thumbnail_timeout = float(os.getenv("THUMBNAIL_TIMEOUT", "15"))
+        
+        # audio_only jobs stream audio-only formats through ffmpeg when available;
+        # their transcodes share the postprocess CPU budget
+        self.stream_audio = os.getenv("STREAM_AUDIO", "true").lower() == "true"
+        self.audio_pipeline = AudioPipeline(transcode_slot=self.postprocess.slot)
+        
+        # Profile/playlist syncs: archive of scheduled items and per-sync progress
+        self.sync_archive = SyncArchive()
+        self.sync_status = {}
+        # Feeds are newest-first; this many known items in a row means we've caught up
+        self.sync_stop_after_seen = int(os.getenv("SYNC_STOP_AFTER_SEEN", "10"))
+        # Feed entries checked against the archive per query
+        self.sync_batch_size = int(os.getenv("SYNC_BATCH_SIZE", "50"))
+        # Inline mode only: cap how many synced items download at once
+        self.sync_concurrency = int(os.getenv("SYNC_CONCURRENCY", "2"))
+        self._sync_slots = None
+        
+        # Detached tasks (synced items, pass-through finishers) kept alive until they finish
+        self._background_tasks = set()
+        
+        # Cancellation handles of queued and running jobs in this process
+        self.cancel_tokens: Dict[str, CancelToken] = {}
+        
+        # Jobs reserve their estimated size and wait (or get downgraded) when the disk is short
+        self.admission = AdmissionController(
+            self.downloads_dir,
+            min_free_bytes=int(os.getenv("DISK_MIN_FREE_BYTES", str(1024 ** 3))),
+            max_inflight_bytes=int(os.getenv("MAX_INFLIGHT_BYTES", "0")),
+            unknown_size=int(os.getenv("ADMISSION_UNKNOWN_SIZE", str(100 * 1024 ** 2))),
+            max_wait=float(os.getenv("ADMISSION_MAX_WAIT", "600"))
+        ) if os.getenv("ADMISSION_CONTROL", "true").lower() == "true" else None
+        self.admission_downgrade = os.getenv("ADMISSION_DOWNGRADE", "true").lower() == "true"
+        
+        # One bandwidth budget shared by the transferring jobs, with per-tier caps and short clips first
+        self.bandwidth = BandwidthShaper(
+            limit=int(os.getenv("BANDWIDTH_LIMIT", "0")),
+            tier_limits=parse_tier_limits(os.getenv("TIER_BANDWIDTH_LIMITS")),
+            short_clip_seconds=float(os.getenv("SHORT_CLIP_SECONDS", "120")),
+            short_clip_weight=float(os.getenv("SHORT_CLIP_WEIGHT", "4")),
+            settings_path=self.downloads_dir / ".bandwidth.json"
+        )
+        
+        # Egress proxies (EGRESS_PROXIES for every platform, EGRESS_PROXIES_<PLATFORM> per platform)
+        egress_proxies = {ANY_PLATFORM: parse_proxies(os.getenv("EGRESS_PROXIES"))}
+        for platform in ["tiktok", "instagram", "twitter", "snapchat"]:
+            egress_proxies[platform] = parse_proxies(os.getenv(f"EGRESS_PROXIES_{platform.upper()}"))
+        self.proxies = ProxyPool(
+            egress_proxies,
+            sticky_platforms=parse_proxies(os.getenv("PROXY_STICKY_PLATFORMS", "tiktok,instagram")),
+            sticky_ttl=float(os.getenv("PROXY_STICKY_TTL", os.getenv("PROBE_CACHE_TTL", "900"))),
+            max_failures=int(os.getenv("PROXY_MAX_FAILURES", "3")),
+            cooldown=float(os.getenv("PROXY_COOLDOWN", "300")),
+            check_url=os.getenv("PROXY_CHECK_URL") or None,
+            check_interval=float(os.getenv("PROXY_CHECK_INTERVAL", "30"))
+        )
+        
+        # Signed completion events for jobs submitted with a callback_url
+        self.webhooks = WebhookDispatcher(
+            secret=os.getenv("WEBHOOK_SECRET") or None,
+            allowed_hosts=parse_allowed_hosts(os.getenv("WEBHOOK_ALLOWED_HOSTS")),
+            max_attempts=int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "6")),
+            backoff_base=float(os.getenv("WEBHOOK_BACKOFF_BASE", "2")),
+            backoff_max=float(os.getenv("WEBHOOK_BACKOFF_MAX", "300")),
+            timeout=float(os.getenv("WEBHOOK_TIMEOUT", "10")),
+            concurrency=int(os.getenv("WEBHOOK_CONCURRENCY", "4"))
+        )
+        
         # Create platform-specific directories
         for platform in ["tiktok", "instagram", "twitter", "snapchat"]:
             platform_dir = self.downloads_dir / platform
@@ -48,15 +280,104 @@ class DownloadService:
         url: str, 
         platform: str, 
         quality: str = "best",
-        audio_only: bool = False
+        audio_only: bool = False,
+        tier: Optional[str] = None,
+        callback_url: Optional[str] = None,
+        save_info: bool = False
     ):
         """
         Download content from social media platforms
+        
+        The job runs in a task of its own so `cancel_download` can interrupt
+        it without touching the caller (a request's background task or a worker).
+        `tier` (the submitting user's subscription type) selects its bandwidth cap.
+        With a `callback_url`, the final status is posted there as a signed event.
+        With `save_info` the complete info dict is kept in the job directory.
+        """
+        # Set output path (stable per job, so partial files survive retries and restarts)
+        output_path = self.downloads_dir / platform / f"{download_id}"
+        token = self.cancel_tokens.setdefault(download_id, CancelToken(output_path))
+        
+        metrics.DOWNLOADS_QUEUED.labels(platform).dec()
+        if token.cancelled:
+            # Cancelled while it waited for a slot; nothing was started
+            self.cancel_tokens.pop(download_id, None)
+            self._notify(download_id, callback_url)
+            return
+        
+        metrics.DOWNLOADS_IN_FLIGHT.labels(platform).inc()
+        job_started = time.perf_counter()
+        throttle = self.bandwidth.throttle(download_id, tier, token)
+        token.task = asyncio.create_task(
+            self._download_job(download_id, url, platform, quality, audio_only, output_path, token, throttle, callback_url, save_info)
+        )
+        try:
+            final_status = await token.task
+        except asyncio.CancelledError:
+            if not token.cancelled:
+                raise
+            final_status = await self._discard_cancelled(download_id, platform, output_path)
+        finally:
+            self.cancel_tokens.pop(download_id, None)
+            if self.admission is not None:
+                self.admission.release(download_id)
+            self.bandwidth.close(download_id)
+            metrics.DOWNLOADS_IN_FLIGHT.labels(platform).dec()
+        
+        metrics.DOWNLOADS_TOTAL.labels(platform, final_status).inc()
+        metrics.DOWNLOAD_SECONDS.labels(platform, final_status).observe(time.perf_counter() - job_started)
+        
+        if final_status == "completed":
+            await self.ensure_thumbnail(download_id)
+            await self._upload_to_storage(download_id, platform, output_path)
+        self._notify(download_id, callback_url)
+    
+    def _notify(self, download_id: str, callback_url: Optional[str]):
+        """
+        Queue the completion event of a finished job, if it asked for one
+        """
+        status = self.download_status.get(download_id)
+        if callback_url and status:
+            self.webhooks.notify(callback_url, status)
+    
+    async def _download_job(
+        self,
+        download_id: str,
+        url: str,
+        platform: str,
+        quality: str,
+        audio_only: bool,
+        output_path: Path,
+        token: CancelToken,
+        throttle: JobThrottle,
+        callback_url: Optional[str] = None,
+        save_info: bool = False
+    ) -> str:
+        """
+        Run a job's attempts with retries; returns the final status
         """
         max_retries = 3
         retry_count = 0
+        output_path.mkdir(exist_ok=True)
+        
+        # Record the job so a restarted process can pick it up where it stopped
+        self.checkpoints.update(
+            output_path,
+            id=download_id,
+            url=url,
+            platform=platform,
+            quality=quality,
+            audio_only=audio_only,
+            tier=None if throttle.tier == DEFAULT_TIER else throttle.tier,
+            callback_url=callback_url,
+            save_info=save_info,
+            state="downloading"
+        )
         
         while retry_count < max_retries:
+            progress_hook = None
+            proxy = None
+            attempt_error = None
             try:
                 # Update status to downloading
                 self.download_status[download_id] = {
@@ -69,13 +390,26 @@ class DownloadService:
                     "message": f"Starting {'audio' if audio_only else 'video'} download... (attempt {retry_count + 1}/{max_retries})",
                     "audio_only": audio_only
                 }
+                if throttle.tier != DEFAULT_TIER:
+                    # Kept with the job so a worker that picks it up again applies the same cap
+                    self.download_status[download_id]["tier"] = throttle.tier
+                if callback_url:
+                    self.download_status[download_id]["callback_url"] = callback_url
+                if save_info:
+                    self.download_status[download_id]["save_info"] = True
                 
-                # Configure yt-dlp options based on platform and quality
-                ydl_opts = self._get_ydl_options(platform, quality, audio_only)
+                # Pick up bytes left behind by an earlier attempt or process
+                partial_files = self.checkpoints.partial_files(output_path)
+                resumed_bytes = sum(partial_files.values())
+                if resumed_bytes:
+                    self.download_status[download_id].update({
+                        "resumed_bytes": resumed_bytes,
+                        "message": f"Resuming {'audio' if audio_only else 'video'} download from {format_file_size(resumed_bytes)}... (attempt {retry_count + 1}/{max_retries})"
+                    })
                 
-                # Set output path
-                output_path = self.downloads_dir / platform / f"{download_id}"
-                output_path.mkdir(exist_ok=True)
+                # Configure yt-dlp options based on platform and quality, routed through an egress proxy if any
+                proxy = self.proxies.acquire(platform, canonicalize_url(url))
+                ydl_opts = self._get_ydl_options(platform, quality, audio_only, proxy)
                 
                 if audio_only:
                     # Audio-only download
@@ -88,45 +422,89 @@ class DownloadService:
                     ydl_opts["outtmpl"] = str(output_path) + "/%(title)s.%(ext)s"
                 
                 # Add progress hook
-                progress_hook = ProgressHook(download_id, self.download_status)
-                ydl_opts["progress_hooks"] = [progress_hook]
+                progress_hook = ProgressHook(
+                    download_id, self.download_status, platform,
+                    resume_from=partial_files, hash_files=self.blobs is not None, cancel_token=token
+                )
+                # The throttle paces the download threads to the job's share of the bandwidth budget
+                ydl_opts["progress_hooks"] = [progress_hook, throttle]
+                ydl_opts["postprocessor_hooks"] = [PostprocessorHook(platform)]
                 
-                # Download using yt-dlp
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    # Get info first
-                    info = ydl.extract_info(url, download=False)
-                    
-                    # Update status with file info
-                    self.download_status[download_id]["file_info"] = {
-                        "title": info.get("title", "Unknown"),
-                        "duration": info.get("duration"),
-                        "uploader": info.get("uploader", "Unknown"),
-                        "view_count": info.get("view_count"),
-                        "like_count": info.get("like_count"),
-                        "description": info.get("description", "")[:200] + "..." if info.get("description") else ""
-                    }
-                    
-                    # Download the content
-                    ydl.download([url])
+                # Resolve natively when possible so yt-dlp only has to download
+                if not self.checkpoints.fresh_info(self.checkpoints.load(output_path)):
+                    await self.prefetch_info(url, platform)
+                
+                # Audio jobs skip the video entirely when an audio-only stream exists;
+                # otherwise run the blocking yt-dlp work in a thread so the event loop stays responsive
+                streamed = audio_only and await self._try_stream_audio(
+                    download_id, url, platform, ydl_opts["audio_format"], output_path, progress_hook, throttle, proxy, save_info
+                )
+                if not streamed:
+                    plan = await token.run_in_thread(self._run_ydl, download_id, url, platform, ydl_opts, output_path, save_info)
+                    if plan:
+                        # CPU stage: the download slot is free while ffmpeg waits for/uses a pool slot
+                        self.download_status[download_id]["message"] = "Processing..."
+                        plan["cancel_marker"] = token.marker_path
+                        await self.postprocess.run_plan(plan, platform)
                 
                 # Update status to completed
+                message = f"{'Audio' if audio_only else 'Video'} download completed successfully"
+                downgraded_to = self.download_status[download_id].get("downgraded_to")
+                if downgraded_to:
+                    message += f" (downgraded to {downgraded_to} to fit free disk space)"
                 self.download_status[download_id].update({
                     "status": "completed",
                     "progress": 100.0,
                     "completed_at": datetime.now().isoformat(),
-                    "message": f"{'Audio' if audio_only else 'Video'} download completed successfully",
+                    "message": message,
                     "file_path": str(output_path)
                 })
                 
+                # The job is done, drop the bulky info dict from its checkpoint
+                self.checkpoints.update(output_path, state="completed", info=None, attempts=retry_count + 1)
+                await self._store_blobs(output_path, progress_hook.hashers)
+                
                 # Success - break out of retry loop
                 break
                 
+            except AdmissionDeferred as deferred:
+                # Not a failed attempt: the job waits for space and then starts over
+                if await self._wait_for_space(download_id, deferred.size):
+                    continue
+                error_msg = f"Not enough free disk space (needs {format_file_size(deferred.size)})"
+                metrics.ADMISSION_DECISIONS_TOTAL.labels("rejected").inc()
+                self.checkpoints.update(output_path, state="failed")
+                self.download_status[download_id].update({
+                    "status": "failed",
+                    "error": error_msg,
+                    "completed_at": datetime.now().isoformat(),
+                    "message": f"Download failed: {error_msg}"
+                })
+                break
+                
             except Exception as e:
+                attempt_error = e
+                if token.cancelled:
+                    # Don't retry a job that was asked to stop
+                    raise asyncio.CancelledError() from e
                 retry_count += 1
                 error_msg = str(e)
                 
+                # An attempt that made no progress may be failing on expired format
+                # URLs, so re-extract next time; otherwise keep them and resume
+                if progress_hook is None or progress_hook.bytes_this_attempt == 0:
+                    self.info_cache.pop(canonicalize_url(url))
+                    self.checkpoints.update(output_path, info=None)
+                self.checkpoints.update(
+                    output_path,
+                    attempts=retry_count,
+                    bytes_completed=sum(self.checkpoints.partial_files(output_path).values()),
+                    state="retrying" if retry_count < max_retries else "failed"
+                )
+                
                 # Update status with retry information
                 if retry_count < max_retries:
+                    metrics.DOWNLOAD_RETRIES_TOTAL.labels(platform).inc()
                     self.download_status[download_id].update({
                         "status": "retrying",
                         "error": error_msg,
@@ -142,13 +520,443 @@ class DownloadService:
                         "completed_at": datetime.now().isoformat(),
                         "message": f"Download failed after {max_retries} attempts: {error_msg}"
                     })
+            
+            finally:
+                # Failures caused by the exit count against its health; a retry may get another one
+                self.proxies.release(proxy, attempt_error)
+        
+        return self.download_status[download_id]["status"]
+    
+    async def _wait_for_space(self, download_id: str, size: int) -> bool:
+        """
+        Park a deferred job until its estimated size fits; False if it never did
+        """
+        self.download_status[download_id].update({
+            "status": "waiting",
+            "message": f"Waiting for disk space ({format_file_size(size)} needed)..."
+        })
+        return await self.admission.wait_for_space(size)
+    
+    async def _discard_cancelled(self, download_id: str, platform: str, output_path: Path) -> str:
+        """
+        Mark a job cancelled and delete everything it wrote
+        """
+        status = self.download_status.setdefault(download_id, {"id": download_id, "platform": platform})
+        status.update({
+            "status": "cancelled",
+            "completed_at": datetime.now().isoformat(),
+            "message": "Download cancelled"
+        })
+        # Partial files, sidecars and the checkpoint: a cancelled job is never resumed
+        await asyncio.to_thread(shutil.rmtree, output_path, True)
+        return "cancelled"
+    
+    async def cancel_download(self, download_id: str) -> Optional[Dict]:
+        """
+        Cancel a queued or running job; returns its status, or None if unknown
+        
+        Running jobs stop at their next progress tick and their files are
+        removed; the status may say "cancelling" until that happened (or,
+        with workers, until the worker's next heartbeat picks it up).
+        """
+        token = self.cancel_tokens.get(download_id)
+        if token is not None:
+            token.cancel()
+            status = self.download_status.get(download_id)
+            if status and status["status"] == "queued":
+                # Still waiting for a slot: it returns as soon as it gets one, without downloading
+                status.update({
+                    "status": "cancelled",
+                    "completed_at": datetime.now().isoformat(),
+                    "message": "Download cancelled"
+                })
+            elif status and status["status"] not in ("completed", "failed", "cancelled"):
+                status.update({"status": "cancelling", "message": "Cancelling..."})
+            return status
+        
+        if self.job_queue:
+            await asyncio.to_thread(self.job_queue.cancel, [download_id])
+        return self.get_download_status(download_id)
+    
+    async def cancel_downloads(self, download_ids: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Cancel several jobs; maps each id to its resulting status (None if unknown)
+        """
+        local = [download_id for download_id in download_ids if download_id in self.cancel_tokens]
+        remote = [download_id for download_id in download_ids if download_id not in self.cancel_tokens]
+        results = {}
+        for download_id in local:
+            status = await self.cancel_download(download_id)
+            results[download_id] = status["status"] if status else None
+        if remote and self.job_queue:
+            # One round trip for the whole batch
+            await asyncio.to_thread(self.job_queue.cancel, remote)
+        for download_id in remote:
+            status = self.get_download_status(download_id)
+            results[download_id] = status["status"] if status else None
+        return results
+    
+    def _run_ydl(
+        self,
+        download_id: str,
+        url: str,
+        platform: str,
+        ydl_opts: Dict[str, Any],
+        output_path: Path,
+        save_info: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Extract (or reuse checkpointed/cached) info and download it with yt-dlp
+        
+        Only the network part runs here. When the result still needs ffmpeg
+        (merging split formats, converting audio) a postprocess plan is
+        returned for the caller to run in the postprocess pool.
+        """
+        import yt_dlp
+        # YoutubeDL mutates the params it's given; items need a clean copy
+        item_opts = dict(ydl_opts)
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            # Prefer the format URLs this job already resolved, so partial files
+            # resume against the same media; then a probed info dict; then extract
+            cache_key = canonicalize_url(url)
+            info = self.checkpoints.fresh_info(self.checkpoints.load(output_path))
+            if info is None:
+                # Cached info is compacted; a job that keeps the full info extracts its own
+                info = None if save_info else self.info_cache.get(cache_key)
+                if info is None:
+                    extract_started = time.perf_counter()
+                    info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+                    metrics.DOWNLOAD_PHASE_SECONDS.labels(platform, "extract").observe(
+                        time.perf_counter() - extract_started
+                    )
+                    if save_info:
+                        save_full_info(output_path, info)
+                    info = compact_info(info)
+                    self.info_cache.set(cache_key, info)
+                self.checkpoints.update(output_path, info=info, info_saved_at=time.time())
+
+            # Update status with file info
+            self.download_status[download_id]["file_info"] = self._file_info(info)
+            self.bandwidth.set_duration(download_id, info.get("duration"))
+            # Extraction has no progress hooks; don't start downloading for a job cancelled meanwhile
+            progress_hook = ydl_opts["progress_hooks"][0]
+            progress_hook.check_cancelled()
+
+            # Multi-item posts (carousels, multi-image tweets, story sets) fan out
+            entries = [entry for entry in info.get("entries") or [] if entry] if info.get("_type") == "playlist" else []
+            selected = None
+            if self.admission is not None:
+                selected = self._admit(download_id, ydl, info, entries, item_opts, progress_hook)
+            if len(entries) > 1:
+                self._download_items(download_id, platform, item_opts, entries, output_path)
+                return
+            
+            # Split video/audio formats are downloaded one by one and merged in the pool
+            if self.postprocess.available:
+                selected = selected or ydl.process_ie_result(copy.deepcopy(info), download=False)
+                if selected.get("requested_formats"):
+                    return self._download_parts(item_opts, info, selected, output_path)
+            
+            # Download the content from the extracted info (no second extraction)
+            result = ydl.process_ie_result(copy.deepcopy(info), download=True)
+            if ydl_opts.get("extract_audio") and self.postprocess.available:
+                return self._audio_plan(result, ydl_opts["audio_format"])
+            return None
+    
+    def _admit(
+        self,
+        download_id: str,
+        ydl,
+        info: Dict[str, Any],
+        entries: List[Dict[str, Any]],
+        item_opts: Dict[str, Any],
+        progress_hook: ProgressHook
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Reserve disk space for a job from its estimated size before it downloads
+        
+        A video that doesn't fit is downgraded to the best smaller format
+        that does (ADMISSION_DOWNGRADE); otherwise AdmissionDeferred is
+        raised and the job waits. Returns the format selection it checked,
+        so the caller doesn't have to repeat it.
+        """
+        written = lambda: progress_hook.bytes_written
+        if len(entries) > 1:
+            selected = None
+            size = sum(estimate_size(entry) or self.admission.unknown_size for entry in entries)
+        else:
+            selected = ydl.process_ie_result(copy.deepcopy(info), download=False)
+            size = estimate_size(selected)
+        if self.admission.try_reserve(download_id, size, written):
+            metrics.ADMISSION_DECISIONS_TOTAL.labels("admitted").inc()
+            # A retry that fits at the requested quality is no longer downgraded
+            self.download_status[download_id].pop("downgraded_to", None)
+            return selected
+        
+        height = (selected or {}).get("height")
+        if height and self.admission_downgrade and not item_opts.get("extract_audio"):
+            original_format = ydl.params["format"]
+            for cap in DOWNGRADE_HEIGHTS:
+                if cap >= height:
+                    continue
+                # Same selectors as the quality map in _get_ydl_options
+                ydl.params["format"] = self._height_format(cap)
+                ydl.format_selector = ydl.build_format_selector(ydl.params["format"])
+                try:
+                    candidate = ydl.process_ie_result(copy.deepcopy(info), download=False)
+                except Exception:
+                    # No format that small
+                    break
+                if self.admission.try_reserve(download_id, estimate_size(candidate), written):
+                    metrics.ADMISSION_DECISIONS_TOTAL.labels("downgraded").inc()
+                    item_opts["format"] = ydl.params["format"]
+                    downgraded_to = f"{candidate.get('height') or cap}p"
+                    self.download_status[download_id].update({
+                        "downgraded_to": downgraded_to,
+                        "message": f"Downgraded to {downgraded_to} to fit free disk space"
+                    })
+                    return candidate
+            ydl.params["format"] = original_format
+            ydl.format_selector = ydl.build_format_selector(original_format)
+        
+        metrics.ADMISSION_DECISIONS_TOTAL.labels("deferred").inc()
+        raise AdmissionDeferred(size or self.admission.unknown_size)
+    
+    def _download_parts(self, ydl_opts: Dict[str, Any], info: Dict[str, Any], selected: Dict[str, Any], output_path: Path) -> Dict[str, Any]:
+        """
+        Download each format of a split selection separately and plan their merge
+        """
+        import yt_dlp
+        from yt_dlp.utils import sanitize_filename
+        
+        inputs = []
+        for index, part in enumerate(selected["requested_formats"]):
+            part_opts = dict(ydl_opts)
+            part_opts.update({
+                "format": part["format_id"],
+                "outtmpl": str(output_path / f"%(title)s.f{part['format_id']}.%(ext)s")
+            })
+            if index > 0:
+                # Sidecar files only need writing once
+                part_opts.update({"writesubtitles": False, "writeautomaticsub": False})
+            with yt_dlp.YoutubeDL(part_opts) as part_ydl:
+                result = part_ydl.process_ie_result(copy.deepcopy(info), download=True)
+            inputs.append(result["requested_downloads"][0]["filepath"])
+        
+        return {
+            "kind": "merge",
+            "inputs": inputs,
+            "output": str(output_path / f"{sanitize_filename(info.get('title') or info.get('id'))}.{selected.get('ext') or 'mkv'}")
+        }
+    
+    def _audio_plan(self, result: Dict[str, Any], audio_format: str) -> Optional[Dict[str, Any]]:
+        # yt-dlp only downloaded bestaudio/best; conversion to the requested format is a pool step
+        downloads = result.get("requested_downloads") or []
+        if not downloads or not downloads[0].get("filepath"):
+            return None
+        source = downloads[0]["filepath"]
+        if Path(source).suffix[1:] == audio_format:
+            return None
+        return {
+            "kind": "extract_audio",
+            "input": source,
+            "target": audio_format,
+            "output": str(Path(source).with_suffix(f".{audio_format}")),
+            "copy": can_copy_audio(result.get("acodec"), audio_format)
+        }
+    
+    def _file_info(self, info: Dict[str, Any]) -> Dict[str, Any]:
+        return MediaInfo.from_info(info).file_info()
+    
+    async def _try_stream_audio(
+        self,
+        download_id: str,
+        url: str,
+        platform: str,
+        audio_format: str,
+        output_path: Path,
+        progress_hook: ProgressHook,
+        throttle: Optional[JobThrottle] = None,
+        proxy: Optional[Proxy] = None,
+        save_info: bool = False
+    ) -> bool:
+        """
+        `_stream_audio`, falling back to yt-dlp (returns False) when the pipeline fails
+        
+        A stream ffmpeg can't demux or a dropped connection shouldn't cost the
+        job a retry of the same pipeline; yt-dlp's download + FFmpegExtractAudio
+        path reads from a file and handles any container.
+        """
+        try:
+            return await self._stream_audio(
+                download_id, url, platform, audio_format, output_path, progress_hook, throttle, proxy, save_info
+            )
+        except (JobCancelled, AdmissionDeferred):
+            raise
+        except Exception as e:
+            logger.warning(f"Audio pipeline for {download_id} failed, falling back to yt-dlp: {e}")
+            metrics.AUDIO_PIPELINE_FALLBACKS_TOTAL.labels(platform).inc()
+            if progress_hook.hashers:
+                # yt-dlp may write the same file name; don't mix in the streamed bytes
+                progress_hook.hashers.clear()
+            return False
     
-    def _get_ydl_options(self, platform: str, quality: str, audio_only: bool = False) -> Dict[str, Any]:
+    async def _stream_audio(
+        self,
+        download_id: str,
+        url: str,
+        platform: str,
+        audio_format: str,
+        output_path: Path,
+        progress_hook: ProgressHook,
+        throttle: Optional[JobThrottle] = None,
+        proxy: Optional[Proxy] = None,
+        save_info: bool = False
+    ) -> bool:
+        """
+        Fetch an audio-only stream and pipe it through ffmpeg into the job directory
+        
+        Returns False (without downloading anything) when the pipeline can't
+        handle the job: no ffmpeg, a multi-item post, or no audio-only format
+        ffmpeg can read from a pipe.
+        The caller then falls back to yt-dlp's download + extract path.
+        """
+        from yt_dlp.utils import sanitize_filename
+        
+        if not self.stream_audio or not self.audio_pipeline.available:
+            return False
+        
+        info = self.checkpoints.fresh_info(self.checkpoints.load(output_path))
+        if info is None:
+            info = None if save_info else self.info_cache.get(canonicalize_url(url))
+            if info is None:
+                info = await asyncio.to_thread(self._extract_and_cache, url, platform, output_path if save_info else None, proxy)
+            self.checkpoints.update(output_path, info=info, info_saved_at=time.time())
+        
+        source_format = None if info.get("_type") == "playlist" else pick_audio_format(info)
+        if source_format is None:
+            return False
+        
+        self.download_status[download_id]["file_info"] = self._file_info(info)
+        self.bandwidth.set_duration(download_id, info.get("duration"))
+        if self.admission is not None:
+            # Audio is small; account for it without making the job wait
+            self.admission.reserve(
+                download_id,
+                estimate_size({**source_format, "duration": info.get("duration")}),
+                lambda: progress_hook.bytes_written
+            )
+        target_path = output_path / f"{sanitize_filename(info.get('title') or download_id)}.{audio_format}"
+        headers = {**(info.get("http_headers") or {}), **(source_format.get("http_headers") or {})}
+        # ffmpeg needs the raw container bytes
+        headers["Accept-Encoding"] = "identity"
+        
+        def on_progress(received: int, total: Optional[int]):
+            # Report like yt-dlp does so progress and byte metrics work unchanged
+            progress_hook({
+                "status": "downloading",
+                "filename": str(target_path),
+                "downloaded_bytes": received,
+                "total_bytes": total or source_format.get("filesize")
+            })
+        
+        started = time.perf_counter()
+        received = await self.audio_pipeline.run(
+            self.proxies.client(proxy, self.stream_client), source_format, headers, audio_format, target_path, on_progress, throttle
+        )
+        progress_hook({
+            "status": "finished",
+            "filename": str(target_path),
+            "total_bytes": received,
+            "elapsed": time.perf_counter() - started
+        })
+        return True
+    
+    def _download_items(self, download_id: str, platform: str, ydl_opts: Dict[str, Any], entries: List[Dict], output_path: Path):
+        """
+        Download the children of a multi-item post concurrently with a bounded pool
+        """
+        status = self.download_status[download_id]
+        status["items"] = [
+            {
+                "index": index,
+                "id": entry.get("id"),
+                "title": entry.get("title"),
+                "status": "pending",
+                "progress": 0.0
+            }
+            for index, entry in enumerate(entries, start=1)
+        ]
+        
+        parent_hook = ydl_opts["progress_hooks"][0]
+        partial_files = self.checkpoints.partial_files(output_path)
+        with ThreadPoolExecutor(max_workers=min(self.item_concurrency, len(entries))) as pool:
+            futures = [
+                pool.submit(self._download_item, download_id, platform, ydl_opts, entry, index, output_path, parent_hook, partial_files)
+                for index, entry in enumerate(entries, start=1)
+            ]
+            errors = [future.exception() for future in futures if future.exception()]
+        
+        # Finished items stay on disk, so a retry only redoes the failed ones
+        if errors:
+            raise RuntimeError(f"{len(errors)} of {len(entries)} items failed: {errors[0]}")
+    
+    def _download_item(
+        self,
+        download_id: str,
+        platform: str,
+        ydl_opts: Dict[str, Any],
+        entry: Dict,
+        index: int,
+        output_path: Path,
+        parent_hook: ProgressHook,
+        partial_files: Dict[str, int]
+    ):
+        import yt_dlp
+        
+        item = self.download_status[download_id]["items"][index - 1]
+        item_opts = dict(ydl_opts)
+        # Prefix with the index so items with identical titles don't collide
+        item_opts["outtmpl"] = str(output_path) + f"/{index:02d} - %(title)s.%(ext)s"
+        item_opts["progress_hooks"] = [ProgressHook(
+            download_id, self.download_status, platform,
+            resume_from=partial_files, item_index=index, parent=parent_hook
+        ), *ydl_opts["progress_hooks"][1:]]
+        # post_hooks receive the final path after any postprocessing
+        item_opts["post_hooks"] = [lambda filename: item.update(filename=filename)]
+        
+        parent_hook.check_cancelled()
+        item["status"] = "downloading"
+        try:
+            # YoutubeDL instances aren't thread-safe, so every item gets its own
+            with yt_dlp.YoutubeDL(item_opts) as ydl:
+                ydl.process_ie_result(copy.deepcopy(entry), download=True)
+            item.update({"status": "completed", "progress": 100.0})
+        except Exception as e:
+            item.update({"status": "failed", "error": str(e)})
+            raise
+    
+    def _height_format(self, height: int) -> str:
+        """
+        Format selector for the best video up to `height`
+        
+        With ffmpeg, separate video and audio streams are preferred (most
+        sites only offer their top qualities split) and merged in the
+        postprocess pool; without it only single-file formats can be used.
+        """
+        if self.postprocess.available:
+            return f"bv[height<={height}]+ba/b[height<={height}]"
+        return f"best[height<={height}]"
+    
+    def _get_ydl_options(self, platform: str, quality: str, audio_only: bool = False, proxy: Optional[Proxy] = None) -> Dict[str, Any]:
         """
         Get yt-dlp options for specific platform and quality
+        
+        With a `proxy` all requests go through it, with its user agent.
         """
         base_options = {
-            "writeinfojson": True,
+            # The full info dict is kept only on request (save_info), compressed
+            "writeinfojson": False,
             "writesubtitles": True,
             "writeautomaticsub": True,
             "ignoreerrors": False,
@@ -158,6 +966,9 @@ class DownloadService:
             "nocheckcertificate": True,
             "extract_flat": False,
             "no_color": True,
+            # Keep .part files and resume them with Range requests on retry
+            "continuedl": True,
+            "nopart": False,
             # Remove browser cookies dependency
             "cookiefile": None,
             "cookiesfrombrowser": None,
@@ -187,18 +998,17 @@ class DownloadService:
         else:
             # Video quality mapping
             quality_map = {
-                "best": "best[height<=2160]",
-                "worst": "worst",
-                "4k": "best[height<=2160]",
-                "1440p": "best[height<=1440]",
-                "1080p": "best[height<=1080]",
-                "720p": "best[height<=720]",
-                "480p": "best[height<=480]",
-                "360p": "best[height<=360]",
-                "240p": "best[height<=240]",
-                "180p": "best[height<=180]"
+                "best": 2160,
+                "4k": 2160,
+                "1440p": 1440,
+                "1080p": 1080,
+                "720p": 720,
+                "480p": 480,
+                "360p": 360,
+                "240p": 240,
+                "180p": 180
             }
-            base_options["format"] = quality_map.get(quality, "best[height<=1080]")
+            base_options["format"] = "worst" if quality == "worst" else self._height_format(quality_map.get(quality, 1080))
         
         # Platform-specific options
         if platform == "tiktok":
@@ -250,26 +1060,812 @@ class DownloadService:
                 "extract_audio": audio_only
             })
         
+        if proxy is not None:
+            # Each exit IP presents one consistent browser
+            base_options["proxy"] = proxy.url
+            base_options["user_agent"] = proxy.user_agent
+            base_options["http_headers"] = {**base_options["http_headers"], "User-Agent": proxy.user_agent}
+        
         return base_options
     
+    async def prefetch_info(self, url: str, platform: str) -> bool:
+        """
+        Fill the info cache using a native extractor, if one handles this platform
+        """
+        if not self.use_native_extractors or platform != "instagram":
+            return False
+        
+        cache_key = canonicalize_url(url)
+        if self.info_cache.get(cache_key) is not None:
+            return True
+        
+        # Same (sticky) exit as the yt-dlp download of this URL will use
+        proxy = self.proxies.acquire(platform, cache_key)
+        error = None
+        try:
+            info = await self.instagram.extract(
+                url,
+                client=self.proxies.client(proxy, self.instagram.client),
+                user_agent=proxy.user_agent if proxy else None
+            )
+        except (InstagramExtractionError, httpx.HTTPError) as e:
+            error = e
+            # yt-dlp's own extractor gets a go instead
+            logger.warning(f"Native Instagram extraction failed, falling back to yt-dlp: {e}")
+            metrics.NATIVE_EXTRACTOR_FALLBACKS_TOTAL.labels(platform, "unavailable").inc()
+            return False
+        except Exception as e:
+            # Usually Instagram changed its response shape and the parser tripped over it
+            logger.error(f"Native Instagram extractor broke on {url}, falling back to yt-dlp: {e!r}", exc_info=True)
+            metrics.NATIVE_EXTRACTOR_FALLBACKS_TOTAL.labels(platform, "parse_error").inc()
+            return False
+        finally:
+            self.proxies.release(proxy, error)
+        
+        self.info_cache.set(cache_key, compact_info(info))
+        return True
+    
+    def extract_info(self, url: str, platform: str, proxy: Optional[Proxy] = None) -> Dict[str, Any]:
+        """
+        Extract metadata for a URL without downloading, using the TTL cache
+        """
+        info = self.info_cache.get(canonicalize_url(url))
+        if info is None:
+            info = self._extract_and_cache(url, platform, proxy=proxy)
+        return info
+    
+    def _extract_and_cache(self, url: str, platform: str, output_path: Optional[Path] = None, proxy: Optional[Proxy] = None) -> Dict[str, Any]:
+        """
+        Extract, cache and return the compacted info
+        
+        With an `output_path` (a job submitted with save_info) the full info
+        is also written there, gzip-compressed. Without the `proxy`
+        of a running job, one is taken from the pool for the extraction.
+        """
+        import yt_dlp
+        
+        lease = self.proxies.acquire(platform, canonicalize_url(url)) if proxy is None else None
+        ydl_opts = self._get_ydl_options(platform, "best", proxy=proxy or lease)
+        # Don't let a quality filter reject sources that lack resolution info
+        ydl_opts["format"] = "bv*+ba/b"
+        extract_started = time.perf_counter()
+        error = None
+        try:
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.proxies.release(lease, error)
+        metrics.DOWNLOAD_PHASE_SECONDS.labels(platform, "extract").observe(
+            time.perf_counter() - extract_started
+        )
+        
+        if output_path is not None:
+            save_full_info(output_path, info)
+        info = compact_info(info)
+        self.info_cache.set(canonicalize_url(url), info)
+        return info
+    
+    def probe(self, url: str, platform: str) -> Dict[str, Any]:
+        """
+        Return a compact metadata summary for a URL
+        """
+        cache_key = canonicalize_url(url)
+        info = self.info_cache.get(cache_key)
+        cached = info is not None
+        if info is None:
+            info = self._extract_and_cache(url, platform)
+        
+        entries = [entry for entry in info.get("entries") or [] if entry]
+        summary = {
+            "id": info.get("id"),
+            "title": info.get("title", "Unknown"),
+            "uploader": info.get("uploader", "Unknown"),
+            "duration": info.get("duration"),
+            "thumbnail": info.get("thumbnail") or next((e.get("thumbnail") for e in entries if e.get("thumbnail")), None),
+            "view_count": info.get("view_count"),
+            "like_count": info.get("like_count"),
+            "formats": self._summarize_formats(info)
+        }
+        
+        # Multi-item posts (carousels, multi-image tweets) list their children
+        if entries:
+            summary["entries"] = [
+                {
+                    "id": entry.get("id"),
+                    "title": entry.get("title"),
+                    "duration": entry.get("duration"),
+                    "thumbnail": entry.get("thumbnail"),
+                    "formats": self._summarize_formats(entry)
+                }
+                for entry in entries
+            ]
+        
+        return {
+            "url": url,
+            "canonical_url": cache_key,
+            "platform": platform,
+            "cached": cached,
+            "info": summary
+        }
+    
+    def _summarize_formats(self, info: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [
+            {
+                "format_id": f.get("format_id"),
+                "ext": f.get("ext"),
+                "width": f.get("width"),
+                "height": f.get("height"),
+                "fps": f.get("fps"),
+                "vcodec": f.get("vcodec"),
+                "acodec": f.get("acodec"),
+                "filesize": f.get("filesize") or f.get("filesize_approx")
+            }
+            for f in info.get("formats") or []
+        ]
+    
+    @property
+    def stream_client(self) -> httpx.AsyncClient:
+        if self._stream_client is None:
+            self._stream_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(30.0, connect=10.0),
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+                follow_redirects=True
+            )
+        return self._stream_client
+    
+    async def aclose(self):
+        """
+        Close pooled HTTP clients, flushing pending webhooks
+        """
+        await self.instagram.aclose()
+        await self.storage.aclose()
+        await self.proxies.aclose()
+        await self.webhooks.aclose()
+        if self._stream_client is not None:
+            await self._stream_client.aclose()
+            self._stream_client = None
+    
+    def pick_progressive_format(self, info: Dict[str, Any], quality: str = "best") -> Optional[Dict[str, Any]]:
+        """
+        Best single-file (audio+video, plain HTTP) format within the requested quality
+        
+        Returns None when the content needs merging, is fragmented (HLS/DASH)
+        or has several items, since those can't be passed through as-is.
+        """
+        if info.get("_type") == "playlist" or info.get("entries"):
+            return None
+        
+        candidates = []
+        for f in info.get("formats") or [info]:
+            media_url = f.get("url")
+            protocol = f.get("protocol") or (media_url or "").split(":", 1)[0]
+            if not media_url or protocol not in ("http", "https") or f.get("fragments"):
+                continue
+            # Missing codec info is common for direct files; only reject explicit "none"
+            if f.get("vcodec") == "none" or f.get("acodec") == "none":
+                continue
+            candidates.append(f)
+        if not candidates:
+            return None
+        
+        if quality == "worst":
+            return candidates[0]
+        # Same caps as the quality map in _get_ydl_options ("720p" -> 720, best/4k -> 2160)
+        max_height = int(quality[:-1]) if quality.endswith("p") and quality[:-1].isdigit() else 2160
+        within = [f for f in candidates if (f.get("height") or 0) <= max_height]
+        # yt-dlp lists formats worst to best; keep that order as the tiebreaker
+        return (within or candidates)[-1]
+    
+    async def open_passthrough(
+        self,
+        download_id: str,
+        url: str,
+        platform: str,
+        quality: str = "best",
+        tier: Optional[str] = None,
+        save_info: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Start a pass-through download whose bytes can be streamed to the caller
+        
+        Returns None if the content has no progressive format; otherwise a
+        dict with the running `stream`, `filename`, `ext` and `content_length`.
+        The file is written to the job directory as usual and the job shows up
+        in status/history like any other download.
+        """
+        from yt_dlp.utils import sanitize_filename
+        
+        output_path = self.downloads_dir / platform / download_id
+        if save_info:
+            # The job keeps its full info, which only a fresh extraction has
+            output_path.mkdir(parents=True, exist_ok=True)
+            info = await asyncio.to_thread(self._extract_and_cache, url, platform, output_path)
+        else:
+            await self.prefetch_info(url, platform)
+            info = await asyncio.to_thread(self.extract_info, url, platform)
+        media_format = self.pick_progressive_format(info, quality)
+        if media_format is None:
+            if save_info:
+                shutil.rmtree(output_path, ignore_errors=True)
+            return None
+        
+        output_path.mkdir(parents=True, exist_ok=True)
+        ext = media_format.get("ext") or "mp4"
+        # Same name yt-dlp's "%(title)s.%(ext)s" template would produce, so a resumed job finds the file
+        target_path = output_path / f"{sanitize_filename(info.get('title') or download_id)}.{ext}"
+        
+        status = {
+            "id": download_id,
+            "url": url,
+            "platform": platform,
+            "status": "downloading",
+            "progress": 0.0,
+            "started_at": datetime.now().isoformat(),
+            "message": "Streaming video...",
+            "audio_only": False,
+            "passthrough": True,
+            "file_info": self._file_info(info)
+        }
+        self.download_status[download_id] = status
+        self.checkpoints.update(
+            output_path, id=download_id, url=url, platform=platform, quality=quality, audio_only=False,
+            save_info=save_info, state="downloading"
+        )
+        if self.admission is not None:
+            # The client is waiting for bytes, so this can't be deferred; other jobs still see the space as taken
+            self.admission.reserve(
+                download_id,
+                estimate_size({**media_format, "duration": info.get("duration")}),
+                lambda: status.get("downloaded_bytes", 0)
+            )
+        
+        throttle = self.bandwidth.throttle(download_id, tier)
+        self.bandwidth.set_duration(download_id, info.get("duration"))
+        
+        def on_progress(received: int, total: Optional[int]):
+            if total:
+                status["progress"] = round(received * 100 / total, 1)
+            status["downloaded_bytes"] = received
+            status["message"] = f"Streaming video... {format_file_size(received)}"
+        
+        headers = {**(info.get("http_headers") or {}), **(media_format.get("http_headers") or {})}
+        # Raw bytes go straight to client and disk, so don't let the CDN compress them
+        headers["Accept-Encoding"] = "identity"
+        # Remote storage: multipart-upload the bytes as they arrive instead of after the fact
+        upload_key = self.storage_key(platform, download_id, target_path.name) if self.remote_storage else None
+        upload = await self.storage.open_upload(upload_key) if upload_key else None
+        # Sticky platforms get the proxy that extracted the media URL
+        proxy = self.proxies.acquire(platform, canonicalize_url(url))
+        stream = PassThroughDownload(
+            self.proxies.client(proxy, self.stream_client),
+            media_format["url"],
+            headers,
+            target_path,
+            platform,
+            on_progress,
+            buffer_chunks=self.stream_buffer_chunks,
+            upload=upload,
+            throttle=throttle
+        )
+        
+        metrics.DOWNLOADS_IN_FLIGHT.labels(platform).inc()
+        job_started = time.perf_counter()
+        try:
+            await stream.start()
+        except Exception:
+            await self._finish_passthrough(download_id, platform, output_path, stream, job_started, proxy)
+            raise
+        
+        task = asyncio.create_task(self._finish_passthrough(download_id, platform, output_path, stream, job_started, proxy))
+        # Cancelling the finisher also cancels the producer it awaits
+        token = self.cancel_tokens[download_id] = CancelToken(output_path)
+        token.task = task
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return {
+            "stream": stream,
+            "filename": target_path.name,
+            "ext": ext,
+            "content_length": stream.content_length
+        }
+    
+    async def _finish_passthrough(
+        self,
+        download_id: str,
+        platform: str,
+        output_path: Path,
+        stream: PassThroughDownload,
+        job_started: float,
+        proxy: Optional[Proxy] = None
+    ):
+        # Runs independently of the HTTP response, so the job completes even if the client leaves
+        status = self.download_status[download_id]
+        stream_key = self.storage_key(platform, download_id, stream.target_path.name)
+        token = self.cancel_tokens.get(download_id)
+        try:
+            await stream.task
+            status.update({
+                "status": "completed",
+                "progress": 100.0,
+                "completed_at": datetime.now().isoformat(),
+                "message": "Video download completed successfully",
+                "file_path": str(output_path)
+            })
+            self.checkpoints.update(output_path, state="completed")
+            await self._store_blobs(output_path, {str(stream.target_path): stream.hasher})
+        except Exception as e:
+            status.update({
+                "status": "failed",
+                "error": str(e),
+                "completed_at": datetime.now().isoformat(),
+                "message": f"Download failed: {str(e)}"
+            })
+            self.checkpoints.update(output_path, state="failed")
+        except asyncio.CancelledError:
+            if token is None or not token.cancelled:
+                raise
+            await self._discard_cancelled(download_id, platform, output_path)
+        finally:
+            self.cancel_tokens.pop(download_id, None)
+            if self.admission is not None:
+                self.admission.release(download_id)
+            self.bandwidth.close(download_id)
+            self.proxies.release(proxy, stream.error)
+        
+        metrics.DOWNLOADS_IN_FLIGHT.labels(platform).dec()
+        metrics.DOWNLOADS_TOTAL.labels(platform, status["status"]).inc()
+        metrics.DOWNLOAD_SECONDS.labels(platform, status["status"]).observe(time.perf_counter() - job_started)
+        
+        if status["status"] == "completed":
+            await self.ensure_thumbnail(download_id)
+            uploaded = {stream.target_path.name: stream_key} if stream.upload is not None else None
+            await self._upload_to_storage(download_id, platform, output_path, uploaded)
+    
+    def iter_flat_entries(self, url: str, platform: str):
+        """
+        Lazily yield the entries of a profile or playlist without resolving them
+        
+        Uses flat extraction, so each entry is only an id/URL stub and pages of
+        the feed are fetched as the caller consumes them.
+        """
+        import yt_dlp
+        
+        proxy = self.proxies.acquire(platform, canonicalize_url(url))
+        ydl_opts = self._get_ydl_options(platform, "best", proxy=proxy)
+        ydl_opts.update({"extract_flat": "in_playlist", "lazy_playlist": True})
+        error = None
+        try:
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                result = ydl.extract_info(url, download=False, process=False)
+                # Profile URLs often redirect to the tab that actually lists the posts
+                for _ in range(5):
+                    if result.get("_type") not in ("url", "url_transparent"):
+                        break
+                    result = ydl.extract_info(result["url"], download=False, process=False, ie_key=result.get("ie_key"))
+                yield from self._walk_entries(result)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.proxies.release(proxy, error)
+    
+    def _walk_entries(self, result: Dict[str, Any]):
+        from yt_dlp.utils import PagedList
+        
+        entries = result.get("entries")
+        if entries is None:
+            # A single post rather than a feed
+            yield result
+            return
+        
+        if isinstance(entries, PagedList):
+            # Paged feeds only fetch a page when a slice of it is requested
+            entries = self._iter_pages(entries)
+        
+        for entry in entries:
+            if entry and entry.get("_type") == "playlist":
+                yield from self._walk_entries(entry)
+            else:
+                yield entry
+    
+    def _iter_pages(self, paged_list, page_size: int = 50):
+        start = 0
+        while True:
+            page = paged_list.getslice(start, start + page_size)
+            if not page:
+                return
+            yield from page
+            start += page_size
+    
+    async def sync_source(
+        self,
+        sync_id: str,
+        url: str,
+        platform: str,
+        quality: str = "best",
+        audio_only: bool = False,
+        max_items: Optional[int] = None
+    ):
+        """
+        Schedule downloads for profile/playlist items not seen on earlier syncs
+        
+        Entries are streamed in batches from a flat extraction running in a
+        thread and checked against the source's archive one batch per query.
+        When the previous sync covered the whole feed, enumeration stops once
+        `sync_stop_after_seen` known items come in a row, so re-syncing a
+        large account only walks the new posts plus a short overlap; after a
+        sync that was cut short it walks on to the end of the feed.
+        """
+        status = {
+            "id": sync_id,
+            "url": url,
+            "platform": platform,
+            "status": "syncing",
+            "message": "Enumerating items...",
+            "discovered": 0,
+            "scheduled": 0,
+            "skipped": 0,
+            "caught_up": False,
+            "reached_end": False,
+            "downloads": [],
+            "started_at": datetime.now().isoformat()
+        }
+        self.sync_status[sync_id] = status
+        
+        loop = asyncio.get_running_loop()
+        # Small read-ahead: enumeration should stop soon after we catch up
+        batches = asyncio.Queue(maxsize=2)
+        stop = asyncio.Event()
+        
+        async def offer(batch):
+            # Gives up once the consumer has stopped, so the thread never stays blocked on a full queue
+            put = asyncio.ensure_future(batches.put(batch))
+            halt = asyncio.ensure_future(stop.wait())
+            await asyncio.wait({put, halt}, return_when=asyncio.FIRST_COMPLETED)
+            put.cancel()
+            halt.cancel()
+        
+        def produce():
+            # Runs in a thread; waiting on the bounded queue gives backpressure
+            batch = []
+            try:
+                for entry in self.iter_flat_entries(url, platform):
+                    if stop.is_set():
+                        return
+                    if entry:
+                        batch.append(entry)
+                    if len(batch) >= self.sync_batch_size:
+                        asyncio.run_coroutine_threadsafe(offer(batch), loop).result()
+                        batch = []
+                if batch:
+                    asyncio.run_coroutine_threadsafe(offer(batch), loop).result()
+            finally:
+                asyncio.run_coroutine_threadsafe(offer(None), loop).result()
+        
+        try:
+            source = await asyncio.to_thread(self.sync_archive.begin_sync, url, platform)
+            producer = loop.run_in_executor(None, produce)
+            
+            newest_item_id = None
+            seen_in_a_row = 0
+            # Whether every entry of the feed went through the loop
+            exhausted = False
+            while not stop.is_set():
+                batch = await batches.get()
+                if batch is None:
+                    exhausted = True
+                    break
+                
+                items = []
+                for entry in batch:
+                    item_url = entry.get("webpage_url") or entry.get("url")
+                    if item_url:
+                        items.append((str(entry.get("id") or canonicalize_url(entry.get("url") or "")), item_url))
+                known = await asyncio.to_thread(
+                    self.sync_archive.known_items, source["id"], [item_id for item_id, _ in items]
+                )
+                
+                recorded = []
+                try:
+                    for item_id, item_url in items:
+                        if status["status"] == "cancelled":
+                            stop.set()
+                            break
+                        newest_item_id = newest_item_id or item_id
+                        status["discovered"] += 1
+                        
+                        if item_id in known and not self._sync_item_failed(known[item_id]):
+                            status["skipped"] += 1
+                            seen_in_a_row += 1
+                            if seen_in_a_row >= self.sync_stop_after_seen and source["reached_end"]:
+                                status["caught_up"] = True
+                                stop.set()
+                                break
+                            continue
+                        seen_in_a_row = 0
+                        
+                        download_id = str(uuid.uuid4())
+                        # Playlists can list an item twice; schedule it once
+                        known[item_id] = download_id
+                        await self.schedule_download(download_id, item_url, platform, quality, audio_only)
+                        recorded.append((item_id, download_id))
+                        status["downloads"].append(download_id)
+                        if status["status"] == "cancelled":
+                            # The sync was cancelled while this item was being scheduled
+                            await self.cancel_download(download_id)
+                            continue
+                        status["scheduled"] += 1
+                        status["message"] = f"Scheduled {status['scheduled']} new item(s)..."
+                        
+                        if max_items and status["scheduled"] >= max_items:
+                            stop.set()
+                            break
+                finally:
+                    # Whatever was scheduled is archived, even if a later item failed
+                    await asyncio.to_thread(self.sync_archive.record, source["id"], recorded)
+            
+            stop.set()
+            await producer
+            if status["status"] == "cancelled":
+                return
+            status["reached_end"] = status["caught_up"] or exhausted
+            await asyncio.to_thread(self.sync_archive.mark_synced, source["id"], newest_item_id, status["reached_end"])
+            status.update({
+                "status": "completed",
+                "message": f"Scheduled {status['scheduled']} new item(s), {status['skipped']} already archived",
+                "completed_at": datetime.now().isoformat()
+            })
+        except Exception as e:
+            # The producer sees the stop and exits without waiting on the queue
+            stop.set()
+            logger.error(f"Sync {sync_id} of {url} failed: {e}")
+            status.update({
+                "status": "failed",
+                "message": f"Sync failed: {str(e)}",
+                "completed_at": datetime.now().isoformat()
+            })
+    
+    def _sync_item_failed(self, download_id: Optional[str]) -> bool:
+        # Items whose download failed or was cancelled are picked up again by the next sync
+        status = self.get_download_status(download_id) if download_id else None
+        return bool(status and status.get("status") in ("failed", "cancelled"))
+    
+    async def schedule_download(self, download_id: str, url: str, platform: str, quality: str = "best", audio_only: bool = False):
+        """
+        Hand a download to the worker queue, or run it in this process with bounded concurrency
+        """
+        if self.job_queue:
+            await asyncio.to_thread(self.job_queue.enqueue, download_id, url, platform, quality, audio_only)
+            return
+        
+        if self._sync_slots is None:
+            self._sync_slots = asyncio.Semaphore(self.sync_concurrency)
+        
+        async def run():
+            async with self._sync_slots:
+                await self.download_content(download_id, url, platform, quality, audio_only)
+        
+        metrics.DOWNLOADS_QUEUED.labels(platform).inc()
+        self.cancel_tokens[download_id] = CancelToken(self.downloads_dir / platform / download_id)
+        self.download_status[download_id] = {
+            "id": download_id,
+            "url": url,
+            "platform": platform,
+            "status": "queued",
+            "progress": 0.0,
+            "message": "Waiting for a download slot...",
+            "audio_only": audio_only
+        }
+        task = asyncio.create_task(run())
+        # Keep a reference so the task isn't garbage collected mid-download
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    def get_sync_status(self, sync_id: str) -> Optional[Dict]:
+        return self.sync_status.get(sync_id)
+    
+    async def cancel_sync(self, sync_id: str) -> Optional[Dict]:
+        """
+        Stop a sync's enumeration and cancel every download it scheduled
+        """
+        status = self.sync_status.get(sync_id)
+        if status is None:
+            return None
+        if status["status"] == "syncing":
+            status.update({
+                "status": "cancelled",
+                "message": f"Sync cancelled after scheduling {status['scheduled']} item(s)",
+                "completed_at": datetime.now().isoformat()
+            })
+        results = await self.cancel_downloads(list(status["downloads"]))
+        status["cancelled_downloads"] = sum(1 for result in results.values() if result in ("cancelling", "cancelled"))
+        return status
+    
+    async def _store_blobs(self, output_path: Path, hashers: Optional[Dict[str, IncrementalHasher]] = None):
+        """
+        Deduplicate a finished job's files into the blob store
+        """
+        if self.blobs is None:
+            return
+        try:
+            await asyncio.to_thread(self.blobs.ingest_job, output_path, hashers)
+        except Exception as e:
+            # The files are complete either way; dedup is only an optimisation
+            logger.warning(f"Could not add {output_path} to the blob store: {e}")
+    
+    def storage_key(self, platform: str, download_id: str, name: str) -> str:
+        return f"{platform}/{download_id}/{name}"
+    
+    async def _upload_to_storage(
+        self,
+        download_id: str,
+        platform: str,
+        output_path: Path,
+        uploaded: Optional[Dict[str, str]] = None
+    ):
+        """
+        Copy a finished job's files to remote storage and record their keys
+        
+        `uploaded` maps file names already stored while downloading (pass-through
+        multipart uploads) to their keys. Once recorded, /files serves the job
+        from storage; with STORAGE_KEEP_LOCAL=false the local copies are removed.
+        If an upload fails the job keeps being served from disk.
+        """
+        if not self.remote_storage:
+            return
+        status = self.download_status[download_id]
+        objects = dict(uploaded or {})
+        try:
+            for path in sorted(output_path.iterdir()):
+                if not path.is_file() or path.name in SKIPPED_NAMES or path.name.endswith(SKIPPED_SUFFIXES):
+                    continue
+                if path.name not in objects:
+                    key = self.storage_key(platform, download_id, path.name)
+                    await self.storage.put_file(key, path)
+                    objects[path.name] = key
+        except Exception as e:
+            logger.warning(f"Uploading {download_id} to {self.storage.name} storage failed: {e}")
+            return
+        
+        status["storage"] = {"backend": self.storage.name, "objects": objects}
+        self.checkpoints.update(output_path, storage=status["storage"])
+        if not self.storage_keep_local:
+            for name in objects:
+                (output_path / name).unlink(missing_ok=True)
+    
+    async def ensure_thumbnail(self, download_id: str) -> Optional[str]:
+        """
+        Cache key of a completed job's preview, generating it on first use
+        
+        Runs when a job completes and lazily for jobs finished before previews
+        existed. Failures are logged and return None; a preview is never
+        worth failing a download over.
+        """
+        status = self.get_download_status(download_id)
+        if not status or status.get("status") != "completed" or not status.get("file_path"):
+            return None
+        
+        job_dir = Path(status["file_path"])
+        key = status.get("thumbnail_key") or self.checkpoints.load(job_dir).get("thumbnail_key")
+        if not (key and self.thumbnails.path_for(key)):
+            thumbnail_url = (status.get("file_info") or {}).get("thumbnail")
+            try:
+                key = await asyncio.wait_for(
+                    self.thumbnails.generate(self.stream_client, job_dir, thumbnail_url, platform=status.get("platform", "unknown")),
+                    timeout=self.thumbnail_timeout
+                )
+            except Exception as e:
+                logger.warning(f"Thumbnail generation for {download_id} failed: {e}")
+                return None
+            if not key:
+                return None
+            # The checkpoint sits next to the files, so other processes and restarts see it too
+            self.checkpoints.update(job_dir, thumbnail_key=key)
+        
+        status.update({"thumbnail_key": key, "thumbnail_url": f"/api/v1/thumbnails/{key}"})
+        return key
+    
+    def find_interrupted_downloads(self) -> List[Dict]:
+        """
+        Checkpoints of jobs an earlier process left unfinished
+        """
+        return list(self.checkpoints.iter_unfinished(self.downloads_dir))
+    
+    def warm_up(self):
+        """
+        Import yt-dlp and build its extractor registry ahead of the first job
+        """
+        import yt_dlp
+        from yt_dlp.extractor import gen_extractor_classes
+        gen_extractor_classes()
+    
     def get_download_status(self, download_id: str) -> Optional[Dict]:
         """
         Get download status by ID
         """
-        return self.download_status.get(download_id)
+        status = self.download_status.get(download_id)
+        if status is None and self.job_queue:
+            status = self.job_queue.get_status(download_id)
+        return status
+    
+    async def get_download_statuses(self, download_ids: List[str]) -> Dict[str, Optional[Dict]]:
+        """
+        Statuses of many jobs; in-process ones first, the rest from the queue in one query
+        """
+        statuses = {download_id: self.download_status.get(download_id) for download_id in download_ids}
+        unknown = [download_id for download_id, status in statuses.items() if status is None]
+        if unknown and self.job_queue:
+            statuses.update(await asyncio.to_thread(self.job_queue.get_statuses, unknown))
+        return statuses
+    
+    def compact_status(self, download_id: str, status: Optional[Dict]) -> Dict:
+        """
+        The fields a poller needs, without file info, items or sync bookkeeping
+        """
+        if status is None:
+            return {"id": download_id, "status": "not_found"}
+        record = {
+            "id": download_id,
+            "status": status.get("status"),
+            # One decimal is plenty for a progress bar and keeps tiny ticks from counting as changes
+            "progress": round(status["progress"], 1) if status.get("progress") is not None else None
+        }
+        for key in ("message", "error", "completed_at", "thumbnail_url", "downgraded_to"):
+            if status.get(key):
+                record[key] = status[key]
+        if status.get("status") == "completed":
+            record["file_url"] = f"/api/v1/files/{download_id}"
+        return record
     
     def get_download_history(self) -> Dict:
         """
         Get all download history
         """
+        downloads = {}
+        if self.job_queue:
+            downloads = {status["id"]: status for status in self.job_queue.list_statuses()}
+        downloads.update(self.download_status)
         return {
-            "downloads": list(self.download_status.values()),
-            "total": len(self.download_status)
+            "downloads": list(downloads.values()),
+            "total": len(downloads)
         }
     
-    async def cleanup_old_downloads(self, days: int = 7):
+    async def cleanup_old_downloads(self, days: int = 7) -> Dict[str, int]:
         """
         Clean up downloads older than specified days
         """
-        # Implementation for cleanup logic
-        pass
+        result = await asyncio.to_thread(self._cleanup_old_downloads, days)
+        removed_objects = 0
+        for key in result.pop("remote_keys"):
+            try:
+                await self.storage.delete(key)
+                removed_objects += 1
+            except Exception as e:
+                logger.warning(f"Could not delete {key} from {self.storage.name} storage: {e}")
+        result["removed_objects"] = removed_objects
+        return result
+    
+    def _cleanup_old_downloads(self, days: int) -> Dict[str, Any]:
+        cutoff = time.time() - days * 86400
+        removed = 0
+        remote_keys = []
+        for platform_dir in self.downloads_dir.iterdir():
+            # Dot directories hold the blob and thumbnail stores, not jobs
+            if not platform_dir.is_dir() or platform_dir.name.startswith("."):
+                continue
+            for job_dir in platform_dir.iterdir():
+                checkpoint = self.checkpoints.load(job_dir)
+                if checkpoint and checkpoint.get("state") not in ("completed", "failed"):
+                    continue
+                if checkpoint.get("updated_at", job_dir.stat().st_mtime) < cutoff:
+                    remote_keys.extend((checkpoint.get("storage") or {}).get("objects", {}).values())
+                    shutil.rmtree(job_dir, ignore_errors=True)
+                    self.download_status.pop(job_dir.name, None)
+                    removed += 1
+        
+        # Removing job directories dropped their hardlinks; unreferenced blobs can go now
+        freed = self.blobs.gc() if self.blobs else 0
+        return {"removed_jobs": removed, "freed_bytes": freed, "remote_keys": remote_keys}
@@ -0,0 +1,322 @@
+import json
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import bindparam, update
+from app.database import SessionLocal
+from app.models import DownloadJob
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+# Row status of a running job whose cancellation its worker hasn't picked up yet
+CANCELLING = "cancelling"
+
+class JobQueue:
+    """
+    Database-backed download queue shared by the API and `python -m app.worker`
+
+    Works on SQLite for development; on PostgreSQL claiming uses
+    SKIP LOCKED so many workers on many nodes can poll the same table.
+    """
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+
+    def enqueue(
+        self,
+        download_id: str,
+        url: str,
+        platform: str,
+        quality: str = "best",
+        audio_only: bool = False,
+        tier: Optional[str] = None,
+        callback_url: Optional[str] = None,
+        save_info: bool = False
+    ) -> Dict:
+        """
+        Add a job to the queue and return its initial status record
+
+        `tier` (the submitter's subscription type), `callback_url` and
+        `save_info` travel in the status record.
+        """
+        status = {
+            "id": download_id,
+            "url": url,
+            "platform": platform,
+            "status": "queued",
+            "progress": 0.0,
+            "message": "Waiting for a download worker...",
+            "audio_only": audio_only
+        }
+        if tier:
+            status["tier"] = tier
+        if callback_url:
+            status["callback_url"] = callback_url
+        if save_info:
+            status["save_info"] = True
+        db = self.session_factory()
+        try:
+            db.add(DownloadJob(
+                id=download_id,
+                url=url,
+                platform=platform,
+                quality=quality,
+                audio_only=audio_only,
+                status="queued",
+                status_data=json.dumps(status)
+            ))
+            db.commit()
+        finally:
+            db.close()
+        return status
+
+    def claim(self, worker_id: str, limit: int = 1) -> List[Dict]:
+        """
+        Atomically take up to `limit` queued jobs for a worker
+        """
+        db = self.session_factory()
+        claimed = []
+        try:
+            candidates = (
+                db.query(DownloadJob)
+                .filter(DownloadJob.status == "queued")
+                .order_by(DownloadJob.created_at)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            now = datetime.utcnow()
+            for job in candidates:
+                # Conditional update so two workers can never claim the same row,
+                # even on SQLite where FOR UPDATE is a no-op
+                result = db.execute(
+                    update(DownloadJob)
+                    .where(DownloadJob.id == job.id, DownloadJob.status == "queued")
+                    .values(
+                        status="claimed",
+                        worker_id=worker_id,
+                        heartbeat_at=now,
+                        attempts=DownloadJob.attempts + 1,
+                        updated_at=now
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount == 1:
+                    extras = json.loads(job.status_data) if job.status_data else {}
+                    claimed.append({
+                        "id": job.id,
+                        "url": job.url,
+                        "platform": job.platform,
+                        "quality": job.quality,
+                        "audio_only": job.audio_only,
+                        "tier": extras.get("tier"),
+                        "callback_url": extras.get("callback_url"),
+                        "save_info": extras.get("save_info", False)
+                    })
+            db.commit()
+        finally:
+            db.close()
+        return claimed
+
+    def save_status(self, download_id: str, status: Dict):
+        """
+        Persist the latest status snapshot of a job
+        """
+        self.save_statuses({download_id: status})
+
+    def save_statuses(self, statuses: Dict[str, Dict]):
+        """
+        Persist the latest status snapshots of many jobs in one transaction
+
+        Rows are written with one executemany UPDATE per kind of snapshot
+        (progress or final), not a statement and commit per job.
+        """
+        if not statuses:
+            return
+        now = datetime.utcnow()
+        final_rows, progress_rows = [], []
+        for download_id, status in statuses.items():
+            new_status = status.get("status", "downloading")
+            row = {"job_id": download_id, "new_status": new_status, "new_data": json.dumps(status), "now": now}
+            (final_rows if new_status in TERMINAL_STATUSES else progress_rows).append(row)
+
+        table = DownloadJob.__table__
+        db = self.session_factory()
+        try:
+            # A late progress snapshot must never overwrite a final state or a pending cancellation
+            for rows, protected in ((final_rows, TERMINAL_STATUSES), (progress_rows, TERMINAL_STATUSES + (CANCELLING,))):
+                if rows:
+                    db.execute(
+                        table.update()
+                        # Spelled out: expanding NOT IN can't be combined with executemany
+                        .where(table.c.id == bindparam("job_id"), *[table.c.status != status for status in protected])
+                        .values(status=bindparam("new_status"), status_data=bindparam("new_data"), updated_at=bindparam("now")),
+                        rows
+                    )
+            db.commit()
+        finally:
+            db.close()
+
+    def cancel(self, download_ids: List[str]) -> Dict[str, str]:
+        """
+        Cancel jobs: queued ones outright, running ones by flagging them for their worker
+
+        Returns the new row status of every job that changed.
+        """
+        if not download_ids:
+            return {}
+        db = self.session_factory()
+        changed = {}
+        try:
+            jobs = (
+                db.query(DownloadJob)
+                .filter(DownloadJob.id.in_(download_ids), DownloadJob.status.notin_(TERMINAL_STATUSES + (CANCELLING,)))
+                .all()
+            )
+            now = datetime.utcnow()
+            for job in jobs:
+                new_status = "cancelled" if job.status == "queued" else CANCELLING
+                status = json.loads(job.status_data) if job.status_data else {"id": job.id, "url": job.url, "platform": job.platform}
+                status.update({
+                    "status": new_status,
+                    "message": "Download cancelled" if new_status == "cancelled" else "Cancelling..."
+                })
+                # Conditional on the status we read, so a job claimed meanwhile is flagged on the next call
+                result = db.execute(
+                    update(DownloadJob)
+                    .where(DownloadJob.id == job.id, DownloadJob.status == job.status)
+                    .values(status=new_status, status_data=json.dumps(status), updated_at=now)
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount == 1:
+                    changed[job.id] = new_status
+            db.commit()
+        finally:
+            db.close()
+        return changed
+
+    def cancel_requested(self, worker_id: str, download_ids: List[str]) -> List[str]:
+        """
+        Which of a worker's running jobs have been asked to stop
+        """
+        if not download_ids:
+            return []
+        db = self.session_factory()
+        try:
+            rows = (
+                db.query(DownloadJob.id)
+                .filter(DownloadJob.id.in_(download_ids), DownloadJob.worker_id == worker_id, DownloadJob.status == CANCELLING)
+                .all()
+            )
+            return [row.id for row in rows]
+        finally:
+            db.close()
+
+    def heartbeat(self, worker_id: str, download_ids: List[str]):
+        """
+        Mark a worker's running jobs as still alive
+        """
+        if not download_ids:
+            return
+        db = self.session_factory()
+        try:
+            db.execute(
+                update(DownloadJob)
+                .where(DownloadJob.id.in_(download_ids), DownloadJob.worker_id == worker_id)
+                .values(heartbeat_at=datetime.utcnow())
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def release(self, worker_id: str, download_ids: List[str]):
+        """
+        Hand unfinished jobs back to the queue (used when a worker drains)
+        """
+        if not download_ids:
+            return
+        db = self.session_factory()
+        try:
+            db.execute(
+                update(DownloadJob)
+                .where(
+                    DownloadJob.id.in_(download_ids),
+                    DownloadJob.worker_id == worker_id,
+                    DownloadJob.status.notin_(TERMINAL_STATUSES + (CANCELLING,))
+                )
+                .values(status="queued", worker_id=None, heartbeat_at=None)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def requeue_stale(self, timeout: float) -> int:
+        """
+        Re-queue jobs whose worker stopped sending heartbeats
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=timeout)
+        db = self.session_factory()
+        try:
+            # A dead worker's job that was being cancelled is simply done
+            db.execute(
+                update(DownloadJob)
+                .where(DownloadJob.status == CANCELLING, DownloadJob.heartbeat_at < cutoff)
+                .values(status="cancelled", worker_id=None, heartbeat_at=None)
+            )
+            result = db.execute(
+                update(DownloadJob)
+                .where(
+                    DownloadJob.status.notin_(TERMINAL_STATUSES + ("queued", CANCELLING)),
+                    DownloadJob.heartbeat_at < cutoff
+                )
+                .values(status="queued", worker_id=None, heartbeat_at=None)
+            )
+            db.commit()
+            return result.rowcount
+        finally:
+            db.close()
+
+    def depth(self) -> int:
+        """
+        Number of jobs waiting for a worker
+        """
+        db = self.session_factory()
+        try:
+            return db.query(DownloadJob).filter(DownloadJob.status == "queued").count()
+        finally:
+            db.close()
+
+    def get_status(self, download_id: str) -> Optional[Dict]:
+        db = self.session_factory()
+        try:
+            job = db.get(DownloadJob, download_id)
+            return self._to_status(job) if job else None
+        finally:
+            db.close()
+
+    def get_statuses(self, download_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Statuses of several jobs in one query; unknown ids are left out
+        """
+        if not download_ids:
+            return {}
+        db = self.session_factory()
+        try:
+            jobs = db.query(DownloadJob).filter(DownloadJob.id.in_(download_ids)).all()
+            return {job.id: self._to_status(job) for job in jobs}
+        finally:
+            db.close()
+
+    def list_statuses(self) -> List[Dict]:
+        db = self.session_factory()
+        try:
+            jobs = db.query(DownloadJob).order_by(DownloadJob.created_at).all()
+            return [self._to_status(job) for job in jobs]
+        finally:
+            db.close()
+
+    def _to_status(self, job: DownloadJob) -> Dict:
+        status = json.loads(job.status_data) if job.status_data else {"id": job.id, "url": job.url, "platform": job.platform}
+        # A released or re-queued job keeps its last snapshot; the row status wins
+        if job.status == "queued" and status.get("status") != "queued":
+            status.update({"status": "queued", "message": "Waiting for a download worker..."})
+        elif job.status in (CANCELLING, "cancelled") and status.get("status") != job.status:
+            status.update({"status": job.status, "message": "Cancelling..." if job.status == CANCELLING else "Download cancelled"})
+        return status
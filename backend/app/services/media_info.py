@@ -0,0 +1,139 @@
+import gzip
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Full yt-dlp info, written to a job directory only for downloads requested with save_info
+FULL_INFO_FILE = "info.json.gz"
+
+# Top-level info keys that neither yt-dlp's download step nor our endpoints read
+DROPPED_INFO_KEYS = (
+    "thumbnails", "heatmap", "tags", "categories", "chapters", "comments",
+    "formats_table", "_format_sort_fields", "_version"
+)
+
+# Low-cardinality strings repeated across formats, entries and jobs
+INTERNED_INFO_KEYS = (
+    "extractor", "extractor_key", "webpage_url_domain", "uploader", "uploader_id",
+    "channel", "channel_id", "ext", "_type"
+)
+INTERNED_FORMAT_KEYS = (
+    "ext", "vcodec", "acodec", "protocol", "container", "format_note", "dynamic_range",
+    "language", "resolution", "audio_ext", "video_ext"
+)
+
+# Served descriptions are cut to this many characters
+DESCRIPTION_LENGTH = 200
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+class MediaInfo:
+    """
+    The handful of metadata fields we serve, taken from a yt-dlp info dict
+
+    A job only needs these for its status and history; the info dict they
+    come from lists every format, thumbnail and HTTP header set and is
+    orders of magnitude larger. `thumbnail` is kept alongside the served
+    fields so the job's preview can be generated later. Uploader names are
+    interned, so jobs from the same channel share one copy.
+    """
+    __slots__ = ("title", "duration", "uploader", "view_count", "like_count", "description", "thumbnail")
+
+    def __init__(
+        self,
+        title: str = "Unknown",
+        duration: Optional[float] = None,
+        uploader: str = "Unknown",
+        view_count: Optional[int] = None,
+        like_count: Optional[int] = None,
+        description: str = "",
+        thumbnail: Optional[str] = None
+    ):
+        self.title = title
+        self.duration = duration
+        self.uploader = _intern(uploader)
+        self.view_count = view_count
+        self.like_count = like_count
+        self.description = description
+        self.thumbnail = thumbnail
+
+    @classmethod
+    def from_info(cls, info: Dict[str, Any]) -> "MediaInfo":
+        description = info.get("description") or ""
+        if len(description) > DESCRIPTION_LENGTH:
+            description = description[:DESCRIPTION_LENGTH] + "..."
+        return cls(
+            title=info.get("title") or "Unknown",
+            duration=info.get("duration"),
+            uploader=info.get("uploader") or "Unknown",
+            view_count=info.get("view_count"),
+            like_count=info.get("like_count"),
+            description=description,
+            thumbnail=info.get("thumbnail")
+        )
+
+    def file_info(self) -> Dict[str, Any]:
+        """
+        The `file_info` of a job's status record
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+def compact_info(info: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Trim a sanitized info dict to what downloading it again needs
+
+    Used for everything kept in memory or checkpoints. Drops thumbnail lists
+    (yt-dlp rebuilds one from `thumbnail`), storyboard formats and other
+    keys nothing reads; identical per-format HTTP header sets become one
+    shared dict and repeated strings are interned. The result still goes
+    through `process_ie_result`, so formats keep all their fields.
+    """
+    compact = {key: value for key, value in info.items() if key not in DROPPED_INFO_KEYS}
+    if not compact.get("thumbnail") and info.get("thumbnails"):
+        # Keep a preview when the extractor only listed thumbnails (yt-dlp lists them worst to best)
+        compact["thumbnail"] = info["thumbnails"][-1].get("url")
+    for key in INTERNED_INFO_KEYS:
+        if key in compact:
+            compact[key] = _intern(compact[key])
+
+    shared_headers: Dict[str, Dict[str, str]] = {}
+
+    def share(headers: Optional[Dict[str, str]]) -> Optional[Dict[str, str]]:
+        if not headers:
+            return headers
+        key = json.dumps(headers, sort_keys=True)
+        if key not in shared_headers:
+            shared_headers[key] = {_intern(name): _intern(value) for name, value in headers.items()}
+        return shared_headers[key]
+
+    if "http_headers" in compact:
+        compact["http_headers"] = share(compact["http_headers"])
+    if compact.get("formats"):
+        formats = []
+        for media_format in compact["formats"]:
+            if media_format.get("protocol") == "mhtml":
+                # Storyboards: image sprites with long fragment lists, never downloaded
+                continue
+            media_format = dict(media_format)
+            for key in INTERNED_FORMAT_KEYS:
+                if key in media_format:
+                    media_format[key] = _intern(media_format[key])
+            if "http_headers" in media_format:
+                media_format["http_headers"] = share(media_format["http_headers"])
+            formats.append(media_format)
+        compact["formats"] = formats
+    if compact.get("entries"):
+        compact["entries"] = [compact_info(entry) if entry else entry for entry in compact["entries"]]
+    return compact
+
+def save_full_info(output_path: Path, info: Dict[str, Any]):
+    """
+    Write the complete info dict, gzip-compressed, next to the job's files
+    """
+    tmp_path = output_path / f"{FULL_INFO_FILE}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(info, f)
+    os.replace(tmp_path, output_path / FULL_INFO_FILE)
@@ -0,0 +1,129 @@
+import asyncio
+import os
+import time
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, Optional
+import aiofiles
+import httpx
+from app import metrics
+from app.services.bandwidth import JobThrottle
+from app.services.blob_store import IncrementalHasher
+from app.services.cancellation import JobCancelled
+from app.services.storage import Upload
+
+# Marks the end of the stream on the client queue
+_DONE = object()
+
+class PassThroughDownload:
+    """
+    Stream one progressive file to an HTTP client while teeing it to disk
+
+    A producer task reads the upstream response and writes every chunk to
+    a `.part` file; chunks are also handed to the client through a small
+    bounded queue, so a slow client slows the upstream read instead of
+    buffering the whole file in memory. If the client disconnects the
+    producer keeps going and the job still completes on disk. With a remote
+    storage backend the chunks also feed a multipart `upload`, so the object
+    is stored by the time the download finishes.
+    """
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        media_url: str,
+        headers: Dict[str, str],
+        target_path: Path,
+        platform: str,
+        on_progress: Callable[[int, Optional[int]], None],
+        buffer_chunks: int = 16,
+        upload: Optional[Upload] = None,
+        throttle: Optional[JobThrottle] = None
+    ):
+        self.client = client
+        self.media_url = media_url
+        self.headers = headers
+        self.target_path = target_path
+        self.platform = platform
+        self.on_progress = on_progress
+        self.chunks = asyncio.Queue(maxsize=buffer_chunks)
+        self.client_gone = False
+        self.headers_ready = asyncio.Event()
+        self.content_length: Optional[int] = None
+        self.error: Optional[Exception] = None
+        self.task: Optional[asyncio.Task] = None
+        # Checksum computed from the chunks as they're written
+        self.hasher = IncrementalHasher()
+        self.upload = upload
+        # Paces the upstream read to the job's share of the bandwidth budget
+        self.throttle = throttle
+
+    async def start(self):
+        """
+        Start fetching and wait for the upstream response headers
+        """
+        self.task = asyncio.create_task(self._produce())
+        await self.headers_ready.wait()
+        if self.error:
+            raise self.error
+
+    async def _produce(self):
+        part_path = self.target_path.with_name(self.target_path.name + ".part")
+        received = 0
+        started = time.perf_counter()
+        try:
+            async with self.client.stream("GET", self.media_url, headers=self.headers) as response:
+                response.raise_for_status()
+                if "content-length" in response.headers:
+                    self.content_length = int(response.headers["content-length"])
+                self.headers_ready.set()
+
+                async with aiofiles.open(part_path, "wb") as part:
+                    async for chunk in response.aiter_raw():
+                        await part.write(chunk)
+                        self.hasher.update(chunk)
+                        if self.upload is not None:
+                            await self.upload.write(chunk)
+                        received += len(chunk)
+                        metrics.DOWNLOAD_BYTES_TOTAL.labels(self.platform).inc(len(chunk))
+                        self.on_progress(received, self.content_length)
+                        if self.throttle is not None:
+                            await self.throttle.aconsume(len(chunk))
+                        if not self.client_gone:
+                            # Backpressure: wait for the client to take a chunk off the queue
+                            await self.chunks.put(chunk)
+
+            if self.upload is not None:
+                await self.upload.complete()
+            os.replace(part_path, self.target_path)
+            elapsed = time.perf_counter() - started
+            metrics.DOWNLOAD_PHASE_SECONDS.labels(self.platform, "download").observe(elapsed)
+            if elapsed > 0:
+                metrics.DOWNLOAD_THROUGHPUT.labels(self.platform).observe(received / elapsed)
+        except BaseException as e:
+            # Cancellation ends the client's response with an error too, not a short "complete" file
+            self.error = e if isinstance(e, Exception) else JobCancelled("Download cancelled")
+            if self.upload is not None:
+                await self.upload.abort()
+            raise
+        finally:
+            self.headers_ready.set()
+            if not self.client_gone:
+                await self.chunks.put(_DONE)
+
+    async def iter_chunks(self) -> AsyncIterator[bytes]:
+        """
+        Chunks for the HTTP response body, in order
+        """
+        try:
+            while True:
+                chunk = await self.chunks.get()
+                if chunk is _DONE:
+                    break
+                yield chunk
+            if self.error:
+                # Abort the response so the client doesn't mistake a truncated body for a file
+                raise self.error
+        finally:
+            # Also runs when the client disconnects: stop feeding it and unblock the producer
+            self.client_gone = True
+            while not self.chunks.empty():
+                self.chunks.get_nowait()
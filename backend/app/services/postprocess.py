@@ -0,0 +1,148 @@
+import asyncio
+import os
+import shutil
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from app import metrics
+from app.services.audio_pipeline import AUDIO_TARGETS
+
+# Output extension -> ffmpeg muxer for merged video files
+MERGE_MUXERS = {"mp4": "mp4", "m4a": "ipod", "mov": "mov", "webm": "webm", "mkv": "matroska"}
+
+async def _run_ffmpeg(ffmpeg: str, args: List[str], cancel_marker: Optional[str] = None):
+    proc = await asyncio.create_subprocess_exec(
+        ffmpeg, "-hide_banner", "-nostdin", "-loglevel", "error", "-y", *args,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    # Drain stderr concurrently so a chatty ffmpeg can never block on it
+    stderr_task = asyncio.create_task(proc.stderr.read())
+    exited = asyncio.ensure_future(proc.wait())
+    try:
+        while not (await asyncio.wait({exited}, timeout=0.5))[0]:
+            # The job was cancelled from the API process: stop burning CPU on it
+            if cancel_marker and os.path.exists(cancel_marker):
+                raise RuntimeError("ffmpeg stopped: download cancelled")
+    except BaseException:
+        # Also reached when the job's task is cancelled
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        exited.cancel()
+        stderr_task.cancel()
+        raise
+    stderr = (await stderr_task).decode(errors="replace").strip()
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed ({proc.returncode}): {stderr[-500:] or 'no output'}")
+
+async def merge_formats(ffmpeg: str, inputs: List[str], output: str, cancel_marker: Optional[str] = None) -> str:
+    """
+    Mux separately downloaded video/audio streams into one file
+    """
+    ext = Path(output).suffix[1:]
+    part = output + ".part"
+    args = []
+    for path in inputs:
+        args += ["-i", path]
+    for index in range(len(inputs)):
+        args += ["-map", str(index)]
+    await _run_ffmpeg(ffmpeg, args + ["-c", "copy", "-f", MERGE_MUXERS.get(ext, "matroska"), part], cancel_marker)
+    os.replace(part, output)
+    for path in inputs:
+        os.remove(path)
+    return output
+
+async def extract_audio(ffmpeg: str, source: str, target: str, output: str, copy: bool = False, cancel_marker: Optional[str] = None) -> str:
+    """
+    Convert a downloaded media file to the requested audio format
+    """
+    _, encoder_args, muxer = AUDIO_TARGETS[target]
+    part = output + ".part"
+    codec_args = ["-c:a", "copy"] if copy else encoder_args
+    await _run_ffmpeg(ffmpeg, ["-i", source, "-vn", *codec_args, "-f", muxer, part], cancel_marker)
+    os.replace(part, output)
+    os.remove(source)
+    return output
+
+async def render_thumbnail(ffmpeg: str, source: str, output: str, width: int = 320) -> str:
+    """
+    Scale an image, or pick a representative frame of a video, into a small JPEG
+    """
+    part = output + ".part"
+    # `thumbnail` picks a representative frame (skips black intro frames); images have just one
+    await _run_ffmpeg(ffmpeg, ["-i", source, "-vf", f"thumbnail,scale={width}:-2", "-frames:v", "1", "-q:v", "4", "-f", "mjpeg", part])
+    os.replace(part, output)
+    return output
+
+class PostprocessPool:
+    """
+    CPU budget for ffmpeg postprocessing, separate from the download threads
+
+    Merges and audio conversions are submitted here once the network stage
+    has finished, so download slots aren't held while ffmpeg runs. Work waits
+    in an async queue for one of `max_workers` slots (default: one per core)
+    and runs as an ffmpeg subprocess awaited on the event loop, so no worker
+    process or thread sits between the job and ffmpeg. Streaming transcodes
+    that manage their own ffmpeg process take a slot from the same budget via
+    `slot()`.
+    """
+    def __init__(self, max_workers: Optional[int] = None):
+        self.ffmpeg = shutil.which(os.getenv("FFMPEG_PATH", "ffmpeg"))
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._slots = None
+
+    @property
+    def available(self) -> bool:
+        return self.ffmpeg is not None
+
+    @asynccontextmanager
+    async def slot(self, kind: str):
+        """
+        Wait in the postprocess queue for a CPU slot
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        queued_at = time.perf_counter()
+        metrics.POSTPROCESS_QUEUED.labels(kind).inc()
+        try:
+            await self._slots.acquire()
+        finally:
+            metrics.POSTPROCESS_QUEUED.labels(kind).dec()
+        metrics.POSTPROCESS_WAIT_SECONDS.labels(kind).observe(time.perf_counter() - queued_at)
+        metrics.POSTPROCESS_RUNNING.labels(kind).inc()
+        try:
+            yield
+        finally:
+            metrics.POSTPROCESS_RUNNING.labels(kind).dec()
+            self._slots.release()
+
+    async def run(self, kind: str, platform: str, fn: Callable, *args) -> Any:
+        """
+        Await the ffmpeg step `fn(*args)` once a slot is free
+        """
+        async with self.slot(kind):
+            started = time.perf_counter()
+            result = "failed"
+            try:
+                value = await fn(*args)
+                result = "ok"
+                return value
+            finally:
+                elapsed = time.perf_counter() - started
+                metrics.POSTPROCESS_SECONDS.labels(kind, result).observe(elapsed)
+                metrics.DOWNLOAD_PHASE_SECONDS.labels(platform, "postprocess").observe(elapsed)
+
+    async def run_plan(self, plan: Dict[str, Any], platform: str) -> str:
+        """
+        Execute a postprocess plan produced by the download stage; returns the output path
+        """
+        if plan["kind"] == "merge":
+            return await self.run("merge", platform, merge_formats, self.ffmpeg, plan["inputs"], plan["output"], plan.get("cancel_marker"))
+        if plan["kind"] == "extract_audio":
+            return await self.run(
+                "extract_audio", platform, extract_audio,
+                self.ffmpeg, plan["input"], plan["target"], plan["output"], plan.get("copy", False), plan.get("cancel_marker")
+            )
+        raise ValueError(f"Unknown postprocess step: {plan['kind']}")
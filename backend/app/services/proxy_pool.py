@@ -0,0 +1,276 @@
+import asyncio
+import logging
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+import httpx
+from app import metrics
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Pool used by platforms that have none of their own
+ANY_PLATFORM = "*"
+
+# Browser identities; each proxy keeps one, so an exit IP always presents the same client
+USER_AGENTS = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:120.0) Gecko/20100101 Firefox/120.0",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+# Error text (yt-dlp and httpx) that points at the exit rather than at the content
+PROXY_ERROR_MARKERS = (
+    "proxy", "tunnel", "timed out", "connection refused", "connection reset",
+    "unable to connect", "remote end closed", "network is unreachable",
+    "http error 403", "http error 407", "http error 429", "http error 502", "403 forbidden",
+    "429 too many requests", "502 bad gateway"
+)
+
+# Latency assumed for proxies that haven't been measured yet
+DEFAULT_LATENCY = 1.0
+
+def parse_proxies(value: Optional[str]) -> List[str]:
+    """
+    Split a comma separated list of proxy URLs
+    """
+    return [url.strip() for url in (value or "").split(",") if url.strip()]
+
+def is_proxy_failure(error: Optional[BaseException]) -> bool:
+    """
+    Whether a failed request should count against the proxy it went through
+    """
+    if error is None:
+        return False
+    if isinstance(error, httpx.TransportError):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in PROXY_ERROR_MARKERS)
+
+def redact(url: str) -> str:
+    """
+    A proxy URL without its credentials, for logs and metric labels
+    """
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    return f"{parts.scheme}://{host}:{parts.port}" if parts.port else f"{parts.scheme}://{host}"
+
+class Proxy:
+    """
+    One egress proxy of a platform's pool and its health
+    """
+    def __init__(self, url: str, platform: str):
+        self.url = url
+        self.label = redact(url)
+        self.platform = platform
+        self.user_agent = USER_AGENTS[zlib.crc32(url.encode()) % len(USER_AGENTS)]
+        # Smoothed health check latency, None until measured
+        self.latency: Optional[float] = None
+        # Smoothed share of requests that succeeded
+        self.success_rate = 1.0
+        self.consecutive_failures = 0
+        self.in_use = 0
+        self.evicted_until = 0.0
+        self.evictions = 0
+
+    @property
+    def healthy(self) -> bool:
+        return self.evicted_until <= time.monotonic()
+
+    @property
+    def score(self) -> float:
+        # Lower is better: fast, reliable and not busy
+        return (self.latency or DEFAULT_LATENCY) * (1 + self.in_use) / max(self.success_rate, 0.05)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "proxy": self.label,
+            "healthy": self.healthy,
+            "latency": round(self.latency, 3) if self.latency is not None else None,
+            "success_rate": round(self.success_rate, 3),
+            "in_use": self.in_use,
+            "evicted_for": max(0.0, round(self.evicted_until - time.monotonic(), 1))
+        }
+
+class ProxyPool:
+    """
+    Egress proxies per platform, assigned to jobs by health score
+
+    `acquire` hands out the healthy proxy with the best score (latency,
+    success rate and current load) and `release` reports how the request
+    went. A proxy that fails `max_failures` times in a row is evicted for
+    `cooldown` seconds, doubling on every further eviction; a successful
+    request or health check brings it back. With `check_url` set,
+    `run_health_checks` fetches it through every proxy each `check_interval`
+    seconds, which measures latency and readmits proxies that recovered.
+
+    Platforms in `sticky_platforms` keep a URL on the proxy that first
+    handled it for `sticky_ttl` seconds (as long as it stays healthy), so
+    media URLs bound to the extracting IP are downloaded from the same IP,
+    retries included.
+
+    Streaming paths get one pooled httpx client per proxy from `client`.
+    """
+    def __init__(
+        self,
+        proxies: Dict[str, List[str]],
+        sticky_platforms: Iterable[str] = (),
+        sticky_ttl: float = 900,
+        max_failures: int = 3,
+        cooldown: float = 300,
+        check_url: Optional[str] = None,
+        check_interval: float = 30,
+        check_timeout: float = 10
+    ):
+        self._pools: Dict[str, List[Proxy]] = {
+            platform: [Proxy(url, platform) for url in urls]
+            for platform, urls in proxies.items()
+            if urls
+        }
+        self.sticky_platforms = set(sticky_platforms)
+        self._sticky = TTLCache(ttl=sticky_ttl, max_size=10000)
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.check_url = check_url
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._lock = threading.Lock()
+        for platform in self._pools:
+            self._report_healthy(platform)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._pools)
+
+    def _proxies(self, platform: str) -> List[Proxy]:
+        return self._pools.get(platform) or self._pools.get(ANY_PLATFORM) or []
+
+    def acquire(self, platform: str, key: Optional[str] = None) -> Optional[Proxy]:
+        """
+        Pick a proxy for a request about `key` (a canonical URL); None means go direct
+        """
+        with self._lock:
+            proxies = self._proxies(platform)
+            if not proxies:
+                return None
+            sticky = key is not None and platform in self.sticky_platforms
+            proxy = None
+            if sticky:
+                url = self._sticky.get(f"{platform}|{key}")
+                proxy = next((p for p in proxies if p.url == url and p.healthy), None)
+            if proxy is None:
+                healthy = [p for p in proxies if p.healthy]
+                # With every proxy evicted, use the one closest to coming back rather than our own IP
+                proxy = min(healthy, key=lambda p: p.score) if healthy else min(proxies, key=lambda p: p.evicted_until)
+            if sticky:
+                self._sticky.set(f"{platform}|{key}", proxy.url)
+            proxy.in_use += 1
+        metrics.PROXY_ASSIGNMENTS_TOTAL.labels(proxy.platform, proxy.label).inc()
+        return proxy
+
+    def release(self, proxy: Optional[Proxy], error: Optional[BaseException] = None):
+        """
+        Return a proxy after use; errors caused by the exit count against its health
+        """
+        if proxy is None:
+            return
+        with self._lock:
+            proxy.in_use = max(0, proxy.in_use - 1)
+            self._record(proxy, not is_proxy_failure(error))
+
+    def _record(self, proxy: Proxy, ok: bool, latency: Optional[float] = None):
+        if latency is not None:
+            proxy.latency = latency if proxy.latency is None else 0.7 * proxy.latency + 0.3 * latency
+            metrics.PROXY_LATENCY_SECONDS.labels(proxy.label).set(proxy.latency)
+        proxy.success_rate = 0.8 * proxy.success_rate + 0.2 * (1.0 if ok else 0.0)
+        metrics.PROXY_OUTCOMES_TOTAL.labels(proxy.platform, proxy.label, "ok" if ok else "failed").inc()
+        if ok:
+            proxy.consecutive_failures = 0
+            if not proxy.healthy:
+                logger.info(f"Proxy {proxy.label} is back in the {proxy.platform} pool")
+            proxy.evicted_until = 0.0
+            proxy.evictions = 0
+        else:
+            proxy.consecutive_failures += 1
+            if proxy.consecutive_failures >= self.max_failures and proxy.healthy:
+                proxy.evictions += 1
+                backoff = self.cooldown * 2 ** min(proxy.evictions - 1, 4)
+                proxy.evicted_until = time.monotonic() + backoff
+                proxy.consecutive_failures = 0
+                metrics.PROXY_EVICTIONS_TOTAL.labels(proxy.platform, proxy.label).inc()
+                logger.warning(f"Evicted proxy {proxy.label} from the {proxy.platform} pool for {backoff:.0f}s")
+        self._report_healthy(proxy.platform)
+
+    def _report_healthy(self, platform: str):
+        metrics.PROXY_HEALTHY.labels(platform).set(sum(1 for p in self._pools[platform] if p.healthy))
+
+    def client(self, proxy: Optional[Proxy], default: httpx.AsyncClient) -> httpx.AsyncClient:
+        """
+        Pooled streaming client that goes through `proxy` (`default` when going direct)
+        """
+        if proxy is None:
+            return default
+        client = self._clients.get(proxy.url)
+        if client is None:
+            client = self._clients[proxy.url] = httpx.AsyncClient(
+                proxy=proxy.url,
+                timeout=httpx.Timeout(30.0, connect=10.0),
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+                follow_redirects=True
+            )
+        return client
+
+    async def check(self):
+        """
+        Fetch `check_url` through every proxy once, concurrently
+        """
+        by_url: Dict[str, List[Proxy]] = {}
+        for proxies in self._pools.values():
+            for proxy in proxies:
+                by_url.setdefault(proxy.url, []).append(proxy)
+
+        async def check_one(url: str, proxies: List[Proxy]):
+            started = time.perf_counter()
+            try:
+                response = await self.client(proxies[0], None).get(
+                    self.check_url,
+                    headers={"User-Agent": proxies[0].user_agent},
+                    timeout=self.check_timeout
+                )
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latency = time.perf_counter() - started
+            with self._lock:
+                for proxy in proxies:
+                    self._record(proxy, ok, latency if ok else None)
+
+        await asyncio.gather(*(check_one(url, proxies) for url, proxies in by_url.items()))
+
+    async def run_health_checks(self):
+        """
+        Check every proxy on an interval; run as a background task
+        """
+        while True:
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Proxy health check failed: {e}")
+            await asyncio.sleep(self.check_interval)
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Health of every proxy, by platform
+        """
+        with self._lock:
+            return {platform: [proxy.snapshot() for proxy in proxies] for platform, proxies in self._pools.items()}
+
+    async def aclose(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
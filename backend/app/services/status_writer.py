@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import time
+from typing import Dict
+
+import orjson
+
+from app import metrics
+from app.services.job_queue import JobQueue, TERMINAL_STATUSES
+
+logger = logging.getLogger(__name__)
+
+def _snapshot(status: Dict) -> Dict:
+    """
+    Deep copy of a live status record
+
+    A round trip through orjson detaches nested dicts (file_info, items)
+    too, and the encoder runs without releasing the GIL, so a download
+    thread can't change the record halfway through the copy.
+    """
+    return orjson.loads(orjson.dumps(status))
+
+class StatusWriteBuffer:
+    """
+    Write-behind buffer for the status rows of running jobs
+
+    Progress snapshots are kept per job, so a job that ticks many times
+    between flushes costs one row write, and snapshots equal to the last
+    one written are dropped. Every `flush_interval` the pending rows go to
+    the database in one batched transaction. Final states are written
+    durably: `write_now` returns only once the row is committed.
+
+    At most `max_pending` jobs can wait for a flush; a producer with a new
+    job beyond that waits for the next flush (which it triggers), so a slow
+    database slows status publishing instead of growing memory.
+    """
+    def __init__(self, job_queue: JobQueue, flush_interval: float = 1.0, max_pending: int = 1000):
+        self.job_queue = job_queue
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending: Dict[str, Dict] = {}
+        # Last snapshot written per running job, to skip unchanged ones
+        self._written: Dict[str, Dict] = {}
+        self._flush_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+
+    async def put(self, download_id: str, status: Dict):
+        """
+        Queue the current status of a job for the next flush
+        """
+        # Copy now: the live dict keeps changing under the download threads
+        snapshot = _snapshot(status)
+        if download_id in self.pending:
+            self.pending[download_id] = snapshot
+            metrics.STATUS_UPDATES_TOTAL.labels("coalesced").inc()
+            return
+        if self._written.get(download_id) == snapshot:
+            metrics.STATUS_UPDATES_TOTAL.labels("unchanged").inc()
+            return
+
+        while len(self.pending) >= self.max_pending:
+            # Backpressure: wait for a flush to make room
+            metrics.STATUS_BUFFER_FULL_TOTAL.inc()
+            self._space.clear()
+            self._wake.set()
+            await self._space.wait()
+            if download_id in self.pending:
+                break
+        self.pending[download_id] = snapshot
+        metrics.STATUS_UPDATES_TOTAL.labels("buffered").inc()
+        metrics.STATUS_BUFFER_PENDING.set(len(self.pending))
+
+    async def write_now(self, download_id: str, status: Dict):
+        """
+        Write a job's status durably (with everything else pending)
+
+        Raises if the database write fails; the snapshot stays buffered and
+        is retried on the next flush.
+        """
+        self.pending[download_id] = _snapshot(status)
+        metrics.STATUS_UPDATES_TOTAL.labels("durable").inc()
+        await self.flush()
+
+    async def flush(self) -> int:
+        """
+        Write every pending snapshot in one batch; returns the number of rows
+        """
+        async with self._flush_lock:
+            if not self.pending:
+                return 0
+            batch, self.pending = self.pending, {}
+            self._space.set()
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self.job_queue.save_statuses, batch)
+            except Exception:
+                metrics.STATUS_FLUSH_ERRORS_TOTAL.inc()
+                # Keep the rows for the next flush, unless a newer snapshot arrived meanwhile
+                for download_id, snapshot in batch.items():
+                    self.pending.setdefault(download_id, snapshot)
+                raise
+            finally:
+                metrics.STATUS_BUFFER_PENDING.set(len(self.pending))
+
+            metrics.STATUS_FLUSH_SECONDS.observe(time.perf_counter() - started)
+            metrics.STATUS_FLUSH_BATCH_SIZE.observe(len(batch))
+            for download_id, snapshot in batch.items():
+                if snapshot.get("status") in TERMINAL_STATUSES:
+                    self._written.pop(download_id, None)
+                else:
+                    self._written[download_id] = snapshot
+            return len(batch)
+
+    def forget(self, download_id: str):
+        """
+        Drop the bookkeeping of a job this process no longer runs
+        """
+        self._written.pop(download_id, None)
+
+    async def run(self):
+        """
+        Flush on an interval, or sooner when the buffer fills up
+        """
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Status flush failed ({len(self.pending)} job(s) pending): {e}")
+                # Producers stuck on a full buffer retry along with us; don't spin on a dead database
+                await asyncio.sleep(self.flush_interval)
@@ -0,0 +1,386 @@
+import datetime
+import hashlib
+import hmac
+import mimetypes
+import os
+import re
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import quote, urlparse
+import aiofiles
+import httpx
+
+CHUNK_SIZE = 1024 * 1024
+
+class StorageError(Exception):
+    """Raised when the storage backend rejects an operation"""
+
+class Upload:
+    """
+    An in-progress upload fed chunk by chunk; `complete()` makes the object visible
+    """
+    async def write(self, chunk: bytes):
+        raise NotImplementedError
+
+    async def complete(self):
+        raise NotImplementedError
+
+    async def abort(self):
+        raise NotImplementedError
+
+class StorageBackend:
+    """
+    Where finished downloads live
+
+    Keys are slash-separated paths such as `tiktok/<download_id>/clip.mp4`
+    or `blobs/ab/<sha256>`. Reads support byte ranges so `/files` can serve
+    partial content; backends that can hand out direct URLs return them
+    from `presigned_url` and the API redirects there instead of proxying.
+    """
+    name = "base"
+
+    async def put_file(self, key: str, path: Path, content_type: Optional[str] = None):
+        upload = await self.open_upload(key, content_type)
+        try:
+            async with aiofiles.open(path, "rb") as f:
+                while True:
+                    chunk = await f.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    await upload.write(chunk)
+            await upload.complete()
+        except BaseException:
+            await upload.abort()
+            raise
+
+    async def open_upload(self, key: str, content_type: Optional[str] = None) -> Upload:
+        raise NotImplementedError
+
+    def stream(self, key: str, start: Optional[int] = None, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        raise NotImplementedError
+
+    async def stat(self, key: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    def presigned_url(self, key: str, expires: int = 3600, filename: Optional[str] = None) -> Optional[str]:
+        return None
+
+    async def aclose(self):
+        pass
+
+class LocalUpload(Upload):
+    def __init__(self, target: Path):
+        self.target = target
+        self.part = target.with_name(target.name + ".upload")
+        self.file = None
+
+    async def write(self, chunk: bytes):
+        if self.file is None:
+            self.target.parent.mkdir(parents=True, exist_ok=True)
+            self.file = await aiofiles.open(self.part, "wb")
+        await self.file.write(chunk)
+
+    async def complete(self):
+        if self.file is None:
+            await self.write(b"")
+        await self.file.close()
+        os.replace(self.part, self.target)
+
+    async def abort(self):
+        if self.file is not None:
+            await self.file.close()
+        self.part.unlink(missing_ok=True)
+
+class LocalStorage(StorageBackend):
+    """
+    Objects as plain files under a root directory (the default; single node)
+    """
+    name = "local"
+
+    def __init__(self, root: Path):
+        self.root = root.resolve()
+
+    def path_for(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        # Keys come from our own code, but never let one escape the root
+        if self.root not in path.parents:
+            raise StorageError(f"Invalid key: {key}")
+        return path
+
+    async def put_file(self, key: str, path: Path, content_type: Optional[str] = None):
+        target = self.path_for(key)
+        if target == path.resolve():
+            return
+        await super().put_file(key, path, content_type)
+
+    async def open_upload(self, key: str, content_type: Optional[str] = None) -> Upload:
+        return LocalUpload(self.path_for(key))
+
+    async def stream(self, key: str, start: Optional[int] = None, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        path = self.path_for(key)
+        remaining = None if end is None else end - (start or 0) + 1
+        async with aiofiles.open(path, "rb") as f:
+            if start:
+                await f.seek(start)
+            while remaining is None or remaining > 0:
+                chunk = await f.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    async def stat(self, key: str) -> Optional[Dict]:
+        path = self.path_for(key)
+        if not path.is_file():
+            return None
+        stat = path.stat()
+        return {
+            "size": stat.st_size,
+            "modified": stat.st_mtime,
+            "content_type": mimetypes.guess_type(path.name)[0]
+        }
+
+    async def delete(self, key: str):
+        self.path_for(key).unlink(missing_ok=True)
+
+class S3Upload(Upload):
+    """
+    Multipart upload that ships each part as soon as `part_size` bytes arrived
+    """
+    def __init__(self, storage: "S3Storage", key: str, content_type: Optional[str]):
+        self.storage = storage
+        self.key = key
+        self.content_type = content_type
+        self.buffer = bytearray()
+        self.upload_id = None
+        self.parts: List[Tuple[int, str]] = []
+
+    async def write(self, chunk: bytes):
+        self.buffer += chunk
+        if len(self.buffer) >= self.storage.part_size:
+            await self._flush_part()
+
+    async def _flush_part(self):
+        if self.upload_id is None:
+            headers = {"Content-Type": self.content_type} if self.content_type else {}
+            response = await self.storage.request("POST", self.key, query={"uploads": ""}, headers=headers)
+            self.upload_id = _xml_value(response.text, "UploadId")
+        part_number = len(self.parts) + 1
+        body = bytes(self.buffer)
+        self.buffer.clear()
+        response = await self.storage.request(
+            "PUT", self.key,
+            query={"partNumber": str(part_number), "uploadId": self.upload_id},
+            content=body
+        )
+        self.parts.append((part_number, response.headers.get("ETag", "")))
+
+    async def complete(self):
+        if self.upload_id is None:
+            # Small object: a single PUT is cheaper than a multipart round trip
+            headers = {"Content-Type": self.content_type} if self.content_type else {}
+            await self.storage.request("PUT", self.key, headers=headers, content=bytes(self.buffer))
+            return
+        if self.buffer:
+            await self._flush_part()
+        body = "<CompleteMultipartUpload>" + "".join(
+            f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>" for number, etag in self.parts
+        ) + "</CompleteMultipartUpload>"
+        response = await self.storage.request(
+            "POST", self.key, query={"uploadId": self.upload_id}, content=body.encode()
+        )
+        # S3 can report a failed completion inside a 200 response
+        if "<Error>" in response.text:
+            raise StorageError(f"Completing upload of {self.key} failed: {response.text[:300]}")
+
+    async def abort(self):
+        if self.upload_id is not None:
+            try:
+                await self.storage.request("DELETE", self.key, query={"uploadId": self.upload_id})
+            except (StorageError, httpx.HTTPError):
+                pass
+
+class S3Storage(StorageBackend):
+    """
+    S3-compatible object storage (AWS S3, MinIO, R2, ...) over the S3 REST API
+
+    Requests are signed with AWS Signature V4 and sent over a pooled httpx
+    client; path-style addressing is used so any endpoint URL works.
+    """
+    name = "s3"
+
+    def __init__(
+        self,
+        endpoint_url: str,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str = "us-east-1",
+        prefix: str = "",
+        part_size: int = 8 * 1024 * 1024,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.host = urlparse(self.endpoint_url).netloc
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.prefix = prefix.strip("/")
+        # S3 requires parts of at least 5 MiB (except the last)
+        self.part_size = max(part_size, 5 * 1024 * 1024)
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            transport=transport
+        )
+
+    def _path(self, key: str) -> str:
+        full_key = f"{self.prefix}/{key}" if self.prefix else key
+        return "/" + quote(f"{self.bucket}/{full_key}", safe="/-_.~")
+
+    def _signing_key(self, date: str) -> bytes:
+        key = ("AWS4" + self.secret_key).encode()
+        for part in (date, self.region, "s3", "aws4_request"):
+            key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+        return key
+
+    def _signature(self, method: str, path: str, query: Dict[str, str], headers: Dict[str, str], payload_hash: str, amz_date: str) -> Tuple[str, str, str]:
+        canonical_query = "&".join(
+            f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}" for k, v in sorted(query.items())
+        )
+        signed = sorted(name.lower() for name in headers)
+        lowered = {name.lower(): str(value).strip() for name, value in headers.items()}
+        canonical_headers = "".join(f"{name}:{lowered[name]}\n" for name in signed)
+        signed_headers = ";".join(signed)
+        canonical_request = "\n".join([method, path, canonical_query, canonical_headers, signed_headers, payload_hash])
+
+        scope = f"{amz_date[:8]}/{self.region}/s3/aws4_request"
+        string_to_sign = "\n".join([
+            "AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest()
+        ])
+        signature = hmac.new(self._signing_key(amz_date[:8]), string_to_sign.encode(), hashlib.sha256).hexdigest()
+        return signature, scope, signed_headers
+
+    def _amz_date(self) -> str:
+        return datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    async def request(
+        self,
+        method: str,
+        key: str,
+        query: Optional[Dict[str, str]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        content: Optional[bytes] = None,
+        stream: bool = False,
+        ok_statuses: Tuple[int, ...] = (200, 204, 206)
+    ) -> httpx.Response:
+        query = query or {}
+        path = self._path(key)
+        amz_date = self._amz_date()
+        payload_hash = hashlib.sha256(content or b"").hexdigest()
+        headers = {
+            **(headers or {}),
+            "Host": self.host,
+            "x-amz-date": amz_date,
+            "x-amz-content-sha256": payload_hash
+        }
+        signature, scope, signed_headers = self._signature(method, path, query, headers, payload_hash, amz_date)
+        headers["Authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+            f"SignedHeaders={signed_headers}, Signature={signature}"
+        )
+        url = self.endpoint_url + path
+        if query:
+            url += "?" + "&".join(f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}" for k, v in sorted(query.items()))
+
+        request = self.client.build_request(method, url, headers=headers, content=content)
+        response = await self.client.send(request, stream=stream)
+        if response.status_code not in ok_statuses:
+            body = (await response.aread()).decode(errors="replace")
+            await response.aclose()
+            if response.status_code == 404:
+                raise FileNotFoundError(key)
+            raise StorageError(f"S3 {method} {key} failed with HTTP {response.status_code}: {body[:300]}")
+        return response
+
+    async def open_upload(self, key: str, content_type: Optional[str] = None) -> Upload:
+        return S3Upload(self, key, content_type or mimetypes.guess_type(key)[0])
+
+    async def stream(self, key: str, start: Optional[int] = None, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        headers = {}
+        if start is not None or end is not None:
+            headers["Range"] = f"bytes={start or 0}-{'' if end is None else end}"
+        response = await self.request("GET", key, headers=headers, stream=True)
+        try:
+            async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                yield chunk
+        finally:
+            await response.aclose()
+
+    async def stat(self, key: str) -> Optional[Dict]:
+        try:
+            response = await self.request("HEAD", key)
+        except FileNotFoundError:
+            return None
+        return {
+            "size": int(response.headers.get("Content-Length", 0)),
+            "etag": response.headers.get("ETag"),
+            "content_type": response.headers.get("Content-Type")
+        }
+
+    async def delete(self, key: str):
+        await self.request("DELETE", key)
+
+    def presigned_url(self, key: str, expires: int = 3600, filename: Optional[str] = None) -> Optional[str]:
+        """
+        Time-limited GET URL clients can download from directly
+        """
+        path = self._path(key)
+        amz_date = self._amz_date()
+        query = {
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{self.access_key}/{amz_date[:8]}/{self.region}/s3/aws4_request",
+            "X-Amz-Date": amz_date,
+            "X-Amz-Expires": str(expires),
+            "X-Amz-SignedHeaders": "host"
+        }
+        if filename:
+            query["response-content-disposition"] = f"attachment; filename*=UTF-8''{quote(filename)}"
+        signature, _, _ = self._signature("GET", path, query, {"Host": self.host}, "UNSIGNED-PAYLOAD", amz_date)
+        query["X-Amz-Signature"] = signature
+        return self.endpoint_url + path + "?" + "&".join(
+            f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}" for k, v in sorted(query.items())
+        )
+
+    async def aclose(self):
+        await self.client.aclose()
+
+def _xml_value(xml: str, tag: str) -> str:
+    match = re.search(f"<{tag}>([^<]+)</{tag}>", xml)
+    if not match:
+        raise StorageError(f"Missing <{tag}> in S3 response: {xml[:300]}")
+    return match.group(1)
+
+def create_storage(downloads_dir: Path) -> StorageBackend:
+    """
+    Storage backend selected by STORAGE_BACKEND (local or s3)
+    """
+    backend = os.getenv("STORAGE_BACKEND", "local").lower()
+    if backend == "s3":
+        return S3Storage(
+            endpoint_url=os.getenv("S3_ENDPOINT_URL", "https://s3.amazonaws.com"),
+            bucket=os.environ["S3_BUCKET"],
+            access_key=os.getenv("S3_ACCESS_KEY_ID", ""),
+            secret_key=os.getenv("S3_SECRET_ACCESS_KEY", ""),
+            region=os.getenv("S3_REGION", "us-east-1"),
+            prefix=os.getenv("S3_PREFIX", ""),
+            part_size=int(os.getenv("S3_PART_SIZE", str(8 * 1024 * 1024)))
+        )
+    if backend != "local":
+        raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+    return LocalStorage(downloads_dir)
@@ -0,0 +1,125 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from app.database import SessionLocal
+from app.models import SyncArchiveEntry, SyncSource
+from app.utils.helpers import canonicalize_url
+
+class SyncArchive:
+    """
+    Persistent per-source index of profile/playlist items already scheduled
+
+    Each synced profile or playlist is keyed by its canonical URL and keeps
+    the ids of every item it has handed to the download pipeline, plus the
+    newest item seen on the last sync as a watermark and whether that sync
+    covered the whole feed.
+    """
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+
+    def begin_sync(self, url: str, platform: str) -> Dict:
+        """
+        Look up a source by URL for a new sync, registering it on first sync
+
+        Returns the source as the previous sync left it and clears its
+        `reached_end` flag until this one covers the feed, so a sync that
+        is cut short (max_items, cancel, failure, crash) makes the next one
+        walk past the items it scheduled instead of stopping on them.
+        """
+        source_key = canonicalize_url(url)
+        db = self.session_factory()
+        try:
+            source = db.query(SyncSource).filter(SyncSource.source_key == source_key).first()
+            if source is None:
+                source = SyncSource(source_key=source_key, url=url, platform=platform, item_count=0, reached_end=False)
+                db.add(source)
+                db.commit()
+                db.refresh(source)
+            previous = self._to_dict(source)
+            if source.reached_end:
+                source.reached_end = False
+                db.commit()
+            return previous
+        finally:
+            db.close()
+
+    def known_items(self, source_id: int, item_ids: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Map the already archived ids among `item_ids` to their download ids
+        """
+        if not item_ids:
+            return {}
+        db = self.session_factory()
+        try:
+            rows = (
+                db.query(SyncArchiveEntry.item_id, SyncArchiveEntry.download_id)
+                .filter(SyncArchiveEntry.source_id == source_id, SyncArchiveEntry.item_id.in_(item_ids))
+                .all()
+            )
+            return {item_id: download_id for item_id, download_id in rows}
+        finally:
+            db.close()
+
+    def record(self, source_id: int, items: List[Tuple[str, str]]):
+        """
+        Archive (item_id, download_id) pairs; re-recording an item points it at the new download
+        """
+        if not items:
+            return
+        db = self.session_factory()
+        try:
+            existing = {
+                entry.item_id: entry
+                for entry in db.query(SyncArchiveEntry).filter(
+                    SyncArchiveEntry.source_id == source_id,
+                    SyncArchiveEntry.item_id.in_([item_id for item_id, _ in items])
+                )
+            }
+            added = 0
+            for item_id, download_id in items:
+                if item_id in existing:
+                    existing[item_id].download_id = download_id
+                else:
+                    db.add(SyncArchiveEntry(source_id=source_id, item_id=item_id, download_id=download_id))
+                    added += 1
+            source = db.get(SyncSource, source_id)
+            source.item_count = (source.item_count or 0) + added
+            db.commit()
+        finally:
+            db.close()
+
+    def mark_synced(self, source_id: int, newest_item_id: Optional[str], reached_end: bool = False):
+        """
+        Move the watermark after a finished sync
+
+        `reached_end` records that the sync enumerated the feed to its oldest
+        item, or caught up with an archive that already covered the rest.
+        """
+        db = self.session_factory()
+        try:
+            source = db.get(SyncSource, source_id)
+            if newest_item_id:
+                source.newest_item_id = newest_item_id
+            source.reached_end = reached_end
+            source.last_synced_at = datetime.utcnow()
+            db.commit()
+        finally:
+            db.close()
+
+    def list_sources(self) -> List[Dict]:
+        db = self.session_factory()
+        try:
+            return [self._to_dict(source) for source in db.query(SyncSource).order_by(SyncSource.created_at).all()]
+        finally:
+            db.close()
+
+    def _to_dict(self, source: SyncSource) -> Dict:
+        return {
+            "id": source.id,
+            "url": source.url,
+            "source_key": source.source_key,
+            "platform": source.platform,
+            "newest_item_id": source.newest_item_id,
+            "reached_end": bool(source.reached_end),
+            "item_count": source.item_count or 0,
+            "last_synced_at": source.last_synced_at.isoformat() if source.last_synced_at else None
+        }
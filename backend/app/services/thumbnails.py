@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import re
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+import aiofiles
+import httpx
+from app.services.postprocess import PostprocessPool, render_thumbnail
+
+# Thumbnails are addressed by the sha256 of their bytes plus extension
+THUMBNAIL_KEY_PATTERN = re.compile(r"^[0-9a-f]{64}\.(jpg|png|webp)$")
+
+MEDIA_EXTENSIONS = (".mp4", ".webm", ".mkv", ".mov", ".avi", ".jpg", ".jpeg", ".png", ".webp")
+
+class ThumbnailStore:
+    """
+    Content-hashed on-disk cache of small preview images
+
+    Files live at `<cache_dir>/<key[:2]>/<key>` where the key is the sha256
+    of the image, so identical thumbnails are stored once and URLs built
+    from a key never change meaning (safe to cache forever). Previews come
+    from the platform's thumbnail, scaled down with ffmpeg when available,
+    or from a representative frame of the downloaded video.
+    """
+    def __init__(self, cache_dir: Path, postprocess: PostprocessPool, width: int = 320, max_source_bytes: int = 5 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.postprocess = postprocess
+        self.width = width
+        self.max_source_bytes = max_source_bytes
+
+    def path_for(self, key: str) -> Optional[Path]:
+        if not THUMBNAIL_KEY_PATTERN.match(key):
+            return None
+        path = self.cache_dir / key[:2] / key
+        return path if path.exists() else None
+
+    async def generate(
+        self,
+        client: httpx.AsyncClient,
+        job_dir: Path,
+        thumbnail_url: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None,
+        platform: str = "unknown"
+    ) -> Optional[str]:
+        """
+        Build a preview for a finished job and return its cache key
+        """
+        tmp_dir = self.cache_dir / "tmp"
+        tmp_dir.mkdir(exist_ok=True)
+        tmp_name = uuid.uuid4().hex
+        source = tmp_dir / f"{tmp_name}.src"
+        rendered = tmp_dir / f"{tmp_name}.jpg"
+        try:
+            thumbnail_url = thumbnail_url or self._thumbnail_from_info_json(job_dir)
+            if thumbnail_url and await self._fetch(client, thumbnail_url, headers or {}, source):
+                if not self.postprocess.available:
+                    # No ffmpeg to scale it down: cache the platform's image as-is
+                    return await self._store(source, self._image_ext(thumbnail_url))
+                await self.postprocess.run("thumbnail", platform, render_thumbnail, self.postprocess.ffmpeg, str(source), str(rendered), self.width)
+                return await self._store(rendered, "jpg")
+
+            media = self._media_file(job_dir)
+            if media is not None and self.postprocess.available:
+                await self.postprocess.run("thumbnail", platform, render_thumbnail, self.postprocess.ffmpeg, str(media), str(rendered), self.width)
+                return await self._store(rendered, "jpg")
+            return None
+        finally:
+            for path in (source, rendered):
+                path.unlink(missing_ok=True)
+
+    async def _fetch(self, client: httpx.AsyncClient, url: str, headers: Dict[str, str], target: Path) -> bool:
+        received = 0
+        async with client.stream("GET", url, headers=headers) as response:
+            if response.status_code != 200:
+                return False
+            async with aiofiles.open(target, "wb") as out:
+                async for chunk in response.aiter_bytes():
+                    received += len(chunk)
+                    if received > self.max_source_bytes:
+                        return False
+                    await out.write(chunk)
+        return received > 0
+
+    async def _store(self, path: Path, ext: str) -> str:
+        # Hash while reading once; the file is small
+        async with aiofiles.open(path, "rb") as f:
+            data = await f.read()
+        key = f"{hashlib.sha256(data).hexdigest()}.{ext}"
+        target = self.cache_dir / key[:2] / key
+        if not target.exists():
+            target.parent.mkdir(exist_ok=True)
+            os.replace(path, target)
+        return key
+
+    def _thumbnail_from_info_json(self, job_dir: Path) -> Optional[str]:
+        # Older jobs only kept yt-dlp's .info.json sidecar
+        for info_path in job_dir.glob("*.info.json"):
+            try:
+                with open(info_path) as f:
+                    thumbnail = json.load(f).get("thumbnail")
+            except (OSError, ValueError):
+                continue
+            if thumbnail:
+                return thumbnail
+        return None
+
+    def _media_file(self, job_dir: Path) -> Optional[Path]:
+        for path in sorted(job_dir.iterdir()) if job_dir.exists() else []:
+            if path.suffix.lower() in MEDIA_EXTENSIONS:
+                return path
+        return None
+
+    def _image_ext(self, url: str) -> str:
+        path = url.split("?", 1)[0].lower()
+        for ext in ("png", "webp"):
+            if path.endswith(f".{ext}"):
+                return ext
+        return "jpg"
@@ -0,0 +1,381 @@
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import logging
+import random
+import socket
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+import httpx
+import orjson
+from app import metrics
+from app.database import SessionLocal
+from app.models import WebhookDeadLetter
+from app.utils.helpers import summarize_status
+
+logger = logging.getLogger(__name__)
+
+# Final job states and the event each one sends
+EVENT_TYPES = {
+    "completed": "download.completed",
+    "failed": "download.failed",
+    "cancelled": "download.cancelled"
+}
+
+# Responses worth another attempt; any other non-2xx answer is final
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+class CallbackNotAllowed(ValueError):
+    """Raised for a callback URL that events may not be sent to"""
+
+def parse_allowed_hosts(value: Optional[str]) -> List[str]:
+    """
+    Split a comma separated host allowlist; ".example.com" also allows its subdomains
+    """
+    return [host.strip().lower() for host in (value or "").split(",") if host.strip()]
+
+def is_public_address(address: str) -> bool:
+    """
+    Whether an IP is globally routable (not private, loopback, link-local, reserved or multicast)
+    """
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+def sign(secret: str, timestamp: int, body: bytes) -> str:
+    """
+    HMAC-SHA256 signature of a webhook, sent as `X-Webhook-Signature: t=<timestamp>,v1=<hex>`
+
+    Receivers recompute it over "<timestamp>.<body>" and should reject stale timestamps.
+    """
+    message = str(timestamp).encode() + b"." + body
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+class WebhookDelivery:
+    """
+    One event on its way to one callback URL
+    """
+    def __init__(self, event_id: str, event_type: str, download_id: Optional[str], callback_url: str, body: bytes, attempts: int = 0):
+        self.event_id = event_id
+        self.event_type = event_type
+        self.download_id = download_id
+        self.callback_url = callback_url
+        self.body = body
+        self.attempts = attempts
+        self.last_error: Optional[str] = None
+
+class DeadLetterStore:
+    """
+    Deliveries that ran out of attempts, kept in the database for inspection and redelivery
+    """
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+
+    def add(self, delivery: WebhookDelivery):
+        db = self.session_factory()
+        try:
+            db.add(WebhookDeadLetter(
+                event_id=delivery.event_id,
+                event_type=delivery.event_type,
+                download_id=delivery.download_id,
+                callback_url=delivery.callback_url,
+                payload=delivery.body.decode(),
+                attempts=delivery.attempts,
+                last_error=delivery.last_error
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+    def list(self, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+        db = self.session_factory()
+        try:
+            rows = (
+                db.query(WebhookDeadLetter)
+                .order_by(WebhookDeadLetter.created_at.desc())
+                .offset(offset)
+                .limit(limit)
+                .all()
+            )
+            return [self._to_dict(row) for row in rows]
+        finally:
+            db.close()
+
+    def pop(self, dead_letter_id: int) -> Optional[WebhookDelivery]:
+        """
+        Remove a dead letter and return it as a fresh delivery
+        """
+        db = self.session_factory()
+        try:
+            row = db.query(WebhookDeadLetter).filter(WebhookDeadLetter.id == dead_letter_id).first()
+            if row is None:
+                return None
+            delivery = WebhookDelivery(row.event_id, row.event_type, row.download_id, row.callback_url, row.payload.encode())
+            db.delete(row)
+            db.commit()
+            return delivery
+        finally:
+            db.close()
+
+    def _to_dict(self, row: WebhookDeadLetter) -> Dict[str, Any]:
+        return {
+            "id": row.id,
+            "event_id": row.event_id,
+            "event_type": row.event_type,
+            "download_id": row.download_id,
+            "callback_url": row.callback_url,
+            "attempts": row.attempts,
+            "last_error": row.last_error,
+            "created_at": row.created_at.isoformat() if row.created_at else None
+        }
+
+class WebhookDispatcher:
+    """
+    Sends signed job completion events to per-request callback URLs
+
+    `notify` snapshots the job into an event and queues it; `concurrency`
+    sender tasks POST events through one pooled HTTP client. Network errors,
+    timeouts and 408/425/429/5xx answers are retried with exponential backoff
+    and jitter (honouring Retry-After), up to `max_attempts` attempts; a
+    waiting retry doesn't hold a sender. Deliveries that run out of attempts,
+    get another non-2xx answer, or are still pending at shutdown go to the
+    dead-letter store.
+
+    Every event is signed with `secret` (see `sign`) and carries its id in
+    X-Webhook-Id, which stays the same across retries so receivers can
+    drop duplicates. Without a secret, callbacks are disabled.
+
+    Callback URLs must be http(s). With `allowed_hosts` only those hosts
+    (which may be internal) are accepted; otherwise any host whose
+    addresses are all public is. The check runs when a job is submitted
+    and again before every attempt, and the attempt connects to the address
+    that was checked (keeping the URL's Host header and TLS server name),
+    so a DNS answer that changes in between (rebinding) can't redirect it
+    to an internal address.
+    """
+    def __init__(
+        self,
+        secret: Optional[str],
+        allowed_hosts: Iterable[str] = (),
+        dead_letters: Optional[DeadLetterStore] = None,
+        max_attempts: int = 6,
+        backoff_base: float = 2.0,
+        backoff_max: float = 300.0,
+        timeout: float = 10.0,
+        concurrency: int = 4
+    ):
+        self.secret = secret
+        self.allowed_hosts = [host.lower() for host in allowed_hosts]
+        self.dead_letters = dead_letters or DeadLetterStore()
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.concurrency = concurrency
+        # Created on first use, inside the running event loop
+        self._queue: Optional[asyncio.Queue] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._senders: List[asyncio.Task] = []
+        # Deliveries sleeping until their next attempt
+        self._retries: Dict[asyncio.TimerHandle, WebhookDelivery] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.secret)
+
+    def _allowlisted(self, host: str) -> bool:
+        return any(
+            host == allowed or (allowed.startswith(".") and (host.endswith(allowed) or host == allowed[1:]))
+            for allowed in self.allowed_hosts
+        )
+
+    async def check_url(self, url: str) -> Optional[str]:
+        """
+        Raise CallbackNotAllowed unless events may be sent to `url`
+
+        Returns the checked address to connect to, or None for allowlisted
+        hosts, which are used as they are. Resolution errors (socket.gaierror)
+        are passed on as they are, since they may be temporary.
+        """
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        if parts.scheme not in ("http", "https") or not host:
+            raise CallbackNotAllowed("Callback URL must be an http(s) URL")
+        if self.allowed_hosts:
+            if not self._allowlisted(host):
+                raise CallbackNotAllowed(f"Callback host {host} is not in WEBHOOK_ALLOWED_HOSTS")
+            return None
+        addresses = [
+            address[4][0] for address in await asyncio.get_running_loop().getaddrinfo(
+                host, parts.port or (443 if parts.scheme == "https" else 80), type=socket.SOCK_STREAM
+            )
+        ]
+        if not addresses or not all(is_public_address(address) for address in addresses):
+            raise CallbackNotAllowed(f"Callback host {host} resolves to a private or local address")
+        return addresses[0]
+
+    async def _post(self, url: str, address: Optional[str], body: bytes, headers: Dict[str, str]) -> httpx.Response:
+        """
+        POST to `url`, connecting to `address` when given instead of resolving the host again
+        """
+        if address is None:
+            return await self._client.post(url, content=body, headers=headers)
+        target = httpx.URL(url)
+        # Host header and TLS server name (certificate check included) stay those of the URL
+        return await self._client.post(
+            target.copy_with(host=address.split("%", 1)[0]),
+            content=body,
+            headers={**headers, "Host": target.netloc.decode("ascii")},
+            extensions={"sni_hostname": target.host}
+        )
+
+    def _start(self):
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(self.timeout),
+            limits=httpx.Limits(max_connections=self.concurrency * 2, max_keepalive_connections=self.concurrency),
+            follow_redirects=False
+        )
+        self._senders = [asyncio.create_task(self._send_loop()) for _ in range(self.concurrency)]
+
+    def notify(self, callback_url: str, status: Dict) -> Optional[str]:
+        """
+        Queue the event for a job's final status (event loop thread); returns the event id
+        """
+        event_type = EVENT_TYPES.get(status.get("status"))
+        if event_type is None:
+            return None
+        if not self.enabled:
+            # The job was accepted by a process that has a secret; this one can't sign
+            logger.error(f"Dropping {event_type} webhook of {status.get('id')}: WEBHOOK_SECRET is not set")
+            return None
+        event_id = str(uuid.uuid4())
+        body = orjson.dumps({
+            "id": event_id,
+            "type": event_type,
+            "created_at": datetime.utcnow().isoformat() + "Z",
+            "data": summarize_status(status)
+        })
+        self.enqueue(WebhookDelivery(event_id, event_type, status.get("id"), callback_url, body))
+        return event_id
+
+    def enqueue(self, delivery: WebhookDelivery):
+        self._start()
+        self._queue.put_nowait(delivery)
+        metrics.WEBHOOK_QUEUE_DEPTH.set(self._queue.qsize() + len(self._retries))
+
+    async def _send_loop(self):
+        while True:
+            delivery = await self._queue.get()
+            try:
+                await self._attempt(delivery)
+            except Exception as e:
+                logger.error(f"Webhook {delivery.event_id} to {delivery.callback_url} crashed: {e}")
+            finally:
+                self._queue.task_done()
+                metrics.WEBHOOK_QUEUE_DEPTH.set(self._queue.qsize() + len(self._retries))
+
+    async def _attempt(self, delivery: WebhookDelivery):
+        delivery.attempts += 1
+        timestamp = int(time.time())
+        headers = {
+            "Content-Type": "application/json",
+            "User-Agent": "sm-downloader-webhooks/1.0",
+            "X-Webhook-Id": delivery.event_id,
+            "X-Webhook-Event": delivery.event_type,
+            "X-Webhook-Attempt": str(delivery.attempts),
+            "X-Webhook-Signature": f"t={timestamp},v1={sign(self.secret, timestamp, delivery.body)}"
+        }
+        retry_after = None
+        started = time.perf_counter()
+        try:
+            address = await self.check_url(delivery.callback_url)
+            response = await self._post(delivery.callback_url, address, delivery.body, headers)
+        except CallbackNotAllowed as e:
+            retryable = False
+            delivery.last_error = str(e)
+        except (httpx.HTTPError, OSError) as e:
+            retryable = True
+            delivery.last_error = f"{type(e).__name__}: {e}"
+        else:
+            if 200 <= response.status_code < 300:
+                metrics.WEBHOOK_DELIVERY_SECONDS.observe(time.perf_counter() - started)
+                metrics.WEBHOOK_DELIVERIES_TOTAL.labels("delivered").inc()
+                return
+            retryable = response.status_code in RETRYABLE_STATUS_CODES
+            delivery.last_error = f"HTTP {response.status_code}"
+            if response.headers.get("retry-after", "").isdigit():
+                retry_after = int(response.headers["retry-after"])
+
+        if retryable and delivery.attempts < self.max_attempts:
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (delivery.attempts - 1))
+            # Jitter spreads out retries of many events to the same receiver
+            delay = delay / 2 + random.uniform(0, delay / 2)
+            if retry_after is not None:
+                delay = min(self.backoff_max, max(delay, retry_after))
+            metrics.WEBHOOK_DELIVERIES_TOTAL.labels("retried").inc()
+            self._schedule_retry(delivery, delay)
+            return
+
+        logger.warning(
+            f"Webhook {delivery.event_id} to {delivery.callback_url} dead-lettered after "
+            f"{delivery.attempts} attempt(s): {delivery.last_error}"
+        )
+        await self._dead_letter(delivery)
+
+    def _schedule_retry(self, delivery: WebhookDelivery, delay: float):
+        def requeue():
+            self._retries.pop(handle, None)
+            self._queue.put_nowait(delivery)
+
+        handle = asyncio.get_running_loop().call_later(delay, requeue)
+        self._retries[handle] = delivery
+
+    async def _dead_letter(self, delivery: WebhookDelivery):
+        metrics.WEBHOOK_DELIVERIES_TOTAL.labels("dead_lettered").inc()
+        try:
+            await asyncio.to_thread(self.dead_letters.add, delivery)
+        except Exception as e:
+            logger.error(f"Failed to store dead-lettered webhook {delivery.event_id}: {e}")
+
+    async def redeliver(self, dead_letter_id: int) -> bool:
+        """
+        Send a dead-lettered event again, with a fresh set of attempts
+        """
+        delivery = await asyncio.to_thread(self.dead_letters.pop, dead_letter_id)
+        if delivery is None:
+            return False
+        self.enqueue(delivery)
+        return True
+
+    async def aclose(self, drain_timeout: float = 10.0):
+        """
+        Give queued events a moment to go out, then dead-letter what's left
+        """
+        if self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            pass
+        for task in self._senders:
+            task.cancel()
+        leftover = list(self._retries.values())
+        for handle in list(self._retries):
+            handle.cancel()
+        self._retries.clear()
+        while not self._queue.empty():
+            leftover.append(self._queue.get_nowait())
+        for delivery in leftover:
+            delivery.last_error = delivery.last_error or "Shut down before delivery"
+            await self._dead_letter(delivery)
+        await self._client.aclose()
+        self._queue = None
+        self._client = None
@@ -1,6 +1,9 @@
+import base64
+import hashlib
+import json
 import re
-from typing import Optional
-from urllib.parse import urlparse
+from typing import Dict, Iterable, Optional, Set
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
 
 def detect_platform(url: str) -> Optional[str]:
     """
@@ -140,8 +143,8 @@ def extract_video_id(url: str, platform: str) -> Optional[str]:
         return match.group(1) if match else None
     
     elif platform == "instagram":
-        # Instagram post ID extraction
-        pattern = r'/p/([A-Za-z0-9_-]+)'
+        # Instagram post/reel/IGTV shortcode extraction
+        pattern = r'/(?:p|reels?|tv)/([A-Za-z0-9_-]+)'
         match = re.search(pattern, url)
         return match.group(1) if match else None
     
@@ -152,3 +155,88 @@ def extract_video_id(url: str, platform: str) -> Optional[str]:
         return match.group(1) if match else None
     
     return None
+
+# Query parameters that only carry share/tracking information and never
+# change which piece of content a URL points to
+TRACKING_PARAMS = {
+    "igsh", "igshid", "img_index",
+    "is_from_webapp", "sender_device", "is_copy_url", "_r", "_t",
+    "s", "t", "ref_src", "ref_url",
+    "share_id", "sc_referrer", "sc_ua",
+}
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalize a URL so equivalent share links map to the same cache key
+    """
+    parsed = urlparse(url.strip())
+    
+    # Lowercase host and drop common web/mobile prefixes
+    host = (parsed.hostname or "").lower()
+    for prefix in ("www.", "m.", "mobile."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    if host == "x.com":
+        host = "twitter.com"
+    
+    # Drop tracking parameters and sort the rest for a stable key
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith("utm_")
+    )
+    
+    if parsed.port:
+        host = f"{host}:{parsed.port}"
+    
+    path = parsed.path.rstrip("/") or "/"
+    return urlunparse(((parsed.scheme or "https").lower(), host, path, "", urlencode(query), ""))
+
+# Fields of a status record (and its file_info) that status/history responses return by default
+SUMMARY_FIELDS = (
+    "id", "url", "platform", "status", "progress", "message", "error",
+    "audio_only", "started_at", "completed_at", "thumbnail_url", "downgraded_to"
+)
+FILE_INFO_SUMMARY_FIELDS = ("title", "duration", "uploader", "view_count", "like_count", "thumbnail")
+
+def summarize_status(status: Dict) -> Dict:
+    """
+    Lean projection of a status record
+    
+    Drops the description, per-item details and bookkeeping (storage keys,
+    sync and pass-through flags) that pollers and history pages don't use.
+    """
+    summary = {key: status[key] for key in SUMMARY_FIELDS if key in status}
+    file_info = status.get("file_info")
+    if file_info:
+        summary["file_info"] = {key: file_info.get(key) for key in FILE_INFO_SUMMARY_FIELDS}
+    if status.get("items"):
+        summary["item_count"] = len(status["items"])
+    return summary
+
+# Bytes of each job fingerprint kept in a status cursor
+STATUS_DIGEST_SIZE = 6
+
+def status_digest(record: Dict) -> bytes:
+    """
+    Short fingerprint of a compact status record (includes its id)
+    """
+    data = json.dumps(record, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.blake2b(data, digest_size=STATUS_DIGEST_SIZE).digest()
+
+def encode_status_cursor(digests: Iterable[bytes]) -> str:
+    """
+    Opaque cursor listing the job states a client has already seen
+    """
+    return base64.urlsafe_b64encode(b"".join(sorted(digests))).decode().rstrip("=")
+
+def decode_status_cursor(cursor: str) -> Set[bytes]:
+    """
+    Fingerprints in a cursor; malformed cursors decode to nothing (everything counts as changed)
+    """
+    cursor = cursor.strip()
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    except (ValueError, TypeError):
+        return set()
+    return {raw[i:i + STATUS_DIGEST_SIZE] for i in range(0, len(raw) - STATUS_DIGEST_SIZE + 1, STATUS_DIGEST_SIZE)}
@@ -0,0 +1,123 @@
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from sqlalchemy.exc import IntegrityError
+from app.database import SessionLocal
+from app.models import IdempotencyKey
+
+# Longest Idempotency-Key accepted
+MAX_KEY_LENGTH = 255
+
+class IdempotencyConflict(Exception):
+    """Raised when a key is reused for a different request"""
+
+def request_fingerprint(payload: Dict[str, Any]) -> str:
+    """
+    Stable hash of a request body, to tell a retry from a different request under the same key
+    """
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+class IdempotencyStore:
+    """
+    Remembers the response given for each Idempotency-Key for `ttl` seconds
+
+    Keys are rows of `idempotency_keys`, unique per (scope, key), so every
+    API replica sees them. A request calls `begin` with its key: it either
+    gets the stored response of an earlier request with that key, or
+    inserts the row and owns the key until it calls `complete` (storing
+    its response) or `abandon` (when it failed, so a retry can try again).
+    Requests arriving while the owner is still working poll the row every
+    `poll_interval` seconds and then get its response, so concurrent
+    retries can't start a second job either. A key left without a response
+    for `pending_timeout` seconds (its owner died) is taken over.
+    """
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        ttl: float = 86400,
+        pending_timeout: float = 60,
+        poll_interval: float = 0.1
+    ):
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self.pending_timeout = pending_timeout
+        self.poll_interval = poll_interval
+        self._next_purge = 0.0
+
+    async def begin(self, scope: str, key: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """
+        The stored response for `key`, or None if the caller now owns it
+        """
+        while True:
+            record = await asyncio.to_thread(self._claim, scope, key, fingerprint)
+            if record is None:
+                return None
+            if record.fingerprint != fingerprint:
+                raise IdempotencyConflict(key)
+            if record.response is not None:
+                return json.loads(record.response)
+            await asyncio.sleep(self.poll_interval)
+
+    def _claim(self, scope: str, key: str, fingerprint: str) -> Optional[IdempotencyKey]:
+        """
+        Insert the key's row; None if the caller now owns the key, else the row already there
+        """
+        now = datetime.utcnow()
+        db = self.session_factory()
+        try:
+            if time.monotonic() >= self._next_purge:
+                self._next_purge = time.monotonic() + min(self.ttl, 600)
+                db.query(IdempotencyKey).filter(
+                    IdempotencyKey.created_at < now - timedelta(seconds=self.ttl)
+                ).delete(synchronize_session=False)
+                db.commit()
+            while True:
+                db.add(IdempotencyKey(scope=scope, key=key, fingerprint=fingerprint, created_at=now))
+                try:
+                    db.commit()
+                    return None
+                except IntegrityError:
+                    db.rollback()
+                record = db.query(IdempotencyKey).filter(IdempotencyKey.scope == scope, IdempotencyKey.key == key).first()
+                if record is None:
+                    # Abandoned meanwhile
+                    continue
+                expired = record.created_at < now - timedelta(seconds=self.ttl)
+                orphaned = record.response is None and record.created_at < now - timedelta(seconds=self.pending_timeout)
+                db.expunge(record)
+                if expired or orphaned:
+                    db.query(IdempotencyKey).filter(IdempotencyKey.id == record.id).delete(synchronize_session=False)
+                    db.commit()
+                    continue
+                return record
+        finally:
+            db.close()
+
+    def complete(self, scope: str, key: str, response: Dict[str, Any]):
+        """
+        Store the owner's response for the requests waiting on the key and later retries
+        """
+        db = self.session_factory()
+        try:
+            db.query(IdempotencyKey).filter(IdempotencyKey.scope == scope, IdempotencyKey.key == key).update(
+                {"response": json.dumps(response)}, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def abandon(self, scope: str, key: str):
+        """
+        Give up a key without a response (the request failed); no-op once completed
+        """
+        db = self.session_factory()
+        try:
+            db.query(IdempotencyKey).filter(
+                IdempotencyKey.scope == scope, IdempotencyKey.key == key, IdempotencyKey.response.is_(None)
+            ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Standalone download worker
+Usage: python -m app.worker [--concurrency N] [--worker-id ID]
+
+Consumes jobs that the API enqueued with DOWNLOAD_EXECUTION=worker. Any
+number of workers can run on any number of nodes against the same
+database. Running jobs are heartbeated; jobs of a worker that stops
+heartbeating are re-queued for someone else. Cancellations requested
+through the API are picked up on the next heartbeat. Job progress is
+published through a write-behind buffer that batches status rows; final
+states are written immediately. SIGTERM/SIGINT stop claiming new jobs and
+drain the running ones before exiting.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import uuid
+from typing import Dict, List
+
+from dotenv import load_dotenv
+from prometheus_client import start_http_server
+
+from app import metrics
+from app.database_init import init_db
+from app.services.download_service import DownloadService
+from app.services.job_queue import JobQueue
+from app.services.status_writer import StatusWriteBuffer
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("app.worker")
+
+class DownloadWorker:
+    def __init__(
+        self,
+        worker_id: str,
+        concurrency: int = 4,
+        poll_interval: float = 1.0,
+        heartbeat_interval: float = 5.0,
+        heartbeat_timeout: float = 60.0,
+        drain_timeout: float = 300.0,
+        status_flush_interval: float = 1.0,
+        status_buffer_size: int = 1000
+    ):
+        self.worker_id = worker_id
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.drain_timeout = drain_timeout
+        self.queue = JobQueue()
+        self.status_writer = StatusWriteBuffer(self.queue, status_flush_interval, status_buffer_size)
+        self.service = DownloadService()
+        self.active: Dict[str, asyncio.Task] = {}
+        self.stopping = asyncio.Event()
+
+    def stop(self):
+        """
+        Stop claiming new jobs; running jobs are drained
+        """
+        if not self.stopping.is_set():
+            logger.info(f"Worker {self.worker_id} draining {len(self.active)} running job(s)")
+            self.stopping.set()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, self.stop)
+
+        heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+        publish_task = asyncio.create_task(self._publish_loop())
+        flush_task = asyncio.create_task(self.status_writer.run())
+        lag_task = asyncio.create_task(metrics.monitor_event_loop_lag())
+        proxy_check_task = None
+        if self.service.proxies.enabled and self.service.proxies.check_url:
+            proxy_check_task = asyncio.create_task(self.service.proxies.run_health_checks())
+        logger.info(f"Worker {self.worker_id} started with concurrency {self.concurrency}")
+
+        while not self.stopping.is_set():
+            jobs = []
+            free_slots = self.concurrency - len(self.active)
+            if free_slots > 0:
+                try:
+                    jobs = await asyncio.to_thread(self.queue.claim, self.worker_id, free_slots)
+                except Exception as e:
+                    logger.error(f"Failed to claim jobs: {e}")
+
+            for job in jobs:
+                metrics.DOWNLOADS_QUEUED.labels(job["platform"]).inc()
+                self.active[job["id"]] = asyncio.create_task(self._run_job(job))
+
+            # Poll again straight away if we filled every slot we asked for
+            if not jobs or len(jobs) < free_slots:
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+        await self._drain()
+        heartbeat_task.cancel()
+        publish_task.cancel()
+        flush_task.cancel()
+        lag_task.cancel()
+        if proxy_check_task is not None:
+            proxy_check_task.cancel()
+        await self._flush_statuses()
+        # Events of the jobs that just finished go out (or to the dead-letter store) before exit
+        await self.service.webhooks.aclose()
+        logger.info(f"Worker {self.worker_id} stopped")
+
+    async def _run_job(self, job: Dict):
+        download_id = job["id"]
+        try:
+            await self.service.download_content(
+                download_id,
+                job["url"],
+                job["platform"],
+                job["quality"],
+                job["audio_only"],
+                job.get("tier"),
+                job.get("callback_url"),
+                job.get("save_info", False)
+            )
+            # Final states are written durably right away, not on the next flush
+            status = self.service.download_status.get(download_id)
+            if status:
+                await self.status_writer.write_now(download_id, status)
+        except Exception as e:
+            logger.error(f"Job {download_id} crashed: {e}")
+        finally:
+            self.active.pop(download_id, None)
+            self.service.download_status.pop(download_id, None)
+            self.status_writer.forget(download_id)
+
+    async def _publish_loop(self):
+        # Progress of running jobs goes through the write-behind buffer
+        while True:
+            for download_id in list(self.active):
+                status = self.service.download_status.get(download_id)
+                if status:
+                    await self.status_writer.put(download_id, status)
+            await asyncio.sleep(self.status_writer.flush_interval)
+
+    async def _flush_statuses(self):
+        try:
+            await self.status_writer.flush()
+        except Exception as e:
+            logger.error(f"Final status flush failed: {e}")
+
+    async def _heartbeat_loop(self):
+        while True:
+            try:
+                cancelled = await asyncio.to_thread(self._heartbeat)
+                # Cancellations requested through the API; the job frees its slot once it has stopped
+                for download_id in cancelled:
+                    logger.info(f"Cancelling job {download_id}")
+                    await self.service.cancel_download(download_id)
+            except Exception as e:
+                logger.error(f"Heartbeat failed: {e}")
+            await asyncio.sleep(self.heartbeat_interval)
+
+    def _heartbeat(self) -> List[str]:
+        # Prove we're alive (progress is published by the status buffer)
+        running = list(self.active)
+        self.queue.heartbeat(self.worker_id, running)
+        metrics.WORKER_HEARTBEATS_TOTAL.inc()
+
+        # Any worker can recover jobs from crashed peers
+        requeued = self.queue.requeue_stale(self.heartbeat_timeout)
+        if requeued:
+            logger.warning(f"Re-queued {requeued} job(s) from unresponsive workers")
+            metrics.JOBS_REQUEUED_TOTAL.labels("stale").inc(requeued)
+
+        metrics.JOB_QUEUE_DEPTH.set(self.queue.depth())
+        return self.queue.cancel_requested(self.worker_id, running)
+
+    async def _drain(self):
+        if not self.active:
+            return
+
+        done, pending = await asyncio.wait(list(self.active.values()), timeout=self.drain_timeout)
+        if not pending:
+            return
+
+        # Out of grace time: give unfinished jobs back so another worker picks them up
+        unfinished = list(self.active)
+        logger.warning(f"Drain timed out, releasing {len(unfinished)} job(s) back to the queue")
+        await self._flush_statuses()
+        await asyncio.to_thread(self.queue.release, self.worker_id, unfinished)
+        metrics.JOBS_REQUEUED_TOTAL.labels("drain").inc(len(unfinished))
+
+        # yt-dlp threads can't be interrupted, so exit without waiting for them
+        logging.shutdown()
+        os._exit(0)
+
+def main():
+    parser = argparse.ArgumentParser(description="SM Downloader download worker")
+    parser.add_argument("--worker-id", default=os.getenv("WORKER_ID") or f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("WORKER_CONCURRENCY", "4")))
+    parser.add_argument("--poll-interval", type=float, default=float(os.getenv("WORKER_POLL_INTERVAL", "1.0")))
+    parser.add_argument("--heartbeat-interval", type=float, default=float(os.getenv("WORKER_HEARTBEAT_INTERVAL", "5")))
+    parser.add_argument("--heartbeat-timeout", type=float, default=float(os.getenv("WORKER_HEARTBEAT_TIMEOUT", "60")))
+    parser.add_argument("--drain-timeout", type=float, default=float(os.getenv("WORKER_DRAIN_TIMEOUT", "300")))
+    parser.add_argument("--status-flush-interval", type=float, default=float(os.getenv("STATUS_FLUSH_INTERVAL", "1.0")),
+                        help="Seconds between batched writes of job progress")
+    parser.add_argument("--status-buffer-size", type=int, default=int(os.getenv("STATUS_BUFFER_SIZE", "1000")),
+                        help="Jobs whose progress may wait for a flush before publishing blocks")
+    parser.add_argument("--metrics-port", type=int, default=int(os.getenv("WORKER_METRICS_PORT", "0")),
+                        help="Serve Prometheus metrics on this port (0 disables)")
+
+    args = parser.parse_args()
+
+    if not init_db():
+        raise SystemExit("Failed to initialize database")
+
+    if args.metrics_port:
+        start_http_server(args.metrics_port)
+
+    worker = DownloadWorker(
+        worker_id=args.worker_id,
+        concurrency=args.concurrency,
+        poll_interval=args.poll_interval,
+        heartbeat_interval=args.heartbeat_interval,
+        heartbeat_timeout=args.heartbeat_timeout,
+        drain_timeout=args.drain_timeout,
+        status_flush_interval=args.status_flush_interval,
+        status_buffer_size=args.status_buffer_size
+    )
+    asyncio.run(worker.run())
+
+if __name__ == "__main__":
+    main()
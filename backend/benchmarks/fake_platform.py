@@ -0,0 +1,176 @@
+"""
+Local stand-in for a social media CDN, used by the benchmark suite
+
+Serves deterministic media without touching the network:
+    /video/<name>.mp4?size=N&rate=R    progressive file with Range support
+    /hls/<name>/index.m3u8?segments=N   HLS playlist
+    /hls/<name>/seg<i>.ts?size=N         HLS segment
+
+`rate` throttles the response to roughly R bytes per second so slow
+platforms can be simulated.
+"""
+
+import hashlib
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_SIZE = 2 * 1024 * 1024
+
+def media_bytes(name: str, size: int) -> bytes:
+    """
+    Deterministic pseudo-random payload for a given name and size
+    """
+    seed = hashlib.sha256(name.encode()).digest()
+    block = hashlib.sha256(seed).digest() * (CHUNK_SIZE // 32)
+    repeats = size // len(block) + 1
+    return (block * repeats)[:size]
+
+class FakePlatformHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Payloads are cached per (name, size) so the server isn't the bottleneck
+    _payloads = {}
+    _lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._handle(send_body=False)
+
+    def do_GET(self):
+        self._handle(send_body=True)
+
+    def _handle(self, send_body: bool):
+        parsed = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+
+        video = re.fullmatch(r"/video/([\w.-]+)\.mp4", parsed.path)
+        playlist = re.fullmatch(r"/hls/([\w.-]+)/index\.m3u8", parsed.path)
+        segment = re.fullmatch(r"/hls/([\w.-]+)/seg(\d+)\.ts", parsed.path)
+
+        if video:
+            size = int(params.get("size", DEFAULT_SIZE))
+            self._send_media(video.group(1), size, "video/mp4", params, send_body)
+        elif playlist:
+            self._send_playlist(playlist.group(1), params, send_body)
+        elif segment:
+            size = int(params.get("size", 256 * 1024))
+            name = f"{segment.group(1)}-{segment.group(2)}"
+            self._send_media(name, size, "video/mp2t", params, send_body)
+        else:
+            self.send_error(404)
+
+    def _payload(self, name: str, size: int) -> bytes:
+        key = (name, size)
+        with self._lock:
+            if key not in self._payloads:
+                self._payloads[key] = media_bytes(name, size)
+            return self._payloads[key]
+
+    def _send_media(self, name: str, size: int, content_type: str, params: dict, send_body: bool):
+        payload = self._payload(name, size)
+        start, end = 0, size - 1
+
+        # Honour single byte ranges so resumable downloads can be exercised
+        range_header = self.headers.get("Range")
+        match = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header or "")
+        if match and (match.group(1) or match.group(2)):
+            if match.group(1):
+                start = int(match.group(1))
+                end = min(int(match.group(2) or size - 1), size - 1)
+            else:
+                start = max(0, size - int(match.group(2)))
+            if start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        if not send_body:
+            return
+
+        rate = float(params.get("rate", 0))
+        view = memoryview(payload)[start:end + 1]
+        for offset in range(0, len(view), CHUNK_SIZE):
+            chunk = view[offset:offset + CHUNK_SIZE]
+            try:
+                self.wfile.write(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            if rate:
+                time.sleep(len(chunk) / rate)
+
+    def _send_playlist(self, name: str, params: dict, send_body: bool):
+        segments = int(params.get("segments", 8))
+        segment_size = int(params.get("size", 256 * 1024))
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:4", "#EXT-X-MEDIA-SEQUENCE:0"]
+        for index in range(segments):
+            lines.append("#EXTINF:4.0,")
+            lines.append(f"seg{index}.ts?size={segment_size}")
+        lines.append("#EXT-X-ENDLIST")
+        body = ("\n".join(lines) + "\n").encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.apple.mpegurl")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up mid-response is expected under load
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+class FakePlatformServer:
+    """
+    Runs the fake CDN on a background thread
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.httpd = QuietHTTPServer((host, port), FakePlatformHandler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def video_url(self, name: str, size: int = DEFAULT_SIZE, rate: float = 0) -> str:
+        url = f"{self.base_url}/video/{name}.mp4?size={size}"
+        return f"{url}&rate={rate}" if rate else url
+
+    def hls_url(self, name: str, segments: int = 8, segment_size: int = 256 * 1024) -> str:
+        return f"{self.base_url}/hls/{name}/index.m3u8?segments={segments}&size={segment_size}"
+
+    def start(self) -> "FakePlatformServer":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+if __name__ == "__main__":
+    server = FakePlatformServer(port=8765).start()
+    print(f"Fake platform serving on {server.base_url}")
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,154 @@
+"""
+Local stand-in for an egress proxy, used to exercise the proxy pool
+
+A plain HTTP forward proxy: absolute-form GET/HEAD requests are relayed
+to the origin and CONNECT opens a TCP tunnel (for https origins). Knobs to
+simulate bad exits:
+    delay     seconds added before every response (latency)
+    failing   answer everything with 502, as a dead upstream link would
+
+Usage: python -m benchmarks.fake_proxy [--port 8766] [--delay S] [--failing]
+"""
+
+import argparse
+import http.client
+import select
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+
+from benchmarks.fake_platform import QuietHTTPServer
+
+CHUNK_SIZE = 64 * 1024
+# Hop-by-hop headers a proxy must not forward
+HOP_HEADERS = {"connection", "keep-alive", "proxy-connection", "proxy-authorization", "te", "trailer", "transfer-encoding", "upgrade"}
+
+class FakeProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _admit(self) -> bool:
+        proxy = self.server.proxy
+        with proxy.lock:
+            proxy.requests += 1
+        if proxy.delay:
+            time.sleep(proxy.delay)
+        if proxy.failing:
+            self.send_response(502, "Bad Gateway")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return False
+        return True
+
+    def do_CONNECT(self):
+        if not self._admit():
+            return
+        host, _, port = self.path.rpartition(":")
+        try:
+            upstream = socket.create_connection((host, int(port)), timeout=10)
+        except OSError:
+            self.send_response(502, "Bad Gateway")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200, "Connection established")
+        self.end_headers()
+        # Relay bytes both ways until either side closes
+        sockets = [self.connection, upstream]
+        try:
+            while True:
+                readable, _, _ = select.select(sockets, [], [], 30)
+                if not readable:
+                    break
+                for sock in readable:
+                    data = sock.recv(CHUNK_SIZE)
+                    if not data:
+                        return
+                    (upstream if sock is self.connection else self.connection).sendall(data)
+        finally:
+            upstream.close()
+            self.close_connection = True
+
+    def do_GET(self):
+        self._forward(send_body=True)
+
+    def do_HEAD(self):
+        self._forward(send_body=False)
+
+    def _forward(self, send_body: bool):
+        if not self._admit():
+            return
+        target = urlsplit(self.path)
+        if not target.hostname:
+            self.send_response(400, "Absolute URL required")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        path = target.path or "/"
+        if target.query:
+            path += "?" + target.query
+        headers = {name: value for name, value in self.headers.items() if name.lower() not in HOP_HEADERS}
+        upstream = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+        try:
+            upstream.request(self.command, path, headers=headers)
+            response = upstream.getresponse()
+            self.send_response(response.status, response.reason)
+            for name, value in response.getheaders():
+                if name.lower() not in HOP_HEADERS:
+                    self.send_header(name, value)
+            if response.getheader("Content-Length") is None:
+                self.close_connection = True
+            self.end_headers()
+            if send_body:
+                while True:
+                    chunk = response.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+        except OSError:
+            self.close_connection = True
+        finally:
+            upstream.close()
+
+class FakeProxyServer:
+    """
+    Runs the fake proxy on a background thread
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, delay: float = 0.0, failing: bool = False):
+        self.httpd = QuietHTTPServer((host, port), FakeProxyHandler)
+        self.httpd.proxy = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.delay = delay
+        self.failing = failing
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeProxyServer":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--failing", action="store_true", help="answer every request with 502")
+    args = parser.parse_args()
+    server = FakeProxyServer(port=args.port, delay=args.delay, failing=args.failing).start()
+    print(f"Fake proxy listening on {server.url}")
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
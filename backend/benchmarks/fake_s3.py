@@ -0,0 +1,164 @@
+"""
+Local stand-in for an S3-compatible object store (think MinIO), used by the benchmark suite
+
+Path-style, in memory, no signature checks. Supports what the storage
+backend uses:
+    PUT    /<bucket>/<key>                              put object
+    GET    /<bucket>/<key>                              get object (with Range)
+    HEAD   /<bucket>/<key>                              stat
+    DELETE /<bucket>/<key>                              delete
+    POST   /<bucket>/<key>?uploads                      start multipart upload
+    PUT    /<bucket>/<key>?partNumber=N&uploadId=U      upload a part
+    POST   /<bucket>/<key>?uploadId=U                   complete multipart upload
+    DELETE /<bucket>/<key>?uploadId=U                   abort multipart upload
+
+Presigned URLs work because query-string credentials are simply ignored.
+"""
+
+import hashlib
+import re
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, unquote
+
+from benchmarks.fake_platform import QuietHTTPServer
+
+class FakeS3Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def store(self) -> "FakeS3Server":
+        return self.server.store
+
+    def _target(self):
+        parsed = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(parsed.query, keep_blank_values=True).items()}
+        return unquote(parsed.path), params
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+
+    def _reply(self, status: int, body: bytes = b"", headers: dict = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_PUT(self):
+        path, params = self._target()
+        body = self._body()
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        with self.store.lock:
+            if "uploadId" in params:
+                upload = self.store.uploads.get(params["uploadId"])
+                if upload is None:
+                    return self._reply(404, b"<Error><Code>NoSuchUpload</Code></Error>")
+                upload["parts"][int(params["partNumber"])] = body
+            else:
+                self.store.objects[path] = {
+                    "data": body,
+                    "etag": etag,
+                    "content_type": self.headers.get("Content-Type", "application/octet-stream")
+                }
+        self._reply(200, headers={"ETag": etag})
+
+    def do_POST(self):
+        path, params = self._target()
+        body = self._body()
+        with self.store.lock:
+            if "uploads" in params:
+                upload_id = uuid.uuid4().hex
+                self.store.uploads[upload_id] = {
+                    "path": path,
+                    "parts": {},
+                    "content_type": self.headers.get("Content-Type", "application/octet-stream")
+                }
+                xml = f"<InitiateMultipartUploadResult><UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>"
+                return self._reply(200, xml.encode(), {"Content-Type": "application/xml"})
+
+            upload = self.store.uploads.pop(params.get("uploadId", ""), None)
+            if upload is None:
+                return self._reply(404, b"<Error><Code>NoSuchUpload</Code></Error>")
+            numbers = [int(n) for n in re.findall(rb"<PartNumber>(\d+)</PartNumber>", body)]
+            data = b"".join(upload["parts"][n] for n in numbers)
+            etag = f'"{hashlib.md5(data).hexdigest()}-{len(numbers)}"'
+            self.store.objects[upload["path"]] = {"data": data, "etag": etag, "content_type": upload["content_type"]}
+        xml = f"<CompleteMultipartUploadResult><ETag>{etag}</ETag></CompleteMultipartUploadResult>"
+        self._reply(200, xml.encode(), {"Content-Type": "application/xml"})
+
+    def do_DELETE(self):
+        path, params = self._target()
+        with self.store.lock:
+            if "uploadId" in params:
+                self.store.uploads.pop(params["uploadId"], None)
+            else:
+                self.store.objects.pop(path, None)
+        self._reply(204)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        path, _ = self._target()
+        obj = self.store.objects.get(path)
+        if obj is None:
+            return self._reply(404, b"<Error><Code>NoSuchKey</Code></Error>")
+
+        data = obj["data"]
+        headers = {"ETag": obj["etag"], "Content-Type": obj["content_type"], "Accept-Ranges": "bytes"}
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range") or "")
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2) or len(data) - 1), len(data) - 1)
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+            return self._reply(206, data[start:end + 1], headers)
+        if self.command == "HEAD":
+            # Report the object size without sending it
+            self.send_response(200)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            return
+        self._reply(200, data, headers)
+
+class FakeS3Server:
+    """
+    Runs the fake object store on a background thread
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.objects = {}
+        self.uploads = {}
+        self.lock = threading.Lock()
+        self.httpd = QuietHTTPServer((host, port), FakeS3Handler)
+        self.httpd.store = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeS3Server":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+if __name__ == "__main__":
+    server = FakeS3Server(port=9000).start()
+    print(f"Fake S3 serving on {server.base_url}")
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Per-job memory footprint of yt-dlp metadata, full info dict vs. compact forms
+Usage: python -m benchmarks.info_memory [options]   (from the backend directory)
+
+Builds YouTube-sized sanitized info dicts (dozens of formats with their own
+HTTP headers and signed URLs, storyboards, a thumbnail list, a long
+description), each parsed from JSON so no objects are shared, the way
+separate extractions produce them. It then measures with tracemalloc what
+each job keeps resident:
+    full        - the info dict as extracted (what was cached and checkpointed)
+    compact     - compact_info(): what the cache and checkpoints keep now
+    file_info   - the MediaInfo-based file_info of the status record
+
+It also reports the on-disk size of the full info as JSON and as the
+gzip-compressed info.json.gz that a save_info download writes.
+"""
+
+import argparse
+import gzip
+import json
+import sys
+import tracemalloc
+
+from app.services.media_info import MediaInfo, compact_info
+
+def make_info(index: int, formats: int, storyboards: int, thumbnails: int) -> dict:
+    """
+    A sanitized info dict shaped like a YouTube extraction
+    """
+    video_id = f"vid{index:08d}"
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0 Safari/537.36",
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Accept-Language": "en-us,en;q=0.5",
+        "Sec-Fetch-Mode": "navigate"
+    }
+    format_list = []
+    for n in range(storyboards):
+        format_list.append({
+            "format_id": f"sb{n}",
+            "format_note": "storyboard",
+            "ext": "mhtml",
+            "protocol": "mhtml",
+            "acodec": "none",
+            "vcodec": "none",
+            "url": f"https://i.ytimg.com/sb/{video_id}/storyboard3_L{n}/M$M.jpg?sqp=signature{n}",
+            "fragments": [
+                {"url": f"https://i.ytimg.com/sb/{video_id}/storyboard3_L{n}/M{m}.jpg?sigh=rs$AOn4CLD{m:040d}", "duration": 100.0}
+                for m in range(20)
+            ],
+            "http_headers": dict(headers)
+        })
+    for n in range(formats):
+        audio = n % 3 == 0
+        format_list.append({
+            "format_id": str(100 + n),
+            "format_note": "medium" if audio else f"{144 * (n % 8 + 1)}p",
+            "ext": "m4a" if audio else ("mp4" if n % 2 else "webm"),
+            "protocol": "https",
+            "acodec": "mp4a.40.2" if audio else "none",
+            "vcodec": "none" if audio else ("avc1.4d401f" if n % 2 else "vp9"),
+            "container": "m4a_dash" if audio else ("mp4_dash" if n % 2 else "webm_dash"),
+            "width": None if audio else 256 * (n % 8 + 1),
+            "height": None if audio else 144 * (n % 8 + 1),
+            "fps": None if audio else 30,
+            "tbr": 128.5 + n,
+            "filesize": 1_000_000 * (n + 1),
+            "url": f"https://rr3---sn-example.googlevideo.com/videoplayback?expire=1700000000&ei={video_id}&itag={100 + n}&source=youtube&requiressl=yes&sig={'A' * 120}",
+            "http_headers": dict(headers),
+            "downloader_options": {"http_chunk_size": 10485760},
+            "resolution": "audio only" if audio else f"{256 * (n % 8 + 1)}x{144 * (n % 8 + 1)}",
+            "dynamic_range": None if audio else "SDR",
+            "audio_ext": "m4a" if audio else "none",
+            "video_ext": "none" if audio else "mp4"
+        })
+    return json.loads(json.dumps({
+        "id": video_id,
+        "title": f"Benchmark upload number {index}",
+        "uploader": "Benchmark Channel",
+        "uploader_id": "@benchmarkchannel",
+        "channel": "Benchmark Channel",
+        "channel_id": "UCbenchmarkbenchmarkbench",
+        "duration": 600,
+        "view_count": 1_000_000 + index,
+        "like_count": 25_000,
+        "description": "A long video description with links and chapters.\n" * 40,
+        "tags": [f"tag{n}" for n in range(30)],
+        "categories": ["Entertainment"],
+        "thumbnail": f"https://i.ytimg.com/vi/{video_id}/maxresdefault.jpg",
+        "thumbnails": [
+            {"url": f"https://i.ytimg.com/vi/{video_id}/{n}.jpg", "preference": -n, "id": str(n), "height": 90 * n, "width": 120 * n}
+            for n in range(thumbnails)
+        ],
+        "heatmap": [{"start_time": n * 6.0, "end_time": n * 6.0 + 6, "value": 0.5} for n in range(100)],
+        "webpage_url": f"https://www.youtube.com/watch?v={video_id}",
+        "extractor": "youtube",
+        "extractor_key": "Youtube",
+        "webpage_url_domain": "youtube.com",
+        "ext": "mp4",
+        "vcodec": "avc1.4d401f",
+        "acodec": "mp4a.40.2",
+        "width": 1280,
+        "height": 720,
+        "http_headers": dict(headers),
+        "formats": format_list
+    }))
+
+def retained_bytes(build, count: int) -> float:
+    """
+    Bytes per job still allocated after building `count` results with `build(index)`
+    """
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    kept = [build(index) for index in range(count)]
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del kept
+    return used / count
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=100, help="info dicts to build")
+    parser.add_argument("--formats", type=int, default=40, help="media formats per info dict")
+    parser.add_argument("--storyboards", type=int, default=4, help="storyboard formats per info dict")
+    parser.add_argument("--thumbnails", type=int, default=40, help="thumbnails per info dict")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    def full(index):
+        return make_info(index, args.formats, args.storyboards, args.thumbnails)
+
+    def compact(index):
+        return compact_info(full(index))
+
+    def file_info(index):
+        return MediaInfo.from_info(full(index)).file_info()
+
+    sample = full(0)
+    raw = json.dumps(sample).encode()
+    results = {
+        "full_kb_per_job": retained_bytes(full, args.jobs) / 1024,
+        "compact_kb_per_job": retained_bytes(compact, args.jobs) / 1024,
+        "file_info_kb_per_job": retained_bytes(file_info, args.jobs) / 1024,
+        "full_json_kb": len(raw) / 1024,
+        "compact_json_kb": len(json.dumps(compact_info(sample)).encode()) / 1024,
+        "full_json_gz_kb": len(gzip.compress(raw)) / 1024,
+    }
+
+    if args.json:
+        print(json.dumps({key: round(value, 2) for key, value in results.items()}))
+        return 0
+
+    print(f"resident per job ({args.jobs} jobs, {args.formats} formats each):")
+    print(f"  full info dict   {results['full_kb_per_job']:>9.1f} KiB")
+    print(f"  compact info     {results['compact_kb_per_job']:>9.1f} KiB   "
+          f"({results['full_kb_per_job'] / results['compact_kb_per_job']:.1f}x smaller)")
+    print(f"  file_info        {results['file_info_kb_per_job']:>9.1f} KiB")
+    print("on disk per job:")
+    print(f"  full info JSON   {results['full_json_kb']:>9.1f} KiB")
+    print(f"  compact JSON     {results['compact_json_kb']:>9.1f} KiB   (checkpoint)")
+    print(f"  info.json.gz     {results['full_json_gz_kb']:>9.1f} KiB   (save_info)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Load-test and benchmark harness for the SM Downloader API
+Usage: python -m benchmarks.run_benchmarks [options]   (from the backend directory)
+
+Starts the fake platform server and the FastAPI app (as a uvicorn subprocess
+with a throwaway database and downloads directory), then measures:
+    startup     - time from process spawn until /health answers, and the
+                  cost of importing app.main in a fresh interpreter
+    download    - /download job throughput at the given concurrency
+    status      - GET /download/{id} latency percentiles
+    files       - /files/{id} serving bandwidth
+    memory      - RSS growth of the API process over the run
+
+No network access is needed. Every run is appended to the history file and
+compared with the previous run using the same parameters; regressions beyond
+--threshold are reported (and fail the run with --fail-on-regression).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+from benchmarks.fake_platform import FakePlatformServer
+
+BACKEND_DIR = Path(__file__).parent.parent
+DEFAULT_HISTORY = Path(__file__).parent / "results" / "history.jsonl"
+
+# Direction of "better" for each tracked metric, used for regression checks
+HIGHER_IS_BETTER = {
+    "download_jobs_per_sec": True,
+    "download_mb_per_sec": True,
+    "files_mb_per_sec": True,
+    "status_p50_ms": False,
+    "status_p95_ms": False,
+    "status_p99_ms": False,
+    "startup_sec": False,
+    "startup_import_sec": False,
+    "rss_growth_mb": False,
+}
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def process_rss_mb(pid: int):
+    """
+    Resident set size of a process in MB (Linux only, None elsewhere)
+    """
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+def percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, cwd=BACKEND_DIR
+        ).stdout.strip() or "unknown"
+    except FileNotFoundError:
+        return "unknown"
+
+def isolated_env(workdir: Path, extra_env: dict = None) -> dict:
+    """
+    Environment for app processes: a throwaway database and downloads directory under `workdir`
+
+    Importing the app creates its downloads directory and database, so
+    nothing may start it without these.
+    """
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{workdir / 'bench.db'}",
+        "DOWNLOADS_DIR": str(workdir / "downloads"),
+    })
+    env.update(extra_env or {})
+    return env
+
+class ApiProcess:
+    """
+    The API under test, running in its own uvicorn process
+    """
+    def __init__(self, workdir: Path, extra_env: dict = None):
+        self.port = free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.env = isolated_env(workdir, extra_env)
+        self.process = None
+
+    def start(self, timeout: float = 60) -> float:
+        """
+        Spawn the server and return seconds until /health responded
+        """
+        started = time.perf_counter()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app",
+             "--host", "127.0.0.1", "--port", str(self.port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=self.env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        while time.perf_counter() - started < timeout:
+            if self.process.poll() is not None:
+                raise RuntimeError("API process exited during startup")
+            try:
+                if httpx.get(f"{self.base_url}/health", timeout=1).status_code == 200:
+                    return time.perf_counter() - started
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.02)
+        raise RuntimeError("API did not become healthy in time")
+
+    def rss_mb(self):
+        return process_rss_mb(self.process.pid)
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+def measure_startup(workdir: Path, runs: int) -> float:
+    """
+    Median cold start time over several fresh API processes
+    """
+    samples = []
+    for index in range(runs):
+        api = ApiProcess(workdir / f"startup-{index}")
+        (workdir / f"startup-{index}").mkdir()
+        try:
+            samples.append(api.start())
+        finally:
+            api.stop()
+    return statistics.median(samples)
+
+def measure_import_time(workdir: Path, runs: int) -> float:
+    """
+    Median time to import the application module in a fresh interpreter
+    """
+    snippet = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+    samples = []
+    workdir.mkdir()
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", snippet],
+            cwd=BACKEND_DIR, env=isolated_env(workdir), capture_output=True, text=True, check=True
+        )
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+async def run_downloads(client: httpx.AsyncClient, urls, concurrency: int, quality: str, poll_interval: float):
+    """
+    Submit every URL and wait for all jobs to finish; returns (ids, failures, seconds)
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = []
+
+    async def one(url):
+        async with semaphore:
+            response = await client.post("/api/v1/download", json={
+                "url": url, "platform": "tiktok", "quality": quality
+            })
+            response.raise_for_status()
+            download_id = response.json()["id"]
+            while True:
+                status = await client.get(f"/api/v1/download/{download_id}")
+                if status.status_code == 200 and status.json()["status"] in ("completed", "failed"):
+                    if status.json()["status"] == "failed":
+                        failures.append(status.json().get("error"))
+                    return download_id
+                await asyncio.sleep(poll_interval)
+
+    started = time.perf_counter()
+    ids = await asyncio.gather(*(one(url) for url in urls))
+    return ids, failures, time.perf_counter() - started
+
+async def run_status_polls(client: httpx.AsyncClient, ids, polls: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(index):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(f"/api/v1/download/{ids[index % len(ids)]}")
+            latencies.append((time.perf_counter() - started) * 1000)
+            response.raise_for_status()
+
+    await asyncio.gather(*(one(index) for index in range(polls)))
+    return latencies
+
+async def run_file_serving(client: httpx.AsyncClient, ids, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    received = 0
+
+    async def one(download_id):
+        nonlocal received
+        async with semaphore:
+            async with client.stream("GET", f"/api/v1/files/{download_id}") as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes():
+                    received += len(chunk)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(download_id) for download_id in ids))
+    return received, time.perf_counter() - started
+
+async def run_load(api: ApiProcess, platform: FakePlatformServer, args) -> dict:
+    if args.source == "hls":
+        segments = max(1, args.size // (256 * 1024))
+        urls = [platform.hls_url(f"clip-{index}", segments=segments) for index in range(args.jobs)]
+    else:
+        urls = [platform.video_url(f"clip-{index}", size=args.size, rate=args.rate) for index in range(args.jobs)]
+
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=api.base_url, timeout=300, limits=limits) as client:
+        rss_before = api.rss_mb()
+
+        ids, failures, download_seconds = await run_downloads(
+            client, urls, args.concurrency, args.quality, args.poll_interval
+        )
+        latencies = await run_status_polls(client, ids, args.polls, args.concurrency)
+        completed = [download_id for download_id in ids if download_id]
+        received, files_seconds = await run_file_serving(client, completed, args.concurrency)
+
+        rss_after = api.rss_mb()
+
+    total_mb = args.jobs * args.size / (1024 * 1024)
+    return {
+        "download_jobs_per_sec": round(args.jobs / download_seconds, 3),
+        "download_mb_per_sec": round(total_mb / download_seconds, 3),
+        "download_failures": len(failures),
+        "status_p50_ms": round(percentile(latencies, 50), 3),
+        "status_p95_ms": round(percentile(latencies, 95), 3),
+        "status_p99_ms": round(percentile(latencies, 99), 3),
+        "files_mb_per_sec": round(received / (1024 * 1024) / files_seconds, 3) if files_seconds else 0.0,
+        "rss_before_mb": rss_before,
+        "rss_after_mb": rss_after,
+        "rss_growth_mb": round(rss_after - rss_before, 3) if rss_before and rss_after else None,
+    }
+
+def compare_with_previous(history_path: Path, record: dict, threshold: float):
+    """
+    Return a list of regression descriptions versus the last comparable run
+    """
+    if not history_path.exists():
+        return []
+
+    previous = None
+    with open(history_path) as history:
+        for line in history:
+            entry = json.loads(line)
+            if entry.get("params") == record["params"]:
+                previous = entry
+
+    if previous is None:
+        return []
+
+    regressions = []
+    for name, higher_is_better in HIGHER_IS_BETTER.items():
+        old, new = previous["results"].get(name), record["results"].get(name)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if (higher_is_better and change < -threshold) or (not higher_is_better and change > threshold):
+            regressions.append(f"{name}: {old} -> {new} ({change:+.1%}) vs {previous['revision']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SM Downloader API against a fake platform")
+    parser.add_argument("--jobs", type=int, default=20, help="Number of download jobs to submit")
+    parser.add_argument("--concurrency", type=int, default=5, help="Concurrent client requests")
+    parser.add_argument("--size", type=int, default=2 * 1024 * 1024, help="Media size in bytes per job")
+    parser.add_argument("--rate", type=float, default=0, help="Per-connection bytes/sec limit of the fake CDN (0 = unlimited)")
+    parser.add_argument("--source", choices=["progressive", "hls"], default="progressive")
+    parser.add_argument("--quality", default="worst", help="Quality passed to /download")
+    parser.add_argument("--polls", type=int, default=500, help="Status requests for the latency benchmark")
+    parser.add_argument("--poll-interval", type=float, default=0.1)
+    parser.add_argument("--startup-runs", type=int, default=3, help="Cold starts to time (0 to skip)")
+    parser.add_argument("--history", type=Path, default=DEFAULT_HISTORY, help="JSONL file results are appended to")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative change treated as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--no-record", action="store_true", help="Don't append this run to the history")
+
+    args = parser.parse_args()
+
+    platform = FakePlatformServer().start()
+    with tempfile.TemporaryDirectory(prefix="smd-bench-") as tmp:
+        workdir = Path(tmp)
+        results = {}
+
+        if args.startup_runs:
+            print("Measuring startup time...")
+            results["startup_sec"] = round(measure_startup(workdir, args.startup_runs), 3)
+            results["startup_import_sec"] = round(measure_import_time(workdir / "import", args.startup_runs), 3)
+
+        print(f"Running {args.jobs} {args.source} jobs at concurrency {args.concurrency}...")
+        api = ApiProcess(workdir / "load")
+        (workdir / "load").mkdir()
+        try:
+            api.start()
+            results.update(asyncio.run(run_load(api, platform, args)))
+        finally:
+            api.stop()
+            platform.stop()
+
+    record = {
+        "timestamp": datetime.now().isoformat(),
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "params": {
+            "jobs": args.jobs,
+            "concurrency": args.concurrency,
+            "size": args.size,
+            "rate": args.rate,
+            "source": args.source,
+            "quality": args.quality,
+            "polls": args.polls,
+        },
+        "results": results,
+    }
+
+    for name, value in results.items():
+        print(f"  {name:<24} {value}")
+
+    regressions = compare_with_previous(args.history, record, args.threshold)
+
+    if not args.no_record:
+        args.history.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.history, "a") as history:
+            history.write(json.dumps(record) + "\n")
+
+    if regressions:
+        print()
+        print("Regressions against the previous run:")
+        for regression in regressions:
+            print(f"  ✗ {regression}")
+        if args.fail_on_regression:
+            sys.exit(1)
+    else:
+        print()
+        print("✓ No regressions against the previous run")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Serialization cost of the status and history endpoints, before and after lean projections
+Usage: python -m benchmarks.serialization [options]   (from the backend directory)
+
+Builds realistic status records in process (single videos and playlists,
+with descriptions, per-item details and storage bookkeeping) and times:
+    status      - one GET /download/{id} body: the full record through
+                  jsonable_encoder + stdlib json (what FastAPI does for a
+                  returned dict) vs. the summary projection + orjson
+    history     - one GET /downloads page, the same two ways, plus the
+                  size and cost of gzip and brotli on the lean page
+
+No server is started; the numbers isolate what a request spends turning
+the record into bytes.
+"""
+
+import argparse
+import gzip
+import json
+import sys
+import time
+import uuid
+from datetime import datetime
+
+import brotli
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from app.utils.helpers import summarize_status
+
+def make_status(index: int, playlist_items: int = 0) -> dict:
+    """
+    A completed job as download_service records it
+    """
+    download_id = str(uuid.uuid4())
+    status = {
+        "id": download_id,
+        "url": f"https://www.youtube.com/watch?v=video{index:06d}",
+        "platform": "youtube",
+        "status": "completed",
+        "progress": 100.0,
+        "started_at": datetime.now().isoformat(),
+        "completed_at": datetime.now().isoformat(),
+        "message": "Download completed successfully!",
+        "audio_only": False,
+        "thumbnail_url": f"/api/v1/thumbnails/{download_id}",
+        "file_info": {
+            "title": f"Benchmark video number {index} with a reasonably long title",
+            "duration": 600 + index,
+            "uploader": "Benchmark Channel",
+            "view_count": 1_000_000 + index,
+            "like_count": 25_000 + index,
+            "thumbnail": f"https://i.ytimg.com/vi/video{index:06d}/maxresdefault.jpg",
+            "description": "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 3 + "..."
+        },
+        "storage": {
+            "backend": "s3",
+            "objects": [f"youtube/{download_id}/Benchmark video {index}.mp4"]
+        },
+        "downloaded_bytes": 48_000_000 + index,
+        "total_bytes": 48_000_000 + index
+    }
+    if playlist_items:
+        status["items"] = [
+            {
+                "index": item,
+                "title": f"Playlist entry {item}",
+                "status": "completed",
+                "progress": 100.0,
+                "filename": f"{item:03d} - Playlist entry {item}.mp4",
+                "error": None
+            }
+            for item in range(1, playlist_items + 1)
+        ]
+    return status
+
+def before(content) -> bytes:
+    # FastAPI's default path for a returned dict: jsonable_encoder, then starlette's JSONResponse.render
+    return json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+def after_status(status: dict) -> bytes:
+    return orjson.dumps(summarize_status(status))
+
+def after_history(history: list) -> bytes:
+    return orjson.dumps({"downloads": [summarize_status(status) for status in history], "total": len(history)})
+
+def time_per_call(fn, *args, repeat: int) -> float:
+    """
+    Mean microseconds per call
+    """
+    fn(*args)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(*args)
+    return (time.perf_counter() - started) * 1e6 / repeat
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history-size", type=int, default=500, help="records on one history page")
+    parser.add_argument("--playlist-every", type=int, default=10, help="every Nth record is a playlist")
+    parser.add_argument("--playlist-items", type=int, default=25, help="entries per playlist record")
+    parser.add_argument("--repeat", type=int, default=2000, help="iterations per single-status measurement")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    history = [
+        make_status(i, args.playlist_items if args.playlist_every and i % args.playlist_every == 0 else 0)
+        for i in range(args.history_size)
+    ]
+    single = history[1]
+    playlist = next((status for status in history if status.get("items")), single)
+    history_repeat = max(1, args.repeat // max(1, args.history_size // 10))
+    full_page = {"downloads": history, "total": len(history)}
+    lean_page = after_history(history)
+
+    results = {
+        "status_before_us": time_per_call(before, single, repeat=args.repeat),
+        "status_after_us": time_per_call(after_status, single, repeat=args.repeat),
+        "status_before_bytes": len(before(single)),
+        "status_after_bytes": len(after_status(single)),
+        "playlist_status_before_us": time_per_call(before, playlist, repeat=args.repeat),
+        "playlist_status_after_us": time_per_call(after_status, playlist, repeat=args.repeat),
+        "playlist_status_before_bytes": len(before(playlist)),
+        "playlist_status_after_bytes": len(after_status(playlist)),
+        "history_before_ms": time_per_call(before, full_page, repeat=history_repeat) / 1000,
+        "history_after_ms": time_per_call(after_history, history, repeat=history_repeat) / 1000,
+        "history_before_bytes": len(before(full_page)),
+        "history_after_bytes": len(lean_page),
+        "history_gzip_ms": time_per_call(gzip.compress, lean_page, 5, repeat=history_repeat) / 1000,
+        "history_gzip_bytes": len(gzip.compress(lean_page, 5)),
+        "history_brotli_ms": time_per_call(lambda body: brotli.compress(body, quality=4), lean_page, repeat=history_repeat) / 1000,
+        "history_brotli_bytes": len(brotli.compress(lean_page, quality=4)),
+    }
+
+    if args.json:
+        print(json.dumps({key: round(value, 2) for key, value in results.items()}))
+        return 0
+
+    print(f"{'':28}{'before':>14}{'after':>14}{'speedup':>10}")
+    for label, key, unit in (
+        ("status (single video)", "status", "us"),
+        ("status (playlist)", "playlist_status", "us"),
+        ("history page", "history", "ms"),
+    ):
+        old, new = results[f"{key}_before_{unit}"], results[f"{key}_after_{unit}"]
+        print(f"{label:28}{old:>11.1f} {unit}{new:>11.1f} {unit}{old / new:>9.1f}x")
+        old_size, new_size = results[f"{key}_before_bytes"], results[f"{key}_after_bytes"]
+        print(f"{'  body size':28}{old_size:>12} B{new_size:>12} B{old_size / new_size:>9.1f}x")
+    print()
+    print(f"history page ({args.history_size} records) on the wire, lean projection:")
+    print(f"  identity  {results['history_after_bytes']:>10} B")
+    for name in ("gzip", "brotli"):
+        print(f"  {name:8}  {results[f'history_{name}_bytes']:>10} B   +{results[f'history_{name}_ms']:.2f} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
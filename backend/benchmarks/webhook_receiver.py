@@ -0,0 +1,114 @@
+"""
+Local webhook endpoint, used to exercise completion callbacks
+
+Verifies the X-Webhook-Signature of every event against the secret,
+prints it, and answers 204. Knobs to simulate a flaky receiver:
+    fail-first   answer the first N attempts of every event with 503
+    status       answer every event with this status code instead (e.g. 410)
+
+Submit jobs with "callback_url": "http://127.0.0.1:8767/hook" to a service
+running with the same WEBHOOK_SECRET and WEBHOOK_ALLOWED_HOSTS=127.0.0.1
+(loopback callbacks are refused otherwise).
+
+Usage: python -m benchmarks.webhook_receiver [--port 8767] [--secret S] [--fail-first N] [--status CODE]
+"""
+
+import argparse
+import hmac
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+from app.services.webhooks import sign
+from benchmarks.fake_platform import QuietHTTPServer
+
+# Signatures older than this are rejected, as a real receiver should
+MAX_SKEW = 300
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        receiver = self.server.receiver
+        body = self.rfile.read(int(self.headers.get("Content-Length", "0")))
+        event_id = self.headers.get("X-Webhook-Id", "")
+        fields = dict(part.split("=", 1) for part in self.headers.get("X-Webhook-Signature", "").split(",") if "=" in part)
+        try:
+            timestamp = int(fields.get("t", ""))
+        except ValueError:
+            timestamp = 0
+        valid = (
+            abs(time.time() - timestamp) <= MAX_SKEW
+            and hmac.compare_digest(fields.get("v1", ""), sign(receiver.secret, timestamp, body))
+        )
+
+        with receiver.lock:
+            attempt = receiver.attempts[event_id] = receiver.attempts.get(event_id, 0) + 1
+            if not valid:
+                receiver.rejected += 1
+            elif attempt > receiver.fail_first and receiver.status < 300:
+                receiver.events.append(json.loads(body))
+        print(f"{event_id} attempt {attempt} signature {'ok' if valid else 'INVALID'}: {body.decode()[:200]}", flush=True)
+
+        if not valid:
+            self._reply(401)
+        elif attempt <= receiver.fail_first:
+            self._reply(503)
+        else:
+            self._reply(receiver.status)
+
+class WebhookReceiver:
+    """
+    Runs the receiver on a background thread
+    """
+    def __init__(self, secret: str, host: str = "127.0.0.1", port: int = 0, fail_first: int = 0, status: int = 204):
+        self.httpd = QuietHTTPServer((host, port), WebhookHandler)
+        self.httpd.receiver = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.secret = secret
+        self.fail_first = fail_first
+        self.status = status
+        # Accepted events, attempts per event id and requests with a bad signature
+        self.events = []
+        self.attempts = {}
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/hook"
+
+    def start(self) -> "WebhookReceiver":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--secret", default=os.getenv("WEBHOOK_SECRET"), help="WEBHOOK_SECRET of the service (default: from the environment)")
+    parser.add_argument("--fail-first", type=int, default=0, help="answer the first N attempts of each event with 503")
+    parser.add_argument("--status", type=int, default=204, help="status code for accepted events")
+    args = parser.parse_args()
+    if not args.secret:
+        parser.error("set WEBHOOK_SECRET or pass --secret")
+    receiver = WebhookReceiver(args.secret, port=args.port, fail_first=args.fail_first, status=args.status).start()
+    print(f"Webhook receiver listening on {receiver.url}")
+    try:
+        receiver.thread.join()
+    except KeyboardInterrupt:
+        receiver.stop()
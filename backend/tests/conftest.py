@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+# The app reads its configuration at import time; point it at throwaway
+# locations before any test imports it
+_SCRATCH = tempfile.mkdtemp(prefix="smd-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_SCRATCH}/test.db")
+os.environ.setdefault("DOWNLOADS_DIR", os.path.join(_SCRATCH, "downloads"))
+os.environ.setdefault("PRELOAD_YT_DLP", "false")
+os.environ.setdefault("RESUME_INTERRUPTED", "false")
+
+import pytest
+
+from app import models  # noqa: F401  (registers every table on Base.metadata)
+from app.database import Base, engine
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    """Tables for the whole test session, on the scratch SQLite file"""
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """A DownloadService writing into its own temporary downloads directory"""
+    from app.services.download_service import DownloadService
+    monkeypatch.setenv("DOWNLOADS_DIR", str(tmp_path / "downloads"))
+    return DownloadService()
+
+@pytest.fixture
+def queue():
+    """The database job queue, emptied after the test"""
+    from app.database import SessionLocal
+    from app.models import DownloadJob
+    from app.services.job_queue import JobQueue
+    yield JobQueue(SessionLocal)
+    db = SessionLocal()
+    db.query(DownloadJob).delete()
+    db.commit()
+    db.close()
@@ -0,0 +1,143 @@
+import asyncio
+import re
+import shutil
+import threading
+from collections import namedtuple
+
+import pytest
+
+from app.services import admission as admission_module
+from app.services.admission import AdmissionController, AdmissionDeferred, estimate_size
+from app.services.download_service import ProgressHook
+from app.utils.helpers import summarize_status
+
+MB = 1024 ** 2
+Usage = namedtuple("Usage", "total used free")
+
+@pytest.fixture
+def disk(monkeypatch):
+    """Free bytes reported for the downloads volume"""
+    state = {"free": 1000 * MB}
+    monkeypatch.setattr(admission_module.shutil, "disk_usage", lambda path: Usage(0, 0, state["free"]))
+    return state
+
+def controller(tmp_path, **options):
+    options.setdefault("min_free_bytes", 100 * MB)
+    return AdmissionController(tmp_path, **options)
+
+def test_size_estimates():
+    assert estimate_size({"filesize": 10}) == 10
+    assert estimate_size({"filesize_approx": 20}) == 20
+    # 800 kbit/s for 10 s
+    assert estimate_size({"tbr": 800, "duration": 10}) == 1_000_000
+    assert estimate_size({"duration": 10}) is None
+    # Split formats are on disk twice until merged
+    assert estimate_size({"requested_formats": [{"filesize": 10}, {"filesize": 5}]}) == 30
+
+def test_job_is_deferred_when_it_would_eat_into_the_headroom(tmp_path, disk):
+    admission = controller(tmp_path)
+    assert admission.try_reserve("a", 600 * MB)
+    # 1000 free - 600 promised - 100 headroom
+    assert not admission.try_reserve("b", 400 * MB)
+    assert admission.try_reserve("b", 300 * MB)
+
+def test_reservation_shrinks_as_bytes_are_written(tmp_path, disk):
+    admission = controller(tmp_path)
+    written = {"a": 0}
+    assert admission.try_reserve("a", 600 * MB, lambda: written["a"])
+    written["a"] = 500 * MB
+    disk["free"] -= 500 * MB
+    # The written bytes moved from the reservation to the free-space figure
+    assert admission.free_bytes() == 300 * MB
+
+def test_inflight_budget_lets_one_oversized_job_run_alone(tmp_path, disk):
+    admission = controller(tmp_path, min_free_bytes=0, max_inflight_bytes=200 * MB)
+    assert admission.try_reserve("big", 500 * MB)
+    assert not admission.try_reserve("small", 10 * MB)
+    admission.release("big")
+    assert admission.try_reserve("small", 10 * MB)
+
+def test_release_wakes_a_deferred_job(tmp_path, disk):
+    admission = controller(tmp_path, poll_interval=60)
+    admission.try_reserve("a", 800 * MB)
+
+    async def run():
+        waiter = asyncio.create_task(admission.wait_for_space(500 * MB))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        admission.release("a")
+        return await asyncio.wait_for(waiter, timeout=5)
+
+    assert asyncio.run(run()) is True
+
+def test_release_from_another_thread_wakes_a_deferred_job(tmp_path, disk):
+    admission = controller(tmp_path, poll_interval=60)
+    admission.try_reserve("a", 800 * MB)
+
+    async def run():
+        waiter = asyncio.create_task(admission.wait_for_space(500 * MB))
+        await asyncio.sleep(0.05)
+        thread = threading.Thread(target=admission.release, args=("a",))
+        thread.start()
+        thread.join()
+        return await asyncio.wait_for(waiter, timeout=5)
+
+    assert asyncio.run(run()) is True
+
+def test_deferred_job_gives_up_after_max_wait(tmp_path, disk):
+    admission = controller(tmp_path, max_wait=0.1, poll_interval=0.02)
+    assert asyncio.run(admission.wait_for_space(2000 * MB)) is False
+
+class FakeYdl:
+    """Format selection by height cap, over formats of known size"""
+    SIZES = {2160: 4000 * MB, 1080: 950 * MB, 720: 400 * MB, 480: 200 * MB}
+
+    def __init__(self):
+        self.params = {"format": "bv*+ba/b"}
+
+    def build_format_selector(self, spec):
+        return spec
+
+    def process_ie_result(self, info, download=False):
+        cap = re.search(r"height<=(\d+)", self.params["format"])
+        height = max(h for h in self.SIZES if not cap or h <= int(cap.group(1)))
+        return {"height": height, "filesize": self.SIZES[height]}
+
+def test_downgrade_is_recorded_on_the_job(service, disk, tmp_path):
+    service.admission = controller(tmp_path)
+    service.download_status["job"] = {"id": "job", "status": "downloading", "message": "Downloading..."}
+    hook = ProgressHook("job", service.download_status, "youtube")
+    item_opts = {}
+    selected = service._admit("job", FakeYdl(), {}, [], item_opts, hook)
+    assert selected["height"] == 720
+    assert "720" in item_opts["format"]
+    assert service.download_status["job"]["downgraded_to"] == "720p"
+
+def test_downgrade_survives_completion(service, disk, monkeypatch):
+    async def prefetch_info(url, platform):
+        return False
+
+    def run_ydl(download_id, url, platform, ydl_opts, output_path, save_info=False):
+        service.download_status[download_id]["downgraded_to"] = "720p"
+
+    monkeypatch.setattr(service, "prefetch_info", prefetch_info)
+    monkeypatch.setattr(service, "_run_ydl", run_ydl)
+    asyncio.run(service.download_content("job", "https://www.tiktok.com/@a/video/1", "tiktok", "1080p"))
+
+    status = service.download_status["job"]
+    assert status["status"] == "completed"
+    assert "downgraded to 720p" in status["message"]
+    assert summarize_status(status)["downgraded_to"] == "720p"
+    assert service.compact_status("job", status)["downgraded_to"] == "720p"
+
+def test_job_that_fits_nowhere_is_deferred(service, disk, tmp_path):
+    service.admission = controller(tmp_path)
+    disk["free"] = 150 * MB
+    service.download_status["job"] = {"id": "job", "status": "downloading"}
+    hook = ProgressHook("job", service.download_status, "youtube")
+    ydl = FakeYdl()
+    with pytest.raises(AdmissionDeferred):
+        service._admit("job", ydl, {}, [], {}, hook)
+    # The selector is restored for the retry
+    assert ydl.params["format"] == "bv*+ba/b"
+    assert "downgraded_to" not in service.download_status["job"]
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from app.services.audio_pipeline import can_copy_audio, pick_audio_format
+from app.services.cancellation import JobCancelled
+from app.services.download_service import ProgressHook
+
+def audio(format_id, ext, abr, **extra):
+    return {
+        "format_id": format_id, "ext": ext, "abr": abr, "vcodec": "none", "acodec": extra.pop("acodec", ext),
+        "url": f"https://cdn.example.com/{format_id}", "protocol": "https", **extra
+    }
+
+def test_picks_the_best_pipe_safe_audio_format():
+    info = {"formats": [
+        audio("opus-low", "webm", 50, acodec="opus"),
+        audio("opus-high", "webm", 130, acodec="opus"),
+        {"format_id": "video", "ext": "mp4", "vcodec": "avc1", "acodec": "mp4a.40.2", "url": "https://cdn.example.com/v"},
+    ]}
+    assert pick_audio_format(info)["format_id"] == "opus-high"
+
+def test_plain_m4a_is_never_piped():
+    # A progressive MP4 can keep its moov atom at the end, which ffmpeg can't read from stdin
+    info = {"formats": [audio("m4a", "m4a", 256, acodec="mp4a.40.2"), audio("mp3", "mp3", 128)]}
+    assert pick_audio_format(info)["format_id"] == "mp3"
+    assert pick_audio_format({"formats": [audio("m4a", "m4a", 256, acodec="mp4a.40.2")]}) is None
+
+def test_fragmented_m4a_is_piped():
+    info = {"formats": [audio("140", "m4a", 129, acodec="mp4a.40.2", container="m4a_dash")]}
+    assert pick_audio_format(info)["format_id"] == "140"
+
+def test_fragmented_and_non_http_formats_are_skipped():
+    info = {"formats": [
+        audio("hls", "mp3", 320, protocol="m3u8_native"),
+        audio("frags", "webm", 160, acodec="opus", fragments=[{"url": "a"}]),
+    ]}
+    assert pick_audio_format(info) is None
+
+def test_copy_only_for_matching_codecs():
+    assert can_copy_audio("mp4a.40.2", "m4a")
+    assert can_copy_audio("opus", "opus")
+    assert not can_copy_audio("opus", "mp3")
+
+def test_pipeline_failure_falls_back_to_ytdlp(service, monkeypatch, tmp_path):
+    async def broken_stream(*args):
+        raise RuntimeError("ffmpeg failed (1): pipe:0: Invalid data found when processing input")
+
+    monkeypatch.setattr(service, "_stream_audio", broken_stream)
+    hook = ProgressHook("job", {"job": {}}, "youtube", hash_files=True)
+    hook.hashers["clip.mp3"] = object()
+    streamed = asyncio.run(service._try_stream_audio("job", "https://youtu.be/x", "youtube", "mp3", tmp_path, hook))
+    # False sends the job down yt-dlp's download + extract path
+    assert streamed is False
+    assert hook.hashers == {}
+
+def test_cancellation_is_not_turned_into_a_fallback(service, monkeypatch, tmp_path):
+    async def cancelled_stream(*args):
+        raise JobCancelled("Download cancelled")
+
+    monkeypatch.setattr(service, "_stream_audio", cancelled_stream)
+    hook = ProgressHook("job", {"job": {}}, "youtube")
+    with pytest.raises(JobCancelled):
+        asyncio.run(service._try_stream_audio("job", "https://youtu.be/x", "youtube", "mp3", tmp_path, hook))
@@ -0,0 +1,102 @@
+import time
+
+import pytest
+
+from app.services.bandwidth import BandwidthShaper, parse_tier_limits
+
+def start(shaper, download_id, tier=None, duration=None):
+    """Register a job and mark it as transferring"""
+    throttle = shaper.throttle(download_id, tier)
+    shaper.set_duration(download_id, duration)
+    shaper.touch(throttle)
+    return throttle
+
+def rates(shaper):
+    return {download_id: allocation["rate"] for download_id, allocation in shaper.allocations().items()}
+
+def test_parse_tier_limits():
+    assert parse_tier_limits("free:2000000, premium:0") == {"free": 2000000, "premium": 0}
+    assert parse_tier_limits("") == {}
+
+def test_budget_is_split_evenly():
+    shaper = BandwidthShaper(limit=900)
+    for download_id in ("a", "b", "c"):
+        start(shaper, download_id, duration=600)
+    assert rates(shaper) == {"a": 300, "b": 300, "c": 300}
+
+def test_short_clips_get_a_bigger_share():
+    shaper = BandwidthShaper(limit=1000, short_clip_seconds=120, short_clip_weight=4)
+    start(shaper, "clip", duration=30)
+    start(shaper, "film", duration=3600)
+    assert rates(shaper) == {"clip": 800, "film": 200}
+
+def test_what_a_capped_tier_leaves_goes_to_the_others():
+    shaper = BandwidthShaper(limit=1000, tier_limits={"free": 100})
+    start(shaper, "free", tier="free")
+    start(shaper, "a", tier="premium")
+    start(shaper, "b", tier="premium")
+    assert rates(shaper) == {"free": 100, "a": 450, "b": 450}
+
+def test_caps_that_only_bind_after_redistribution_are_applied():
+    # Even share 300 each: only "low" is capped at first; the 800 left splits 400/400,
+    # which then caps "mid" at 350 and leaves 450 to "open"
+    shaper = BandwidthShaper(limit=900, tier_limits={"low": 100, "mid": 350})
+    start(shaper, "low", tier="low")
+    start(shaper, "mid", tier="mid")
+    start(shaper, "open", tier="premium")
+    assert rates(shaper) == {"low": 100, "mid": 350, "open": 450}
+    assert sum(rates(shaper).values()) == 900
+
+def test_without_a_budget_only_tier_caps_apply():
+    shaper = BandwidthShaper(tier_limits={"free": 100, "default": 50})
+    start(shaper, "free", tier="free")
+    start(shaper, "anonymous")
+    start(shaper, "premium", tier="premium")
+    assert rates(shaper) == {"free": 100, "anonymous": 50, "premium": 50}
+
+def test_finished_job_hands_its_share_back():
+    shaper = BandwidthShaper(limit=1000)
+    start(shaper, "a")
+    start(shaper, "b")
+    shaper.close("b")
+    assert rates(shaper) == {"a": 1000}
+
+def test_idle_job_gives_its_share_back():
+    shaper = BandwidthShaper(limit=1000, idle_after=0.05)
+    start(shaper, "a")
+    busy = start(shaper, "b")
+    time.sleep(0.1)
+    shaper.touch(busy)
+    assert rates(shaper) == {"b": 1000}
+
+def test_runtime_update_reaches_other_processes(tmp_path):
+    settings_path = tmp_path / "bandwidth.json"
+    api = BandwidthShaper(limit=1000, settings_path=settings_path)
+    worker = BandwidthShaper(limit=1000, settings_path=settings_path, refresh_interval=0)
+    start(worker, "a")
+    api.update(limit=400, tier_limits={"free": 10})
+    worker.refresh()
+    assert worker.settings()["limit"] == 400
+    assert rates(worker) == {"a": 400}
+    api.reset()
+    worker.refresh()
+    assert rates(worker) == {"a": 1000}
+
+def test_throttle_paces_a_download_thread():
+    shaper = BandwidthShaper(limit=1000)
+    throttle = start(shaper, "a")
+    # The first report is the baseline (it may include resumed bytes) and costs nothing
+    throttle({"status": "downloading", "filename": "clip.mp4", "downloaded_bytes": 10_000})
+    started = time.monotonic()
+    # Half a second of idle credit, then 0.3 s of debt
+    throttle({"status": "downloading", "filename": "clip.mp4", "downloaded_bytes": 10_800})
+    assert time.monotonic() - started == pytest.approx(0.3, abs=0.1)
+
+def test_rate_increase_shortens_a_wait():
+    shaper = BandwidthShaper(limit=100)
+    throttle = start(shaper, "a")
+    throttle.consume(50)
+    started = time.monotonic()
+    shaper.update(limit=100_000)
+    throttle.consume(1)
+    assert time.monotonic() - started < 0.1
@@ -0,0 +1,41 @@
+import json
+
+import httpx
+
+from benchmarks.fake_platform import FakePlatformServer
+from benchmarks.run_benchmarks import compare_with_previous, isolated_env, percentile
+
+def test_app_processes_get_a_throwaway_database_and_downloads_dir(tmp_path):
+    env = isolated_env(tmp_path, {"EXTRA": "1"})
+    assert env["DATABASE_URL"] == f"sqlite:///{tmp_path / 'bench.db'}"
+    assert env["DOWNLOADS_DIR"] == str(tmp_path / "downloads")
+    assert env["EXTRA"] == "1"
+
+def test_percentile_picks_the_nearest_rank():
+    samples = list(range(101))
+    assert percentile(samples, 50) == 50
+    assert percentile(samples, 99) == 99
+    assert percentile([], 95) == 0.0
+
+def test_regressions_are_reported_against_the_last_comparable_run(tmp_path):
+    history = tmp_path / "history.jsonl"
+    params = {"jobs": 2}
+    history.write_text("\n".join(json.dumps(entry) for entry in [
+        {"params": params, "revision": "old", "results": {"status_p95_ms": 10.0, "download_jobs_per_sec": 5.0}},
+        {"params": {"jobs": 3}, "revision": "other", "results": {"status_p95_ms": 1.0}},
+    ]) + "\n")
+    record = {"params": params, "results": {"status_p95_ms": 15.0, "download_jobs_per_sec": 5.1}}
+    regressions = compare_with_previous(history, record, threshold=0.1)
+    assert len(regressions) == 1 and regressions[0].startswith("status_p95_ms")
+
+def test_fake_platform_serves_deterministic_media():
+    server = FakePlatformServer().start()
+    try:
+        url = server.video_url("clip", size=4096)
+        first = httpx.get(url).content
+        assert len(first) == 4096
+        assert httpx.get(url).content == first
+        ranged = httpx.get(url, headers={"Range": "bytes=100-199"})
+        assert ranged.status_code == 206 and ranged.content == first[100:200]
+    finally:
+        server.stop()
@@ -0,0 +1,66 @@
+import fcntl
+import hashlib
+import shutil
+import threading
+
+from app.services.blob_store import LOCK_FILE, BlobStore, IncrementalHasher
+
+MEDIA = b"video bytes " * 1000
+
+def write_job(root, name, data=MEDIA):
+    job_dir = root / name
+    job_dir.mkdir()
+    (job_dir / "clip.mp4").write_bytes(data)
+    return job_dir
+
+def test_hasher_follows_a_growing_file(tmp_path):
+    path = tmp_path / "clip.mp4"
+    hasher = IncrementalHasher()
+    with open(path, "wb") as f:
+        for start in range(0, len(MEDIA), 4096):
+            f.write(MEDIA[start:start + 4096])
+            f.flush()
+            hasher.update_from(str(path))
+    assert hasher.digest_for(path) == hashlib.sha256(MEDIA).hexdigest()
+
+def test_hasher_refuses_a_file_it_did_not_fully_see(tmp_path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(MEDIA)
+    hasher = IncrementalHasher()
+    hasher.update(MEDIA[:100])
+    # update() counted 100 bytes; update_from() then reads the rest from that offset
+    assert hasher.digest_for(path) == hashlib.sha256(MEDIA).hexdigest()
+    hasher.update(b"not in the file")
+    assert hasher.digest_for(path) is None
+
+def test_identical_media_is_stored_once(tmp_path):
+    store = BlobStore(tmp_path / ".blobs")
+    first = store.ingest_job(write_job(tmp_path, "a"))
+    second = store.ingest_job(write_job(tmp_path, "b"))
+    assert first["clip.mp4"]["deduplicated"] is False
+    assert second["clip.mp4"]["deduplicated"] is True
+    digest = first["clip.mp4"]["sha256"]
+    assert store.blob_path(digest).stat().st_nlink == 3
+    assert (tmp_path / "b" / "clip.mp4").read_bytes() == MEDIA
+
+def test_gc_removes_only_unreferenced_blobs(tmp_path):
+    store = BlobStore(tmp_path / ".blobs")
+    kept = store.ingest_job(write_job(tmp_path, "a"))["clip.mp4"]["sha256"]
+    dropped = store.ingest_job(write_job(tmp_path, "b", b"other"))["clip.mp4"]["sha256"]
+    shutil.rmtree(tmp_path / "b")
+    assert store.gc() == len(b"other")
+    assert store.blob_path(kept).exists()
+    assert not store.blob_path(dropped).exists()
+
+def test_gc_waits_for_another_process_holding_the_store_lock(tmp_path):
+    store = BlobStore(tmp_path / ".blobs")
+    store.ingest_job(write_job(tmp_path, "a"))
+    shutil.rmtree(tmp_path / "a")
+    done = threading.Event()
+    # A separate open file description contends like another process would
+    with open(store.root / LOCK_FILE, "a") as other:
+        fcntl.flock(other, fcntl.LOCK_EX)
+        threading.Thread(target=lambda: (store.gc(), done.set()), daemon=True).start()
+        assert not done.wait(timeout=0.3)
+    assert done.wait(timeout=5)
+    assert not list(store.root.glob("*/*/*"))
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.cancellation import CANCEL_MARKER, CancelToken, JobCancelled
+
+def test_cancel_before_the_job_directory_exists(tmp_path):
+    token = CancelToken(tmp_path / "job")
+    token.cancel()
+    assert token.cancelled
+    with pytest.raises(JobCancelled):
+        token.raise_if_cancelled()
+
+def test_cancel_interrupts_the_task_and_waits_for_its_thread(tmp_path):
+    token = CancelToken(tmp_path)
+    stopped = threading.Event()
+
+    def transfer():
+        # A yt-dlp thread: notices the flag at its next progress tick
+        try:
+            while True:
+                token.raise_if_cancelled()
+                time.sleep(0.01)
+        finally:
+            stopped.set()
+
+    async def run():
+        token.task = asyncio.create_task(token.run_in_thread(transfer))
+        await asyncio.sleep(0.05)
+        token.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await token.task
+        # The task only ends once the thread stopped writing
+        return stopped.is_set()
+
+    assert asyncio.run(run())
+    assert (tmp_path / CANCEL_MARKER).exists()
+
+def test_cancelling_a_running_download_removes_its_files(service, monkeypatch):
+    started = threading.Event()
+
+    async def prefetch_info(url, platform):
+        return False
+
+    def run_ydl(download_id, url, platform, ydl_opts, output_path, save_info=False):
+        (output_path / "clip.mp4.part").write_bytes(b"partial")
+        started.set()
+        while True:
+            ydl_opts["progress_hooks"][0].check_cancelled()
+            time.sleep(0.01)
+
+    monkeypatch.setattr(service, "prefetch_info", prefetch_info)
+    monkeypatch.setattr(service, "_run_ydl", run_ydl)
+
+    async def run():
+        job = asyncio.create_task(service.download_content("job-1", "https://www.tiktok.com/@a/video/1", "tiktok", "720p"))
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        assert (await service.cancel_download("job-1"))["status"] == "cancelling"
+        await job
+
+    asyncio.run(run())
+    assert service.download_status["job-1"]["status"] == "cancelled"
+    assert not (service.downloads_dir / "tiktok" / "job-1").exists()
+    assert "job-1" not in service.cancel_tokens
+
+def test_cancelling_a_queued_download_never_starts_it(service, monkeypatch):
+    async def run():
+        service.sync_concurrency = 1
+        gate = service._sync_slots = asyncio.Semaphore(0)
+        await service.schedule_download("job-2", "https://www.tiktok.com/@a/video/2", "tiktok")
+        status = await service.cancel_download("job-2")
+        assert status["status"] == "cancelled"
+        # Gets its slot, sees the cancellation and returns without starting
+        gate.release()
+        await asyncio.gather(*service._background_tasks)
+
+    monkeypatch.setattr(service, "job_queue", None)
+    asyncio.run(run())
+    assert service.download_status["job-2"]["status"] == "cancelled"
+    assert not (service.downloads_dir / "tiktok" / "job-2").exists()
@@ -0,0 +1,39 @@
+import time
+
+from app.services.checkpoints import CHECKPOINT_FILE, CheckpointStore
+
+def job_dir(root, platform, download_id):
+    path = root / platform / download_id
+    path.mkdir(parents=True)
+    return path
+
+def test_updates_merge_into_the_checkpoint(tmp_path):
+    store = CheckpointStore()
+    store.update(tmp_path, id="a", state="downloading")
+    store.update(tmp_path, attempts=2)
+    checkpoint = store.load(tmp_path)
+    assert checkpoint["id"] == "a" and checkpoint["attempts"] == 2
+    assert not (tmp_path / f"{CHECKPOINT_FILE}.tmp").exists()
+
+def test_corrupt_checkpoint_reads_as_empty(tmp_path):
+    (tmp_path / CHECKPOINT_FILE).write_text("{not json")
+    assert CheckpointStore().load(tmp_path) == {}
+
+def test_checkpointed_info_is_reused_only_while_fresh():
+    store = CheckpointStore(info_ttl=60)
+    info = {"id": "x", "formats": []}
+    assert store.fresh_info({"info": info, "info_saved_at": time.time()}) == info
+    assert store.fresh_info({"info": info, "info_saved_at": time.time() - 120}) is None
+    assert store.fresh_info({}) is None
+
+def test_partial_files_are_keyed_by_their_final_name(tmp_path):
+    (tmp_path / "clip.mp4.part").write_bytes(b"x" * 10)
+    (tmp_path / "done.mp4").write_bytes(b"x" * 99)
+    assert CheckpointStore().partial_files(tmp_path) == {str(tmp_path / "clip.mp4"): 10}
+
+def test_only_unfinished_jobs_are_resumed(service):
+    store = service.checkpoints
+    for download_id, state in (("a", "downloading"), ("b", "retrying"), ("c", "completed"), ("d", "failed")):
+        store.update(job_dir(service.downloads_dir, "tiktok", download_id), id=download_id, url="u", platform="tiktok", state=state)
+    resumed = sorted(checkpoint["id"] for checkpoint in service.find_interrupted_downloads())
+    assert resumed == ["a", "b"]
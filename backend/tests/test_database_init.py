@@ -0,0 +1,87 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app import database_init
+from app.database import Base
+from app.models import User
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+@pytest.fixture
+def fresh_engine(tmp_path, monkeypatch):
+    """Point init_db at an empty SQLite database"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}", connect_args={"check_same_thread": False})
+    monkeypatch.setattr(database_init, "engine", engine)
+    monkeypatch.setattr(database_init, "SessionLocal", sessionmaker(bind=engine))
+    yield engine
+    engine.dispose()
+
+def test_fresh_database_is_created_seeded_and_stamped(fresh_engine):
+    assert database_init.init_db()
+    assert database_init.schema_is_current()
+    with fresh_engine.connect() as connection:
+        assert connection.execute(text("SELECT count(*) FROM users")).scalar() == 1
+
+def test_database_at_head_skips_schema_work(fresh_engine, monkeypatch):
+    assert database_init.init_db()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("create_all should not run on a database at head")
+
+    monkeypatch.setattr(database_init.Base.metadata, "create_all", fail)
+    assert database_init.init_db()
+
+def test_unversioned_database_is_not_stamped(fresh_engine):
+    # Created by an older release with create_all: its schema may lag behind the models
+    User.__table__.create(fresh_engine)
+    assert database_init.init_db()
+    assert not database_init.schema_is_current()
+
+def test_migrated_database_counts_as_current(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    subprocess.run(
+        [sys.executable, "-m", "alembic", "upgrade", "head"],
+        cwd=BACKEND_DIR, env={**os.environ, "DATABASE_URL": url}, check=True, capture_output=True
+    )
+    engine = create_engine(url)
+    monkeypatch.setattr(database_init, "engine", engine)
+    assert database_init.schema_is_current()
+    assert {"users", "downloads"} <= set(inspect(engine).get_table_names())
+
+def test_migrated_database_gets_the_seed_data(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    subprocess.run(
+        [sys.executable, "-m", "alembic", "upgrade", "head"],
+        cwd=BACKEND_DIR, env={**os.environ, "DATABASE_URL": url}, check=True, capture_output=True
+    )
+    engine = create_engine(url)
+    monkeypatch.setattr(database_init, "engine", engine)
+    monkeypatch.setattr(database_init, "SessionLocal", sessionmaker(bind=engine))
+    assert database_init.init_db()
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT count(*) FROM users")).scalar() == 1
+    # Seeded once, not on every boot
+    assert database_init.init_db()
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT count(*) FROM users")).scalar() == 1
+    engine.dispose()
+
+def test_migrations_cover_every_model(tmp_path):
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    subprocess.run(
+        [sys.executable, "-m", "alembic", "upgrade", "head"],
+        cwd=BACKEND_DIR, env={**os.environ, "DATABASE_URL": url}, check=True, capture_output=True
+    )
+    engine = create_engine(url)
+    with engine.connect() as connection:
+        diff = compare_metadata(MigrationContext.configure(connection), Base.metadata)
+    engine.dispose()
+    assert diff == []
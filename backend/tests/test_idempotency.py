@@ -0,0 +1,121 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi import BackgroundTasks, Response
+from starlette.requests import Request
+
+from app.database import SessionLocal
+from app.models import IdempotencyKey
+from app.routers import main
+from app.utils.idempotency import IdempotencyConflict, IdempotencyStore
+
+@pytest.fixture(autouse=True)
+def clean_keys():
+    yield
+    db = SessionLocal()
+    db.query(IdempotencyKey).delete()
+    db.commit()
+    db.close()
+
+def store(**options):
+    options.setdefault("poll_interval", 0.01)
+    return IdempotencyStore(SessionLocal, **options)
+
+def test_first_request_owns_the_key_and_retries_get_its_response():
+    keys = store()
+
+    async def run():
+        assert await keys.begin("user:1", "k", "fp") is None
+        keys.complete("user:1", "k", {"id": "job"})
+        return await keys.begin("user:1", "k", "fp")
+
+    assert asyncio.run(run()) == {"id": "job"}
+
+def test_key_reused_for_another_request_is_a_conflict():
+    keys = store()
+
+    async def run():
+        await keys.begin("user:1", "k", "fp")
+        keys.complete("user:1", "k", {"id": "job"})
+        with pytest.raises(IdempotencyConflict):
+            await keys.begin("user:1", "k", "other")
+
+    asyncio.run(run())
+
+def test_scopes_do_not_share_keys():
+    keys = store()
+
+    async def run():
+        assert await keys.begin("user:1", "k", "fp") is None
+        assert await keys.begin("client:10.0.0.1", "k", "fp") is None
+
+    asyncio.run(run())
+
+def test_abandoned_key_can_be_retried():
+    keys = store()
+
+    async def run():
+        await keys.begin("user:1", "k", "fp")
+        keys.abandon("user:1", "k")
+        return await keys.begin("user:1", "k", "fp")
+
+    assert asyncio.run(run()) is None
+
+def test_concurrent_retry_on_another_replica_waits_for_the_owner():
+    first, second = store(), store()
+
+    async def run():
+        assert await first.begin("user:1", "k", "fp") is None
+        retry = asyncio.create_task(second.begin("user:1", "k", "fp"))
+        await asyncio.sleep(0.05)
+        assert not retry.done()
+        first.complete("user:1", "k", {"id": "job"})
+        return await asyncio.wait_for(retry, timeout=5)
+
+    assert asyncio.run(run()) == {"id": "job"}
+
+def test_key_of_a_crashed_owner_is_taken_over():
+    keys = store(pending_timeout=0.05)
+
+    async def run():
+        await keys.begin("user:1", "k", "fp")
+        await asyncio.sleep(0.1)
+        return await asyncio.wait_for(keys.begin("user:1", "k", "fp"), timeout=5)
+
+    assert asyncio.run(run()) is None
+
+def test_expired_key_starts_over():
+    keys = store(ttl=0.05)
+
+    async def run():
+        await keys.begin("user:1", "k", "fp")
+        keys.complete("user:1", "k", {"id": "job"})
+        await asyncio.sleep(0.1)
+        return await keys.begin("user:1", "k", "fp")
+
+    assert asyncio.run(run()) is None
+
+def submit(client_host, key, monkeypatch):
+    monkeypatch.setattr(main.download_service, "job_queue", None)
+    request = Request({"type": "http", "method": "POST", "headers": [], "client": (client_host, 50000)})
+    response = Response()
+    result = asyncio.run(main.download_content(
+        main.DownloadRequest(url="https://www.tiktok.com/@a/video/1"), BackgroundTasks(), response, request,
+        current_user=None, idempotency_key=key
+    ))
+    return result, response
+
+def test_repeated_download_request_is_replayed(monkeypatch):
+    key = str(uuid.uuid4())
+    first, _ = submit("10.0.0.1", key, monkeypatch)
+    replay, response = submit("10.0.0.1", key, monkeypatch)
+    assert replay.id == first.id
+    assert response.headers["Idempotent-Replayed"] == "true"
+
+def test_anonymous_clients_do_not_share_keys(monkeypatch):
+    key = str(uuid.uuid4())
+    first, _ = submit("10.0.0.1", key, monkeypatch)
+    other, response = submit("10.0.0.2", key, monkeypatch)
+    assert other.id != first.id
+    assert "Idempotent-Replayed" not in response.headers
@@ -0,0 +1,149 @@
+import asyncio
+import json
+from pathlib import Path
+
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+
+from app.services.instagram_service import InstagramExtractionError, InstagramService, extract_shortcode, shortcode_to_pk
+from app.services.proxy_pool import ProxyPool
+from app.utils.helpers import canonicalize_url
+
+FIXTURES = Path(__file__).parent / "fixtures" / "instagram"
+
+def recorded(name):
+    return json.loads((FIXTURES / name).read_text())
+
+def transport(graphql=None, api=None, status=200):
+    """Serve recorded responses for the GraphQL and private API endpoints"""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url.host == "i.instagram.com":
+            return httpx.Response(status, json=api) if api is not None else httpx.Response(404)
+        if request.url.path == "/graphql/query/":
+            return httpx.Response(status, json=graphql) if graphql is not None else httpx.Response(404)
+        return httpx.Response(404)
+
+    mock = httpx.MockTransport(handler)
+    mock.requests = requests
+    return mock
+
+def extract(service, url):
+    async def run():
+        try:
+            return await service.extract(url)
+        finally:
+            await service.aclose()
+    return asyncio.run(run())
+
+def test_shortcodes_and_media_ids():
+    assert extract_shortcode("https://www.instagram.com/reel/C1F9kLqsR4A/?igsh=abc") == "C1F9kLqsR4A"
+    assert extract_shortcode("https://instagram.com/someone/p/C0r8YxJN4oy/") == "C0r8YxJN4oy"
+    assert extract_shortcode("https://www.instagram.com/someone/") is None
+    # The recorded post's numeric id and shortcode describe the same media
+    item = recorded("api_media_info_carousel.json")["items"][0]
+    assert shortcode_to_pk(item["code"]) == int(item["pk"])
+
+def test_graphql_reel_becomes_a_single_video():
+    service = InstagramService(transport=transport(graphql=recorded("graphql_shortcode_media_reel.json")), session_id="")
+    info = extract(service, "https://www.instagram.com/reel/C1F9kLqsR4A/")
+    assert info["id"] == "C1F9kLqsR4A"
+    assert info["uploader"] == "City Cycling" and info["channel"] == "citycycling"
+    assert info["description"] == "Rush hour, the fun way"
+    assert info["duration"] == 22.4 and info["view_count"] == 182340 and info["like_count"] == 9120
+    assert [f["height"] for f in info["formats"]] == [1920]
+    # Largest preview first
+    assert info["thumbnail"].endswith("stp=dst-jpg_e15")
+
+def test_private_api_carousel_becomes_a_playlist():
+    mock = transport(api=recorded("api_media_info_carousel.json"))
+    service = InstagramService(transport=mock, session_id="session")
+    info = extract(service, "https://www.instagram.com/p/C0r8YxJN4oy/")
+    assert mock.requests[0].url.path == f"/api/v1/media/{shortcode_to_pk('C0r8YxJN4oy')}/info/"
+    assert info["_type"] == "playlist"
+    video, photo = info["entries"]
+    assert video["id"] == "C0r8YxJN4oy_1" and video["duration"] == 14.933
+    assert [f["height"] for f in video["formats"]] == [1280, 854]
+    assert video["formats"][0]["vcodec"] == "avc1.64001F"
+    assert photo["formats"][0]["ext"] == "jpg" and photo["formats"][0]["width"] == 1080
+    assert info["uploader"] == "Trail Runner Daily" and info["like_count"] == 4812
+
+def test_private_api_miss_falls_through_to_graphql():
+    mock = transport(graphql=recorded("graphql_shortcode_media_reel.json"))
+    service = InstagramService(transport=mock, session_id="session")
+    info = extract(service, "https://www.instagram.com/reel/C1F9kLqsR4A/")
+    assert info["formats"][0]["format_id"] == "main"
+    assert [request.url.host for request in mock.requests] == ["i.instagram.com", "www.instagram.com"]
+
+def test_login_wall_is_an_extraction_error():
+    def handler(request):
+        return httpx.Response(200, text="<html>Login • Instagram</html>")
+
+    service = InstagramService(transport=httpx.MockTransport(handler), session_id="")
+    with pytest.raises(InstagramExtractionError):
+        extract(service, "https://www.instagram.com/p/C0r8YxJN4oy/")
+
+def fallbacks(reason):
+    return REGISTRY.get_sample_value(
+        "smd_native_extractor_fallbacks_total", {"platform": "instagram", "reason": reason}
+    ) or 0.0
+
+def prefetch(service, url):
+    async def run():
+        try:
+            return await service.prefetch_info(url, "instagram")
+        finally:
+            await service.instagram.aclose()
+            await service.proxies.aclose()
+    return asyncio.run(run())
+
+def test_prefetch_fills_the_info_cache(service):
+    service.instagram = InstagramService(transport=transport(graphql=recorded("graphql_shortcode_media_reel.json")), session_id="")
+    assert prefetch(service, "https://www.instagram.com/reel/C1F9kLqsR4A/")
+    assert service.extract_info("https://instagram.com/reel/C1F9kLqsR4A", "instagram")["duration"] == 22.4
+
+def test_changed_payload_falls_back_to_yt_dlp(service):
+    service.instagram = InstagramService(transport=transport(graphql=recorded("graphql_shortcode_media_changed.json")), session_id="")
+    before = fallbacks("parse_error")
+    assert prefetch(service, "https://www.instagram.com/p/C1lR3bTIbv2/") is False
+    assert fallbacks("parse_error") == before + 1
+    assert len(service.info_cache) == 0
+
+def test_http_failure_falls_back_to_yt_dlp(service):
+    service.instagram = InstagramService(transport=transport(graphql={}, status=429), session_id="")
+    before = fallbacks("unavailable")
+    assert prefetch(service, "https://www.instagram.com/p/C1lR3bTIbv2/") is False
+    assert fallbacks("unavailable") == before + 1
+
+def proxied(service, mock):
+    """Route the service's Instagram traffic through one fake egress proxy serving `mock`"""
+    service.proxies = ProxyPool({"instagram": ["http://10.0.0.1:8080"]}, sticky_platforms=["instagram"])
+    # The pooled client of that proxy, as ProxyPool.client would have built it
+    service.proxies._clients["http://10.0.0.1:8080"] = httpx.AsyncClient(transport=mock)
+    return service.proxies._pools["instagram"][0]
+
+def test_native_extraction_goes_through_the_sticky_proxy(service):
+    mock = transport(graphql=recorded("graphql_shortcode_media_reel.json"))
+    service.instagram = InstagramService(transport=httpx.MockTransport(lambda request: httpx.Response(500)), session_id="session")
+    proxy = proxied(service, mock)
+    url = "https://www.instagram.com/reel/C1F9kLqsR4A/"
+    assert prefetch(service, url)
+
+    # The private API misses, GraphQL answers; both left through the proxy with its identity
+    assert len(mock.requests) == 2
+    for request in mock.requests:
+        assert request.headers["User-Agent"] == proxy.user_agent
+        assert request.headers["X-IG-App-ID"] == "936619743392459"
+        assert request.headers["Cookie"] == "sessionid=session"
+    assert proxy.in_use == 0 and proxy.consecutive_failures == 0
+    # yt-dlp gets the same exit for the download
+    assert service.proxies.acquire("instagram", canonicalize_url(url)) is proxy
+
+def test_blocked_exit_counts_against_the_proxy(service):
+    service.instagram = InstagramService(session_id="")
+    proxy = proxied(service, transport(graphql={}, status=429))
+    assert prefetch(service, "https://www.instagram.com/p/C1lR3bTIbv2/") is False
+    assert proxy.in_use == 0 and proxy.consecutive_failures == 1
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from app.database import SessionLocal
+from app.models import DownloadJob
+
+def enqueue(queue, count, **extras):
+    ids = [f"job-{index}" for index in range(count)]
+    for download_id in ids:
+        queue.enqueue(download_id, f"https://tiktok.com/@a/video/{download_id}", "tiktok", **extras)
+    return ids
+
+def test_jobs_are_claimed_once_in_submission_order(queue):
+    ids = enqueue(queue, 3)
+    first = queue.claim("worker-a", limit=2)
+    second = queue.claim("worker-b", limit=2)
+    assert [job["id"] for job in first] == ids[:2]
+    assert [job["id"] for job in second] == ids[2:]
+    assert queue.claim("worker-c") == []
+    assert queue.depth() == 0
+
+def test_claim_returns_the_per_job_extras(queue):
+    enqueue(queue, 1, tier="premium")
+    job = queue.claim("worker-a")[0]
+    assert job["tier"] == "premium"
+    assert job["quality"] == "best" and job["audio_only"] is False
+    assert job["save_info"] is False
+
+def test_save_info_travels_with_the_job(queue):
+    download_id = enqueue(queue, 1, save_info=True)[0]
+    assert queue.get_status(download_id)["save_info"] is True
+    assert queue.claim("worker-a")[0]["save_info"] is True
+
+def test_late_progress_never_overwrites_a_final_state(queue):
+    download_id = enqueue(queue, 1)[0]
+    queue.claim("worker-a")
+    queue.save_statuses({download_id: {"id": download_id, "status": "completed"}})
+    queue.save_statuses({download_id: {"id": download_id, "status": "downloading", "progress": 50.0}})
+    assert queue.get_status(download_id)["status"] == "completed"
+
+def test_cancelling_a_queued_job_is_immediate_and_a_running_one_is_flagged(queue):
+    running, queued = enqueue(queue, 2)
+    queue.claim("worker-a", limit=1)
+    assert queue.cancel([running, queued]) == {running: "cancelling", queued: "cancelled"}
+    assert queue.cancel_requested("worker-a", [running]) == [running]
+    # The worker's next progress snapshot doesn't clear the request
+    queue.save_statuses({running: {"id": running, "status": "downloading"}})
+    assert queue.get_status(running)["status"] == "cancelling"
+
+def test_stale_jobs_go_back_to_the_queue(queue):
+    download_id = enqueue(queue, 1)[0]
+    queue.claim("worker-a")
+    db = SessionLocal()
+    db.execute(update(DownloadJob).values(heartbeat_at=datetime.utcnow() - timedelta(minutes=10)))
+    db.commit()
+    db.close()
+    assert queue.requeue_stale(timeout=60) == 1
+    assert queue.get_status(download_id)["status"] == "queued"
+    assert [job["id"] for job in queue.claim("worker-b")] == [download_id]
+
+def test_released_jobs_can_be_claimed_again(queue):
+    ids = enqueue(queue, 2)
+    queue.claim("worker-a", limit=2)
+    queue.release("worker-a", ids)
+    assert queue.depth() == 2
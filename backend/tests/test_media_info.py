@@ -0,0 +1,62 @@
+import gzip
+import json
+import sys
+import types
+
+from app.services.media_info import FULL_INFO_FILE, MediaInfo
+
+INFO = {
+    "id": "abc", "title": "Clip", "duration": 12.5, "uploader": "Creator", "view_count": 10, "like_count": 2,
+    "description": "x" * 300, "thumbnail": "https://cdn.example.com/t.jpg", "ext": "mp4", "width": 1920,
+    "height": 1080, "vcodec": "avc1", "acodec": "mp4a.40.2", "formats": [{"format_id": "18", "ext": "mp4"}]
+}
+
+def test_file_info_holds_only_the_served_fields():
+    file_info = MediaInfo.from_info(INFO).file_info()
+    assert set(file_info) == {"title", "duration", "uploader", "view_count", "like_count", "description", "thumbnail"}
+    assert file_info["description"] == "x" * 200 + "..."
+
+def test_missing_fields_get_the_served_defaults():
+    assert MediaInfo.from_info({}).file_info() == {
+        "title": "Unknown", "duration": None, "uploader": "Unknown", "view_count": None,
+        "like_count": None, "description": "", "thumbnail": None
+    }
+
+def test_uploader_names_are_shared():
+    first = MediaInfo.from_info({"uploader": "".join(["Cre", "ator"])})
+    second = MediaInfo.from_info({"uploader": "".join(["Creat", "or"])})
+    assert first.uploader is second.uploader
+
+def fake_yt_dlp(monkeypatch, extracted):
+    class YoutubeDL:
+        def __init__(self, params):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def extract_info(self, url, download=False):
+            extracted.append(url)
+            return dict(INFO)
+
+        def sanitize_info(self, info):
+            return info
+
+    monkeypatch.setitem(sys.modules, "yt_dlp", types.SimpleNamespace(YoutubeDL=YoutubeDL))
+
+def test_full_info_is_saved_only_for_the_job_that_asks(service, monkeypatch, tmp_path):
+    extracted = []
+    fake_yt_dlp(monkeypatch, extracted)
+    saved = tmp_path / "saved"
+    saved.mkdir()
+
+    service._extract_and_cache("https://youtu.be/abc", "youtube")
+    assert not list(tmp_path.rglob(FULL_INFO_FILE))
+
+    service._extract_and_cache("https://youtu.be/abc", "youtube", saved)
+    with gzip.open(saved / FULL_INFO_FILE, "rt") as f:
+        assert json.load(f)["formats"] == INFO["formats"]
+    assert len(extracted) == 2
@@ -0,0 +1,31 @@
+from prometheus_client import REGISTRY
+
+from app import metrics
+from app.services.download_service import ProgressHook
+from app.utils.cache import TTLCache
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+def test_registered_caches_report_hits_misses_and_size():
+    cache = TTLCache()
+    metrics.register_cache("metrics-test", cache)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("b")
+    assert sample("smd_cache_requests_total", cache="metrics-test", result="hit") == 1
+    assert sample("smd_cache_requests_total", cache="metrics-test", result="miss") == 1
+    assert sample("smd_cache_entries", cache="metrics-test") == 1
+
+def test_progress_hook_counts_only_new_bytes():
+    status = {"job": {"progress": 0.0}}
+    before = sample("smd_download_bytes_total", platform="metrics-test")
+    hook = ProgressHook("job", status, "metrics-test", resume_from={"clip.mp4": 100})
+    hook({"status": "downloading", "filename": "clip.mp4", "downloaded_bytes": 150, "total_bytes": 300})
+    hook({"status": "downloading", "filename": "clip.mp4", "downloaded_bytes": 250, "total_bytes": 300})
+    hook({"status": "finished", "filename": "clip.mp4", "total_bytes": 300, "elapsed": 1.0})
+    # The 100 bytes resumed from disk were not transferred again
+    assert sample("smd_download_bytes_total", platform="metrics-test") - before == 200
+    assert hook.bytes_this_attempt == 200
+    assert status["job"]["progress"] == 100.0
+    assert sample("smd_download_phase_duration_seconds_count", platform="metrics-test", phase="download") == 1
@@ -0,0 +1,53 @@
+import threading
+import time
+
+import pytest
+
+from app.services.download_service import ProgressHook
+
+def test_item_progress_rolls_up_into_the_parent_job():
+    status = {"job": {"progress": 0.0, "items": [{"progress": 0.0}, {"progress": 0.0}]}}
+    parent = ProgressHook("job", status, "instagram")
+    first = ProgressHook("job", status, "instagram", item_index=1, parent=parent)
+    second = ProgressHook("job", status, "instagram", item_index=2, parent=parent)
+    first({"status": "downloading", "filename": "01.mp4", "downloaded_bytes": 50, "total_bytes": 100})
+    second({"status": "finished", "filename": "02.jpg", "total_bytes": 10})
+    assert status["job"]["progress"] == 75.0
+    assert "(1 done)" in status["job"]["message"]
+    assert parent.bytes_this_attempt == 60
+
+def test_items_download_concurrently_within_the_limit(service, monkeypatch, tmp_path):
+    service.item_concurrency = 2
+    service.download_status["job"] = {"id": "job"}
+    running, peak = [], []
+    lock = threading.Lock()
+
+    def download_item(download_id, platform, ydl_opts, entry, index, output_path, parent_hook, partial_files):
+        with lock:
+            running.append(index)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(index)
+        service.download_status[download_id]["items"][index - 1]["status"] = "completed"
+
+    monkeypatch.setattr(service, "_download_item", download_item)
+    entries = [{"id": str(index), "title": f"Item {index}"} for index in range(4)]
+    service._download_items("job", "instagram", {"progress_hooks": [None]}, entries, tmp_path)
+    assert max(peak) == 2
+    assert [item["status"] for item in service.download_status["job"]["items"]] == ["completed"] * 4
+
+def test_failed_items_fail_the_job_after_the_others_finish(service, monkeypatch, tmp_path):
+    service.download_status["job"] = {"id": "job"}
+    finished = []
+
+    def download_item(download_id, platform, ydl_opts, entry, index, output_path, parent_hook, partial_files):
+        if index == 1:
+            raise RuntimeError("HTTP Error 404")
+        finished.append(index)
+
+    monkeypatch.setattr(service, "_download_item", download_item)
+    entries = [{"id": str(index)} for index in range(3)]
+    with pytest.raises(RuntimeError, match="1 of 3 items failed: HTTP Error 404"):
+        service._download_items("job", "instagram", {"progress_hooks": [None]}, entries, tmp_path)
+    assert sorted(finished) == [2, 3]
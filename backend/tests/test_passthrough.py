@@ -0,0 +1,108 @@
+import asyncio
+import hashlib
+
+import httpx
+import pytest
+
+from app.services.passthrough import PassThroughDownload
+
+CHUNKS = [bytes([n]) * 1024 for n in range(32)]
+BODY = b"".join(CHUNKS)
+
+def upstream(sent, fail_after=None, status=200):
+    """MockTransport serving CHUNKS one by one, counting how many were read"""
+    async def body():
+        for index, chunk in enumerate(CHUNKS):
+            if fail_after is not None and index == fail_after:
+                raise httpx.ReadError("connection reset")
+            sent.append(index)
+            yield chunk
+
+    def handler(request):
+        return httpx.Response(status, headers={"Content-Length": str(len(BODY))}, content=body())
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+def passthrough(client, tmp_path, buffer_chunks=4):
+    progress = []
+    stream = PassThroughDownload(
+        client, "https://cdn.example.com/video.mp4", {}, tmp_path / "video.mp4", "tiktok",
+        lambda received, total: progress.append((received, total)), buffer_chunks=buffer_chunks
+    )
+    return stream, progress
+
+def test_client_gets_the_bytes_while_they_are_written_to_disk(tmp_path):
+    async def run():
+        async with upstream([]) as client:
+            stream, progress = passthrough(client, tmp_path)
+            await stream.start()
+            assert stream.content_length == len(BODY)
+            received = b"".join([chunk async for chunk in stream.iter_chunks()])
+            await stream.task
+            return stream, received, progress
+
+    stream, received, progress = asyncio.run(run())
+    assert received == BODY
+    assert (tmp_path / "video.mp4").read_bytes() == BODY
+    assert not (tmp_path / "video.mp4.part").exists()
+    assert stream.hasher.sha256.hexdigest() == hashlib.sha256(BODY).hexdigest()
+    assert progress[-1] == (len(BODY), len(BODY))
+
+def test_slow_client_holds_back_the_upstream_read(tmp_path):
+    async def run():
+        sent = []
+        async with upstream(sent) as client:
+            stream, _ = passthrough(client, tmp_path, buffer_chunks=2)
+            await stream.start()
+            # The client hasn't read anything yet
+            await asyncio.sleep(0.05)
+            read_ahead = len(sent)
+            async for _ in stream.iter_chunks():
+                pass
+            await stream.task
+            return read_ahead
+
+    # Two queued chunks, one waiting to be queued and one in the transport
+    assert asyncio.run(run()) <= 4
+
+def test_job_completes_on_disk_after_the_client_disconnects(tmp_path):
+    async def run():
+        async with upstream([]) as client:
+            stream, _ = passthrough(client, tmp_path, buffer_chunks=2)
+            await stream.start()
+            chunks = stream.iter_chunks()
+            await chunks.__anext__()
+            await chunks.aclose()
+            await asyncio.wait_for(stream.task, timeout=5)
+
+    asyncio.run(run())
+    assert (tmp_path / "video.mp4").read_bytes() == BODY
+
+def test_upstream_error_status_fails_before_any_byte(tmp_path):
+    async def run():
+        async with upstream([], status=403) as client:
+            stream, _ = passthrough(client, tmp_path)
+            with pytest.raises(httpx.HTTPStatusError):
+                await stream.start()
+            with pytest.raises(httpx.HTTPStatusError):
+                await stream.task
+
+    asyncio.run(run())
+    assert not (tmp_path / "video.mp4").exists()
+
+def test_broken_upstream_aborts_the_client_response(tmp_path):
+    async def run():
+        async with upstream([], fail_after=10) as client:
+            stream, _ = passthrough(client, tmp_path)
+            await stream.start()
+            received = []
+            with pytest.raises(httpx.ReadError):
+                async for chunk in stream.iter_chunks():
+                    received.append(chunk)
+            with pytest.raises(httpx.ReadError):
+                await stream.task
+            return received
+
+    # A truncated body is never passed off as the whole file
+    assert len(asyncio.run(run())) == 10
+    assert not (tmp_path / "video.mp4").exists()
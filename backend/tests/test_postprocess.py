@@ -0,0 +1,74 @@
+import asyncio
+import stat
+import time
+
+import pytest
+
+from app.services.postprocess import PostprocessPool
+
+# Stands in for ffmpeg: writes its last argument (the output), optionally after a delay or failing
+FAKE_FFMPEG = """#!/bin/sh
+for last in "$@"; do :; done
+if [ -n "$FAKE_FFMPEG_HANG" ]; then exec sleep 30; fi
+sleep "${FAKE_FFMPEG_SLEEP:-0}"
+if [ -n "$FAKE_FFMPEG_FAIL" ]; then echo "$FAKE_FFMPEG_FAIL" >&2; exit 1; fi
+echo "$*" > "$last"
+"""
+
+@pytest.fixture
+def pool(tmp_path):
+    ffmpeg = tmp_path / "ffmpeg"
+    ffmpeg.write_text(FAKE_FFMPEG)
+    ffmpeg.chmod(ffmpeg.stat().st_mode | stat.S_IEXEC)
+    pool = PostprocessPool(max_workers=2)
+    pool.ffmpeg = str(ffmpeg)
+    return pool
+
+def merge_plan(tmp_path, name):
+    inputs = [tmp_path / f"{name}.f1.mp4", tmp_path / f"{name}.f2.m4a"]
+    for path in inputs:
+        path.write_bytes(b"media")
+    return {"kind": "merge", "inputs": [str(path) for path in inputs], "output": str(tmp_path / f"{name}.mp4")}
+
+def test_merge_muxes_the_parts_and_removes_them(pool, tmp_path):
+    plan = merge_plan(tmp_path, "clip")
+    output = asyncio.run(pool.run_plan(plan, "youtube"))
+    assert output == plan["output"]
+    args = (tmp_path / "clip.mp4").read_text()
+    assert "-map 0 -map 1 -c copy -f mp4" in args
+    assert not any((tmp_path / name).exists() for name in ("clip.f1.mp4", "clip.f2.m4a", "clip.mp4.part"))
+
+def test_steps_wait_for_a_slot(pool, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_FFMPEG_SLEEP", "0.3")
+
+    async def run():
+        started = time.perf_counter()
+        await asyncio.gather(*(pool.run_plan(merge_plan(tmp_path, f"clip{n}"), "youtube") for n in range(4)))
+        return time.perf_counter() - started
+
+    # Four steps, two slots: two rounds
+    assert asyncio.run(run()) >= 0.55
+
+def test_ffmpeg_errors_are_reported(pool, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_FFMPEG_FAIL", "Invalid data found when processing input")
+    with pytest.raises(RuntimeError, match="ffmpeg failed \\(1\\): Invalid data found"):
+        asyncio.run(pool.run_plan(merge_plan(tmp_path, "clip"), "youtube"))
+    # Inputs are kept for a retry
+    assert (tmp_path / "clip.f1.mp4").exists()
+
+def test_cancel_marker_stops_ffmpeg(pool, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_FFMPEG_HANG", "1")
+    marker = tmp_path / ".cancelled"
+    marker.touch()
+    plan = {**merge_plan(tmp_path, "clip"), "cancel_marker": str(marker)}
+    started = time.perf_counter()
+    with pytest.raises(RuntimeError, match="download cancelled"):
+        asyncio.run(pool.run_plan(plan, "youtube"))
+    assert time.perf_counter() - started < 5
+
+def test_quality_selects_split_formats_only_with_ffmpeg(service):
+    service.postprocess.ffmpeg = "/usr/bin/ffmpeg"
+    assert service._get_ydl_options("youtube", "720p")["format"] == "bv[height<=720]+ba/b[height<=720]"
+    service.postprocess.ffmpeg = None
+    assert service._get_ydl_options("youtube", "720p")["format"] == "best[height<=720]"
+    assert service._get_ydl_options("youtube", "worst")["format"] == "worst"
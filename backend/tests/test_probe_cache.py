@@ -0,0 +1,47 @@
+import time
+
+from app.utils.cache import TTLCache
+from app.utils.helpers import canonicalize_url
+
+def test_share_links_share_a_cache_key():
+    assert canonicalize_url("https://www.instagram.com/reel/Cabc123/?igsh=xyz&utm_source=ig") == \
+        canonicalize_url("https://instagram.com/reel/Cabc123")
+    assert canonicalize_url("https://x.com/user/status/1?s=20") == \
+        canonicalize_url("https://twitter.com/user/status/1/")
+
+def test_meaningful_query_parameters_are_kept():
+    assert canonicalize_url("https://example.com/watch?v=a") != canonicalize_url("https://example.com/watch?v=b")
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(ttl=0.05)
+    cache.set("key", {"id": 1})
+    assert cache.get("key") == {"id": 1}
+    time.sleep(0.06)
+    assert cache.get("key") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(ttl=60, max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+def test_probe_answers_from_the_cache_without_extracting(service, monkeypatch):
+    def no_extraction(*args, **kwargs):
+        raise AssertionError("probe should not extract a cached URL")
+
+    monkeypatch.setattr(service, "_extract_and_cache", no_extraction)
+    service.info_cache.set(canonicalize_url("https://www.tiktok.com/@a/video/1"), {
+        "id": "1",
+        "title": "Clip",
+        "duration": 12,
+        "formats": [{"format_id": "h264", "ext": "mp4", "height": 720, "filesize": 1000}]
+    })
+
+    result = service.probe("https://tiktok.com/@a/video/1?is_from_webapp=1", "tiktok")
+    assert result["cached"] is True
+    assert result["info"]["title"] == "Clip"
+    assert result["info"]["formats"][0]["filesize"] == 1000
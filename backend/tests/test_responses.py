@@ -0,0 +1,62 @@
+import gzip
+
+import brotli
+import orjson
+from starlette.requests import Request
+
+from app.schemas import DownloadStatusSummary
+from app.utils.helpers import SUMMARY_FIELDS, summarize_status
+from app.utils.responses import json_response
+
+STATUS = {
+    "id": "job",
+    "url": "https://www.tiktok.com/@a/video/1",
+    "platform": "tiktok",
+    "status": "completed",
+    "progress": 100.0,
+    "message": "Video download completed successfully",
+    "file_path": "/downloads/tiktok/job",
+    "storage_key": "tiktok/job/clip.mp4",
+    "items": [{"index": 1}, {"index": 2}],
+    "file_info": {
+        "title": "Clip",
+        "duration": 12.5,
+        "uploader": "a",
+        "description": "a long description " * 50,
+        "formats_available": 23,
+        "thumbnail": "https://cdn.example.com/t.jpg"
+    }
+}
+
+def request(accept_encoding=""):
+    return Request({"type": "http", "method": "GET", "headers": [(b"accept-encoding", accept_encoding.encode())]})
+
+def test_summary_keeps_only_served_fields():
+    summary = summarize_status(STATUS)
+    assert set(summary) <= set(SUMMARY_FIELDS) | {"file_info", "item_count"}
+    assert summary["item_count"] == 2
+    assert "description" not in summary["file_info"]
+    assert "storage_key" not in summary
+    # Matches the documented response model
+    assert DownloadStatusSummary(**summary).file_info.title == "Clip"
+
+def test_response_model_documents_every_summary_field():
+    assert set(SUMMARY_FIELDS) | {"file_info", "item_count"} <= set(DownloadStatusSummary.model_fields)
+
+def test_large_bodies_are_compressed_by_preference():
+    content = {"downloads": [STATUS] * 5}
+    body = orjson.dumps(content)
+    response = json_response(request("gzip, br"), content)
+    assert response.headers["content-encoding"] == "br"
+    assert brotli.decompress(response.body) == body
+    response = json_response(request("gzip"), content)
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(response.body) == body
+    assert response.headers["vary"] == "Accept-Encoding"
+
+def test_refused_or_small_bodies_are_sent_as_is():
+    content = {"downloads": [STATUS] * 5}
+    assert "content-encoding" not in json_response(request("br;q=0, identity"), content).headers
+    small = json_response(request("br"), {"id": "job"})
+    assert "content-encoding" not in small.headers
+    assert small.body == b'{"id":"job"}'
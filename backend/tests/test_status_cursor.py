@@ -0,0 +1,43 @@
+import asyncio
+
+import orjson
+from starlette.requests import Request
+
+from app.routers import main
+from app.utils.helpers import decode_status_cursor, encode_status_cursor, status_digest
+
+def poll(ids, cursor=None):
+    request = Request({"type": "http", "method": "POST", "headers": []})
+    response = asyncio.run(main.get_download_statuses(main.StatusRequest(ids=ids, cursor=cursor), request))
+    return response.status_code, orjson.loads(response.body)
+
+def test_cursor_returns_only_changed_jobs(monkeypatch):
+    statuses = main.download_service.download_status
+    monkeypatch.setitem(statuses, "a", {"id": "a", "status": "downloading", "progress": 10.0})
+    monkeypatch.setitem(statuses, "b", {"id": "b", "status": "queued", "progress": 0.0})
+
+    status_code, first = poll(["a", "b"])
+    assert status_code == 200
+    assert [record["id"] for record in first["downloads"]] == ["a", "b"]
+
+    statuses["a"]["progress"] = 55.0
+    _, second = poll(["a", "b"], first["cursor"])
+    assert [(record["id"], record["progress"]) for record in second["downloads"]] == [("a", 55.0)]
+
+def test_nothing_changed_is_an_empty_200_with_the_same_cursor(monkeypatch):
+    monkeypatch.setitem(main.download_service.download_status, "c", {"id": "c", "status": "completed", "progress": 100.0})
+    _, first = poll(["c"])
+    status_code, again = poll(["c"], first["cursor"])
+    # A POST never gets a 304
+    assert status_code == 200
+    assert again == {"downloads": [], "cursor": first["cursor"]}
+
+def test_unknown_ids_are_reported_once():
+    _, body = poll(["missing", "missing"])
+    assert body["downloads"] == [{"id": "missing", "status": "not_found"}]
+
+def test_cursor_round_trip_and_garbage():
+    digests = [status_digest({"id": str(n)}) for n in range(3)]
+    assert decode_status_cursor(encode_status_cursor(digests)) == set(digests)
+    # A malformed cursor means "send everything"
+    assert decode_status_cursor("!!not base64!!") == set()
@@ -0,0 +1,53 @@
+import asyncio
+
+from app.services.status_writer import StatusWriteBuffer
+
+class RecordingQueue:
+    def __init__(self):
+        self.batches = []
+
+    def save_statuses(self, batch):
+        self.batches.append(batch)
+
+def test_buffered_snapshot_is_detached_from_nested_dicts():
+    queue = RecordingQueue()
+    writer = StatusWriteBuffer(queue)
+    status = {"id": "job", "status": "downloading", "file_info": {"title": "Unknown"}}
+
+    async def run():
+        await writer.put("job", status)
+        status["file_info"]["title"] = "Clip"
+        await writer.flush()
+
+    asyncio.run(run())
+    assert queue.batches == [{"job": {"id": "job", "status": "downloading", "file_info": {"title": "Unknown"}}}]
+
+def test_nested_change_after_a_flush_is_written():
+    queue = RecordingQueue()
+    writer = StatusWriteBuffer(queue)
+    status = {"id": "job", "status": "downloading", "file_info": {"title": "Unknown"}}
+
+    async def run():
+        await writer.put("job", status)
+        await writer.flush()
+        status["file_info"]["title"] = "Clip"
+        await writer.put("job", status)
+        return await writer.flush()
+
+    # With a shallow copy the last written snapshot would share file_info and look unchanged
+    assert asyncio.run(run()) == 1
+    assert queue.batches[-1]["job"]["file_info"]["title"] == "Clip"
+
+def test_unchanged_snapshot_is_skipped():
+    queue = RecordingQueue()
+    writer = StatusWriteBuffer(queue)
+    status = {"id": "job", "status": "downloading", "progress": 10.0}
+
+    async def run():
+        await writer.put("job", status)
+        await writer.flush()
+        await writer.put("job", status)
+        return await writer.flush()
+
+    assert asyncio.run(run()) == 0
+    assert len(queue.batches) == 1
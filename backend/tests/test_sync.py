@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import uuid
+
+import pytest
+
+FEED = "https://www.tiktok.com/@creator"
+
+@pytest.fixture
+def feed(service, monkeypatch):
+    """A fake newest-first feed; records what each sync read and scheduled"""
+    state = {"items": [], "read": 0, "closed": threading.Event(), "scheduled": [], "fail_on": None}
+
+    def iter_flat_entries(url, platform):
+        state["read"] = 0
+        try:
+            for item_id in state["items"]:
+                state["read"] += 1
+                yield {"id": item_id, "url": f"{FEED}/video/{item_id}"}
+        finally:
+            state["closed"].set()
+
+    async def schedule_download(download_id, url, platform, quality="best", audio_only=False):
+        if url.endswith(f"/{state['fail_on']}"):
+            raise RuntimeError("queue unavailable")
+        state["scheduled"].append(url.rsplit("/", 1)[1])
+
+    monkeypatch.setattr(service, "iter_flat_entries", iter_flat_entries)
+    monkeypatch.setattr(service, "schedule_download", schedule_download)
+    service.sync_stop_after_seen = 3
+    service.sync_batch_size = 5
+    # Every test syncs its own source
+    state["url"] = f"{FEED}{uuid.uuid4().hex[:8]}"
+    return state
+
+def sync(service, feed, max_items=None):
+    sync_id = str(uuid.uuid4())
+    feed["scheduled"] = []
+    asyncio.run(service.sync_source(sync_id, feed["url"], "tiktok", max_items=max_items))
+    return service.sync_status[sync_id]
+
+def test_first_sync_walks_the_whole_feed(service, feed):
+    feed["items"] = [str(n) for n in range(20, 0, -1)]
+    status = sync(service, feed)
+    assert status["status"] == "completed"
+    assert status["scheduled"] == 20
+    assert status["reached_end"] is True
+    assert feed["scheduled"] == feed["items"]
+
+def test_resync_stops_after_known_items_in_a_row(service, feed):
+    feed["items"] = [str(n) for n in range(50, 0, -1)]
+    sync(service, feed)
+    feed["items"] = ["52", "51"] + feed["items"]
+    status = sync(service, feed)
+    assert feed["scheduled"] == ["52", "51"]
+    assert status["caught_up"] is True
+    assert status["reached_end"] is True
+    # The consumed batch, two queued, one being handed over and the entry that sees the stop
+    assert feed["read"] <= 4 * service.sync_batch_size + 1
+
+def test_sync_cut_short_does_not_let_the_next_one_stop_early(service, feed):
+    feed["items"] = [str(n) for n in range(10, 0, -1)]
+    status = sync(service, feed, max_items=4)
+    assert feed["scheduled"] == ["10", "9", "8", "7"]
+    assert status["reached_end"] is False
+
+    # The four archived items come first, but the older ones were never scheduled
+    status = sync(service, feed)
+    assert feed["scheduled"] == ["6", "5", "4", "3", "2", "1"]
+    assert status["caught_up"] is False
+    assert status["reached_end"] is True
+    source = next(source for source in service.sync_archive.list_sources() if source["url"] == feed["url"])
+    assert source["reached_end"] is True
+    assert source["item_count"] == 10
+
+def test_archive_is_queried_once_per_batch(service, feed, monkeypatch):
+    feed["items"] = [str(n) for n in range(12, 0, -1)]
+    calls = {"known_items": 0, "record": 0}
+    for name in calls:
+        original = getattr(service.sync_archive, name)
+
+        def counted(*args, name=name, original=original):
+            calls[name] += 1
+            return original(*args)
+
+        monkeypatch.setattr(service.sync_archive, name, counted)
+    sync(service, feed)
+    # 12 entries in batches of 5
+    assert calls == {"known_items": 3, "record": 3}
+
+def test_failed_sync_releases_the_enumeration_thread(service, feed):
+    # Far more entries than the read-ahead holds, so the producer would block on a full queue
+    feed["items"] = [str(n) for n in range(500, 0, -1)]
+    feed["fail_on"] = "499"
+    status = sync(service, feed)
+    assert status["status"] == "failed"
+    assert "queue unavailable" in status["message"]
+    assert feed["closed"].wait(timeout=5)
+    assert feed["read"] < 500
+
+def test_duplicate_entries_are_scheduled_once(service, feed):
+    feed["items"] = ["3", "2", "2", "1"]
+    status = sync(service, feed)
+    assert feed["scheduled"] == ["3", "2", "1"]
+    assert status["scheduled"] == 3
+
+def test_items_scheduled_before_a_failure_are_archived(service, feed):
+    feed["items"] = ["5", "4", "3", "2", "1"]
+    feed["fail_on"] = "3"
+    status = sync(service, feed)
+    assert status["status"] == "failed"
+    assert feed["scheduled"] == ["5", "4"]
+
+    # The retry only schedules what the failed sync didn't
+    feed["fail_on"] = None
+    sync(service, feed)
+    assert feed["scheduled"] == ["3", "2", "1"]
@@ -0,0 +1,72 @@
+import asyncio
+import hashlib
+import json
+import stat
+
+import httpx
+import pytest
+
+from app.services.postprocess import PostprocessPool
+from app.services.thumbnails import ThumbnailStore
+
+IMAGE = b"\x89PNG fake image bytes"
+
+def client(routes):
+    """MockTransport answering each URL path from `routes`: bytes, or a status code"""
+    def handler(request):
+        answer = routes.get(request.url.path, 404)
+        if isinstance(answer, int):
+            return httpx.Response(answer)
+        return httpx.Response(200, content=answer)
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+@pytest.fixture
+def store(tmp_path):
+    pool = PostprocessPool(max_workers=1)
+    pool.ffmpeg = None
+    return ThumbnailStore(tmp_path / "thumbs", pool, max_source_bytes=1024)
+
+@pytest.fixture
+def job_dir(tmp_path):
+    path = tmp_path / "job"
+    path.mkdir()
+    return path
+
+def generate(store, routes, job_dir, url=None):
+    async def run():
+        async with client(routes) as http:
+            return await store.generate(http, job_dir, url)
+    return asyncio.run(run())
+
+def test_platform_image_is_stored_under_its_content_hash(store, job_dir):
+    key = generate(store, {"/thumb.png": IMAGE}, job_dir, "https://cdn.example.com/thumb.png?sig=1")
+    assert key == f"{hashlib.sha256(IMAGE).hexdigest()}.png"
+    assert store.path_for(key).read_bytes() == IMAGE
+    # Same bytes from another URL share the entry
+    assert generate(store, {"/other.png": IMAGE}, job_dir, "https://cdn.example.com/other.png") == key
+    assert not list((store.cache_dir / "tmp").iterdir())
+
+def test_oversized_or_missing_images_are_not_cached(store, job_dir):
+    assert generate(store, {"/big.jpg": b"x" * 2048}, job_dir, "https://cdn.example.com/big.jpg") is None
+    assert generate(store, {"/gone.jpg": 404}, job_dir, "https://cdn.example.com/gone.jpg") is None
+
+def test_info_json_sidecar_supplies_the_url(store, job_dir):
+    (job_dir / "clip.info.json").write_text(json.dumps({"thumbnail": "https://cdn.example.com/side.webp"}))
+    key = generate(store, {"/side.webp": IMAGE}, job_dir)
+    assert key.endswith(".webp")
+
+def test_video_frame_is_used_without_a_platform_image(store, job_dir, tmp_path):
+    ffmpeg = tmp_path / "ffmpeg"
+    # Writes a fixed "frame" to its last argument
+    ffmpeg.write_text('#!/bin/sh\nfor last in "$@"; do :; done\nprintf frame > "$last"\n')
+    ffmpeg.chmod(ffmpeg.stat().st_mode | stat.S_IEXEC)
+    store.postprocess.ffmpeg = str(ffmpeg)
+    (job_dir / "clip.mp4").write_bytes(b"video")
+    key = generate(store, {}, job_dir, "https://cdn.example.com/gone.jpg")
+    assert key == f"{hashlib.sha256(b'frame').hexdigest()}.jpg"
+
+def test_keys_are_validated(store):
+    assert store.path_for("../../etc/passwd") is None
+    assert store.path_for("0" * 64 + ".gif") is None
+    assert store.path_for("0" * 64 + ".jpg") is None
@@ -0,0 +1,203 @@
+import asyncio
+import socket
+
+import httpx
+import pytest
+from fastapi import BackgroundTasks, HTTPException, Response
+from starlette.requests import Request
+
+from app.database import SessionLocal
+from app.models import WebhookDeadLetter
+from app.routers import main
+from app.services.webhooks import CallbackNotAllowed, WebhookDispatcher, is_public_address
+from benchmarks.webhook_receiver import WebhookReceiver
+
+SECRET = "test-webhook-secret"
+STATUS = {"id": "job", "url": "https://www.tiktok.com/@a/video/1", "platform": "tiktok", "status": "completed"}
+
+@pytest.fixture(autouse=True)
+def clean_dead_letters():
+    yield
+    db = SessionLocal()
+    db.query(WebhookDeadLetter).delete()
+    db.commit()
+    db.close()
+
+@pytest.fixture
+def receiver():
+    receiver = WebhookReceiver(SECRET).start()
+    yield receiver
+    receiver.stop()
+
+def dispatcher(secret=SECRET, allowed_hosts=("127.0.0.1",), **options):
+    options.setdefault("backoff_base", 0.01)
+    return WebhookDispatcher(secret, allowed_hosts=allowed_hosts, **options)
+
+def deliver(webhooks, url, status=STATUS, until=lambda: True):
+    """Send one event, wait for `until` (retries are sleeping outside the queue) and shut down"""
+    async def run():
+        event_id = webhooks.notify(url, status)
+        for _ in range(500):
+            if until():
+                break
+            await asyncio.sleep(0.01)
+        await webhooks.aclose(drain_timeout=5)
+        return event_id
+
+    return asyncio.run(run())
+
+def dead_letters():
+    return WebhookDispatcher(SECRET).dead_letters.list()
+
+def test_signed_event_is_delivered(receiver):
+    event_id = deliver(dispatcher(), f"{receiver.url}/hook")
+    assert receiver.rejected == 0
+    assert [event["id"] for event in receiver.events] == [event_id]
+    assert receiver.events[0]["type"] == "download.completed"
+    assert receiver.events[0]["data"]["id"] == "job"
+
+def test_failed_attempts_are_retried_under_the_same_id(receiver):
+    receiver.fail_first = 2
+    event_id = deliver(dispatcher(), f"{receiver.url}/hook", until=lambda: receiver.events)
+    assert receiver.attempts == {event_id: 3}
+    assert len(receiver.events) == 1
+    assert dead_letters() == []
+
+def test_delivery_out_of_attempts_is_dead_lettered_and_can_be_redelivered(receiver):
+    receiver.fail_first = 10
+    event_id = deliver(dispatcher(max_attempts=2), f"{receiver.url}/hook", until=lambda: sum(receiver.attempts.values()) == 2)
+    [letter] = dead_letters()
+    assert letter["event_id"] == event_id
+    assert letter["attempts"] == 2 and letter["last_error"] == "HTTP 503"
+
+    receiver.fail_first = 0
+    webhooks = dispatcher()
+
+    async def redeliver():
+        assert await webhooks.redeliver(letter["id"])
+        await webhooks.aclose(drain_timeout=5)
+
+    asyncio.run(redeliver())
+    assert [event["id"] for event in receiver.events] == [event_id]
+    assert dead_letters() == []
+
+def test_final_answer_is_not_retried(receiver):
+    receiver.status = 410
+    event_id = deliver(dispatcher(), f"{receiver.url}/hook")
+    assert receiver.attempts == {event_id: 1}
+    assert dead_letters()[0]["last_error"] == "HTTP 410"
+
+def test_event_signed_with_another_secret_is_rejected(receiver):
+    deliver(dispatcher(secret="not-the-receivers"), f"{receiver.url}/hook")
+    assert receiver.rejected == 1
+    assert dead_letters()[0]["last_error"] == "HTTP 401"
+
+def test_without_a_secret_no_event_is_sent(receiver):
+    webhooks = dispatcher(secret=None)
+    assert not webhooks.enabled
+    assert deliver(webhooks, f"{receiver.url}/hook") is None
+    assert receiver.attempts == {}
+
+def test_loopback_receiver_is_refused_at_delivery_without_the_allowlist(receiver):
+    deliver(dispatcher(allowed_hosts=()), f"{receiver.url}/hook")
+    assert receiver.attempts == {}
+    assert "private or local address" in dead_letters()[0]["last_error"]
+
+@pytest.mark.parametrize("address", ["127.0.0.1", "10.1.2.3", "192.168.0.1", "169.254.169.254", "100.64.0.1", "::1", "fe80::1", "::ffff:10.0.0.1"])
+def test_internal_addresses_are_not_public(address):
+    assert not is_public_address(address)
+
+def test_public_addresses():
+    assert is_public_address("93.184.216.34")
+    assert is_public_address("2606:2800:220:1:248:1893:25c8:1946")
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1:8767/hook",
+    "http://10.0.0.5/hook",
+    "http://169.254.169.254/latest/meta-data",
+    "http://[::1]/hook",
+    "ftp://93.184.216.34/hook"
+])
+def test_internal_and_non_http_callbacks_are_refused(url):
+    with pytest.raises(CallbackNotAllowed):
+        asyncio.run(dispatcher(allowed_hosts=()).check_url(url))
+
+def test_public_callback_is_accepted():
+    asyncio.run(dispatcher(allowed_hosts=()).check_url("https://93.184.216.34/hook"))
+
+def test_allowlist_admits_listed_hosts_only():
+    webhooks = dispatcher(allowed_hosts=("127.0.0.1", ".example.com"))
+    asyncio.run(webhooks.check_url("http://127.0.0.1:8767/hook"))
+    asyncio.run(webhooks.check_url("https://hooks.example.com/hook"))
+    asyncio.run(webhooks.check_url("https://example.com/hook"))
+    with pytest.raises(CallbackNotAllowed):
+        asyncio.run(webhooks.check_url("https://93.184.216.34/hook"))
+    with pytest.raises(CallbackNotAllowed):
+        asyncio.run(webhooks.check_url("https://badexample.com/hook"))
+
+def submit(callback_url):
+    request = Request({"type": "http", "method": "POST", "headers": [], "client": ("10.0.0.1", 50000)})
+    return asyncio.run(main.download_content(
+        main.DownloadRequest(url="https://www.tiktok.com/@a/video/1", callback_url=callback_url),
+        BackgroundTasks(), Response(), request, current_user=None, idempotency_key=None
+    ))
+
+def test_callback_is_refused_without_a_secret(monkeypatch):
+    monkeypatch.setattr(main.download_service.webhooks, "secret", None)
+    with pytest.raises(HTTPException) as refused:
+        submit("https://93.184.216.34/hook")
+    assert refused.value.status_code == 400
+    assert "WEBHOOK_SECRET" in refused.value.detail
+
+def test_internal_callback_is_refused_at_submission(monkeypatch):
+    monkeypatch.setattr(main.download_service.webhooks, "secret", SECRET)
+    monkeypatch.setattr(main.download_service.webhooks, "allowed_hosts", [])
+    with pytest.raises(HTTPException) as refused:
+        submit("http://169.254.169.254/latest/meta-data")
+    assert refused.value.status_code == 400
+
+def resolve_to(monkeypatch, *answers):
+    """Make every lookup return the next of `answers` (the last one repeats), counting lookups"""
+    lookups = []
+
+    async def getaddrinfo(self, host, port, **kwargs):
+        lookups.append(host)
+        address = answers[min(len(lookups), len(answers)) - 1]
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, port))]
+
+    monkeypatch.setattr(asyncio.BaseEventLoop, "getaddrinfo", getaddrinfo)
+    return lookups
+
+def test_delivery_connects_to_the_checked_address(receiver, monkeypatch):
+    # Treat the receiver's loopback address as public, and make any further lookup rebind to an internal one
+    monkeypatch.setattr("app.services.webhooks.is_public_address", lambda address: address == "127.0.0.1")
+    lookups = resolve_to(monkeypatch, "127.0.0.1", "10.0.0.1")
+    port = receiver.url.rsplit(":", 1)[1]
+    event_id = deliver(dispatcher(allowed_hosts=()), f"http://hooks.example.test:{port}/hook")
+    # One lookup, by the check; the request went to its answer under the original Host
+    assert lookups == ["hooks.example.test"]
+    assert [event["id"] for event in receiver.events] == [event_id]
+
+def test_https_delivery_keeps_the_server_name(monkeypatch):
+    monkeypatch.setattr("app.services.webhooks.is_public_address", lambda address: True)
+    resolve_to(monkeypatch, "93.184.216.34")
+    sent = []
+
+    def handler(request):
+        sent.append(request)
+        return httpx.Response(204)
+
+    webhooks = dispatcher(allowed_hosts=())
+
+    async def run():
+        webhooks._start()
+        await webhooks._client.aclose()
+        webhooks._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        webhooks.notify("https://hooks.example.com:8443/hook", STATUS)
+        await webhooks.aclose(drain_timeout=5)
+
+    asyncio.run(run())
+    [request] = sent
+    assert request.url.host == "93.184.216.34" and request.url.port == 8443
+    assert request.headers["Host"] == "hooks.example.com:8443"
+    assert request.extensions["sni_hostname"] == "hooks.example.com"
@@ -28,16 +28,29 @@ export const downloadContent = async (request: DownloadRequest): Promise<Downloa
   return response.data
 }
 
+export const probeContent = async (url: string, platform?: string): Promise<any> => {
+  const response = await api.post('/probe', { url, platform })
+  return response.data
+}
+
 export const getDownloadStatus = async (downloadId: string): Promise<any> => {
   const response = await api.get(`/download/${downloadId}`)
   return response.data
 }
 
+export const cancelDownload = async (downloadId: string): Promise<any> => {
+  const response = await api.delete(`/download/${downloadId}`)
+  return response.data
+}
+
 export const getDownloadHistory = async (): Promise<any> => {
   const response = await api.get('/downloads')
   return response.data
 }
 
+// Cached preview for a history item; generated on first request for older downloads
+export const getThumbnailUrl = (downloadId: string): string => `${API_BASE_URL}/files/${downloadId}/thumbnail`
+
 export const getSupportedPlatforms = async (): Promise<any> => {
   const response = await api.get('/platforms')
   return response.data